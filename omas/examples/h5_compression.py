@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HDF5 compression policies
+=========================
+This example compares file size, save and load times of the sample ODS
+saved to HDF5 with different layouts and compression policies.
+
+The compression policy is set with the `compression`, `compression_opts`, `shuffle`, `fletcher32`, `chunks`, and `min_size`
+arguments of `save_omas_h5` (which are also accepted by `ODS.save('filename.h5', ...)`).
+Arrays with fewer than `min_size` elements are stored contiguous and without filters, since
+for small arrays the chunking overhead outweighs the compression gains.
+"""
+
+import os
+import time
+import numpy
+from scipy.interpolate import RectBivariateSpline
+from omas import *
+from omas.omas_utils import *
+
+# the arrays of the sample ODS are small, so we upsample
+# the 2D equilibrium quantities to a more realistic resolution
+ods = ODS().sample(ntimes=10)
+n = 257
+for time_slice in ods['equilibrium.time_slice'].values():
+    grid = time_slice['profiles_2d.0.grid']
+    dim1 = numpy.linspace(min(grid['dim1']), max(grid['dim1']), n)
+    dim2 = numpy.linspace(min(grid['dim2']), max(grid['dim2']), n)
+    for item in ['psi', 'phi', 'b_field_tor']:
+        spline = RectBivariateSpline(grid['dim1'], grid['dim2'], time_slice['profiles_2d.0'][item])
+        time_slice['profiles_2d.0'][item] = spline(dim1, dim2)
+    grid['dim1'] = dim1
+    grid['dim2'] = dim2
+
+policies = {
+    'none': {},
+    'gzip-1': {'compression': 'gzip', 'compression_opts': 1, 'min_size': 64},
+    'gzip-4+shuffle': {'compression': 'gzip', 'compression_opts': 4, 'shuffle': True, 'min_size': 64},
+    'gzip-9+shuffle': {'compression': 'gzip', 'compression_opts': 9, 'shuffle': True, 'min_size': 64},
+    'lzf+shuffle': {'compression': 'lzf', 'shuffle': True, 'min_size': 64},
+}
+
+filename = omas_testdir(__file__) + '/h5_compression.h5'
+print('%6s %16s %10s %10s %10s' % ('layout', 'policy', 'size [MB]', 'save [s]', 'load [s]'))
+for homogeneous in [False, 'time']:
+    for name, policy in policies.items():
+        if homogeneous and not policy:
+            policy = {'compression': False}
+        t0 = time.time()
+        save_omas_h5(ods, filename, homogeneous=homogeneous, **policy)
+        t_save = time.time() - t0
+        t0 = time.time()
+        ods1 = load_omas_h5(filename)
+        t_load = time.time() - t0
+        size = os.path.getsize(filename) / 1024.0**2
+        assert not ods.diff(ods1)
+        print('%6s %16s %10.2f %10.3f %10.3f' % (homogeneous or 'groups', name, size, t_save, t_load))
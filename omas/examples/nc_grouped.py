@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+NetCDF grouped layout
+=====================
+This example compares file size, save and load times of the sample ODS
+saved to NetCDF with the default layout and with the grouped layout.
+
+With `save_omas_nc(..., grouped=True)` (or `ODS.save('filename.nc', grouped=True)`) the data of each IDS is stored in
+its own NetCDF group, the dimensions are named after the IMAS coordinates of the data (eg. the `psi` 2D map of an
+equilibrium time slice has dimensions `time_slice.0.profiles_2d.0.grid.dim1` and `time_slice.0.profiles_2d.0.grid.dim2`),
+and numeric arrays are compressed with zlib and the shuffle filter.
+"""
+
+import os
+import time
+import numpy
+from scipy.interpolate import RectBivariateSpline
+from omas import *
+from omas.omas_utils import *
+
+# the arrays of the sample ODS are small, so we upsample
+# the 2D equilibrium quantities to a more realistic resolution
+ods = ODS().sample(ntimes=10)
+n = 257
+for time_slice in ods['equilibrium.time_slice'].values():
+    grid = time_slice['profiles_2d.0.grid']
+    dim1 = numpy.linspace(min(grid['dim1']), max(grid['dim1']), n)
+    dim2 = numpy.linspace(min(grid['dim2']), max(grid['dim2']), n)
+    for item in ['psi', 'phi', 'b_field_tor']:
+        spline = RectBivariateSpline(grid['dim1'], grid['dim2'], time_slice['profiles_2d.0'][item])
+        time_slice['profiles_2d.0'][item] = spline(dim1, dim2)
+    grid['dim1'] = dim1
+    grid['dim2'] = dim2
+
+layouts = {'default': {}, 'grouped': {'grouped': True}, 'grouped uncompressed': {'grouped': True, 'zlib': False}}
+
+filename = omas_testdir(__file__) + '/nc_grouped.nc'
+print('%22s %10s %10s %10s %12s' % ('layout', 'size [MB]', 'save [s]', 'load [s]', 'dynamic [s]'))
+for name, kw in layouts.items():
+    t0 = time.time()
+    save_omas_nc(ods, filename, **kw)
+    t_save = time.time() - t0
+    t0 = time.time()
+    ods1 = load_omas_nc(filename)
+    t_load = time.time() - t0
+    assert not ods.diff(ods1)
+    # dynamic loading of a single quantity
+    t0 = time.time()
+    ods1 = ODS()
+    with ods1.open(filename):
+        ods1['equilibrium.time_slice.5.profiles_2d.0.psi']
+    t_dynamic = time.time() - t0
+    size = os.path.getsize(filename) / 1024.0**2
+    print('%22s %10.2f %10.3f %10.3f %12.3f' % (name, size, t_save, t_load, t_dynamic))
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Paths conversion performance
+============================
+This example benchmarks the memoization of the functions that convert between the different syntaxes of ODS paths
+(`p2l`, `o2u`, `o2i`, `u2o`, ...), which are called many times for each item access.
+
+The same operations are timed right after the memoization caches are cleared (cold) and once they are populated (warm)
+for an equilibrium IDS with 100 time slices.
+"""
+
+import time
+from omas import *
+from omas.omas_utils import *
+
+n_slices = 100
+n_repeat = 5
+
+ods = ODS()
+ods.sample_equilibrium()
+for k in range(1, n_slices):
+    ods['equilibrium.time_slice'][k] = ods['equilibrium.time_slice'][0]
+flat = ods.flat()
+
+
+def conversions():
+    for path in flat:
+        p2l(path)
+        o2i(path)
+        u2o(o2u(path), path)
+
+
+def access():
+    for path in flat:
+        ods[path]
+
+
+benchmarks = {'ods.paths()': ods.paths, 'ods.flat()': ods.flat, 'ods[path]': access, 'path conversions': conversions}
+
+print('%d paths in %d time slices' % (len(flat), n_slices))
+for name, func in benchmarks.items():
+    timing = {}
+    for cache in ['cold', 'warm']:
+        t = []
+        for k in range(n_repeat):
+            if cache == 'cold':
+                clear_paths_cache()
+            t0 = time.time()
+            func()
+            t.append(time.time() - t0)
+        timing[cache] = min(t)
+    print('%20s: cold %3.3f [s]  warm %3.3f [s]  speedup x%3.1f' % (name, timing['cold'], timing['warm'], timing['cold'] / timing['warm']))
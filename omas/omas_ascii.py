@@ -4,7 +4,7 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS, ODC, force_imas_type
+from .omas_core import ODS, ODC, force_imas_type, omas_environment, load_subset
 
 
 def identify_imas_type(value):
@@ -51,6 +51,53 @@ def imas_eval(value):
         return tmp
 
 
+def imas_fmt_array(value):
+    """
+    Vectorized formatting of arrays (same output as `imas_fmt` applied to each element)
+    N-D arrays are written in Fortran order, with one line of `value.shape[0]` elements for each combination of the other indexes
+
+    :param value: numpy array
+
+    :return: string with the lines of the array
+    """
+    nlines = int(numpy.prod(value.shape[1:]))
+    if not nlines:
+        return None
+    lines = value.T.reshape(nlines, value.shape[0])
+    if value.dtype.kind == 'f':
+        fmt = '%5.16e'
+        lines = numpy.where(numpy.isnan(lines), imas_nan, lines)
+    elif value.dtype.kind in 'iu':
+        fmt = '%d'
+    else:
+        return '\n'.join(' '.join(map(imas_fmt, row)) for row in lines)
+    # a single formatting operation for the whole array
+    return '\n'.join([' '.join([fmt] * value.shape[0])] * nlines) % tuple(lines.ravel().tolist())
+
+
+def imas_eval_array(lines, info):
+    """
+    Vectorized parsing of arrays (inverse of `imas_fmt_array`)
+
+    :param lines: list of strings with the lines of the array
+
+    :param info: dictionary with `type` and `size` of the array
+
+    :return: numpy array
+    """
+    size = tuple(info['size'])
+    if info['type'] == '52 (DOUBLE_DATA)':
+        value = numpy.fromstring(' '.join(lines), dtype=float, sep=' ')
+        value[value == imas_nan] = numpy.nan
+    elif info['type'] == '51 (INTEGER_DATA)':
+        value = numpy.fromstring(' '.join(lines), dtype=int, sep=' ')
+    else:
+        value = numpy.array(' '.join(lines).split())
+    if value.size != numpy.prod(size):
+        raise ValueError('Expected %d elements in array of size %s, found %d' % (numpy.prod(size), size, value.size))
+    return value.reshape(size[::-1]).T
+
+
 def imas_ascii_key_sorter(keys, ods_has_location):
     new_order = [
         'ids_properties.homogeneous_time',
@@ -71,7 +118,7 @@ def imas_ascii_key_sorter(keys, ods_has_location):
 # ---------------------------
 # save and load OMAS to ASCII
 # ---------------------------
-def save_omas_ascii(ods, filename, machine=None, pulse=None, run=None, dir=None):
+def save_omas_ascii(ods, filename, machine=None, pulse=None, run=None, dir=None, max_workers=None, processes=False):
     """
     Save an ODS to ASCII (follows IMAS ASCII_BACKEND convention)
 
@@ -87,14 +134,22 @@ def save_omas_ascii(ods, filename, machine=None, pulse=None, run=None, dir=None)
     :param run: run number to build filename for saving IDSs to multiple files
 
     :param dir: directory where to save multiple IDSs files
+
+    :param max_workers: number of IDSs files that are saved concurrently (None to save them one after the other)
+
+    :param processes: use a pool of processes instead of a pool of threads to save multiple IDSs files
     """
 
     if filename is None and machine is not None and pulse is not None and run is not None:
+        items = []
         for ds in ods:
             filename = f'{machine}_{pulse}_{run}_{ds}.ids'
             if dir:
                 filename = dir + os.sep + filename
-            save_omas_ascii(ods[ds], filename, machine=None, pulse=None, run=None)
+            printd('Saving OMAS data to ASCII: %s' % filename, topic='ascii')
+            ods[ds].satisfy_imas_requirements()
+            items.append((ods[ds], filename, ods[ds].location))
+        parallel_map(_save_omas_ascii_ids, items, max_workers=max_workers, processes=processes)
         return
 
     elif filename is not None and machine is None and pulse is None and run is None:
@@ -107,16 +162,47 @@ def save_omas_ascii(ods, filename, machine=None, pulse=None, run=None, dir=None)
 
     ods.satisfy_imas_requirements()
 
-    ascii_string = []
-    for path in imas_ascii_key_sorter(ods.pretty_paths(include_structures=True), ods.location):
+    if isinstance(filename, str):
+        with open(filename, 'w') as f:
+            _save_omas_ascii(ods, f)
+    else:
+        _save_omas_ascii(ods, filename)
+
+
+def _save_omas_ascii_ids(item):
+    """
+    Save an IDS to its own ASCII file
+
+    :param item: tuple with IDS, filename, and location of the IDS
+                 (the location is passed explicitly since IDSs that are sent to worker processes are detached from their ODS)
+    """
+    ids, filename, location = item
+    with open(filename, 'w') as f:
+        _save_omas_ascii(ids, f, location)
+
+
+def _save_omas_ascii(ods, f, location=None):
+    """
+    Write an ODS to ASCII file descriptor
+
+    :param ods: OMAS data set
+
+    :param f: file descriptor to write to
+
+    :param location: location of the ODS (None to use `ods.location`)
+    """
+    if location is None:
+        location = ods.location
+    sep = ''
+    for path in imas_ascii_key_sorter(ods.pretty_paths(include_structures=True), location):
         value = ods[path]
         if isinstance(value, ODS) and not isinstance(value.omas_data, list):
             continue
         value = force_imas_type(value)
         info = identify_imas_type(value)
         tokens = []
-        if ods.location:
-            tokens.append(ods.location + '.' + path.replace('.', '/'))
+        if location:
+            tokens.append(location + '.' + path.replace('.', '/'))
         else:
             tokens.append(path.replace('.', '/'))
         if 'type' in info:
@@ -129,28 +215,29 @@ def save_omas_ascii(ods, filename, machine=None, pulse=None, run=None, dir=None)
             pass
         elif not isinstance(value, numpy.ndarray):
             tokens.append(imas_fmt(value))
-        elif len(value.shape) == 1:
-            tokens.append(' '.join(map(imas_fmt, value)))
-        elif len(value.shape) == 2:
-            for row in value.T:
-                tokens.append(' '.join(map(imas_fmt, row)))
         else:
-            raise ValueError(f'{path} not implemented ASCII support for number of dimensions >2')
-
-        ascii_string.extend(tokens)
-
-    ascii_string = '\n'.join(ascii_string)
+            lines = imas_fmt_array(value)
+            if lines is not None:
+                tokens.append(lines)
 
-    if isinstance(filename, str):
-        with open(filename, 'w') as f:
-            f.write(ascii_string)
-    else:
-        f = filename
-        f.write(ascii_string)
+        # tokens are written as they are generated
+        f.write(sep + '\n'.join(tokens))
+        sep = '\n'
 
 
 def load_omas_ascii(
-    filename, machine=None, pulse=None, run=None, dir=None, consistency_check=True, imas_version=omas_rcparams['default_imas_version']
+    filename,
+    machine=None,
+    pulse=None,
+    run=None,
+    dir=None,
+    consistency_check=True,
+    imas_version=omas_rcparams['default_imas_version'],
+    max_workers=None,
+    processes=False,
+    paths=None,
+    time=None,
+    time_index=None,
 ):
     """
     Load an ODS from ASCII (follows IMAS ASCII_BACKEND convention)
@@ -170,16 +257,36 @@ def load_omas_ascii(
 
     :param imas_version: imas version to use for consistency check
 
+    :param max_workers: number of IDSs files that are loaded concurrently (None to load them one after the other)
+
+    :param processes: use a pool of processes instead of a pool of threads to load multiple IDSs files
+
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the values of the selected data are parsed, and IDSs files that are not selected are not read
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :return: OMAS data set
     """
+    pfilter = paths
+    if not isinstance(pfilter, paths_filter):
+        pfilter = paths_filter(paths, time=time is not None or time_index is not None)
 
     if filename is None and machine is not None and pulse is not None and run is not None:
         filename = f'{machine}_{pulse}_{run}_*.ids'
         if dir:
             filename = dir + os.sep + filename
+        prefix = f'{machine}_{pulse}_{run}_'
+        filenames = [name for name in sorted(glob.glob(filename)) if pfilter.walk([os.path.basename(name)[len(prefix) : -len('.ids')]])]
         ods = ODS(consistency_check=True, imas_version=omas_rcparams['default_imas_version'])
-        for filename in glob.glob(filename):
-            ods.update(load_omas_ascii(filename, machine=None, pulse=None, run=None))
+        # IDSs are merged in the order of the filenames, regardless of the order in which they are loaded
+        items = [(name, pfilter) for name in filenames]
+        for tmp in parallel_map(_load_omas_ascii_ids, items, max_workers=max_workers, processes=processes):
+            ods.update(tmp)
+        if time is not None or time_index is not None:
+            load_subset(ods, pfilter, time=time, time_index=time_index)
         return ods
 
     elif filename is not None and machine is None and pulse is None and run is None:
@@ -227,9 +334,11 @@ def load_omas_ascii(
         # 1D arrays
         elif 'type' in token and 'dim' in token and token['dim'] == 1 and 'size' in token:
             value_lines = 1
-        # 2D arrays
-        elif 'type' in token and 'dim' in token and token['dim'] == 2 and 'size' in token:
-            value_lines = token['size'][1]
+        # N-D arrays
+        elif 'type' in token and 'dim' in token and token['dim'] > 1 and 'size' in token:
+            value_lines = int(numpy.prod(token['size'][1:]))
+            if not value_lines:
+                path = None
         # ODS
         elif 'type' not in token and 'dim' in token:
             value_lines = 0
@@ -239,27 +348,46 @@ def load_omas_ascii(
 
     for token in tokens.values():
         path = token['path']
+        if pfilter and not pfilter.match(p2l(path)):
+            continue
         # scalar INT or FLOAT
         if 'type' in token and 'dim' in token and token['dim'] == 0:
             value = imas_eval(token['value'][0])
         # string
         elif 'type' in token and token['type'] == '50 (CHAR_DATA)' and 'dim' in token and token['dim'] == 1:
             value = token['value'][0]
-        # 1D arrays
-        elif 'type' in token and 'dim' in token and token['dim'] == 1 and 'size' in token:
-            value = numpy.array(list(map(imas_eval, token['value'][0].split())))
-        # 2D arrays
-        elif 'type' in token and 'dim' in token and token['dim'] == 2 and 'size' in token:
-            value = numpy.array([list(map(imas_eval, row.split())) for row in token['value']]).T
+        # N-D arrays
+        elif 'type' in token and 'dim' in token and token['dim'] >= 1 and 'size' in token:
+            value = imas_eval_array(token.get('value', []), token)
         # ODS
         elif 'type' not in token and 'dim' in token:
             continue
 
-        ods[path] = value
+        if pfilter:
+            # the selected structures of arrays of structures are not necessarily the first ones
+            with omas_environment(ods, dynamic_path_creation='dynamic_array_structures'):
+                ods[path] = value
+        else:
+            ods[path] = value
+
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
 
     return ods
 
 
+def _load_omas_ascii_ids(item):
+    """
+    Load the IDSs file of an IDS (used by load_omas_ascii to load multiple IDSs files concurrently)
+
+    :param item: tuple with filename and paths_filter
+
+    :return: ODS with the data of the IDS
+    """
+    filename, pfilter = item
+    return load_omas_ascii(filename, paths=pfilter)
+
+
 def through_omas_ascii(ods, method=['function', 'class_method'][1], one_or_many_files=['one', 'many'][1]):
     """
     Test save and load OMAS ASCII
@@ -10,13 +10,15 @@ from .omas_utils import __version__, _extra_structures
 __all__ = [
     'ODS', 'ODC', 'ODX',
     'CodeParameters', 'codeparams_xml_save', 'codeparams_xml_load',
-    'ods_sample', 'different_ods', 'omas_structure',
-    'save_omas_pkl', 'load_omas_pkl', 'through_omas_pkl',
+    'ods_sample', 'different_ods', 'omas_structure', 'load_subset',
+    'save_omas_pkl', 'load_omas_pkl', 'through_omas_pkl', 'ods_to_buffers', 'ods_from_buffers',
     'save_omas_json', 'load_omas_json', 'through_omas_json',
     'save_omas_mongo', 'load_omas_mongo', 'through_omas_mongo',
     'save_omas_hdc', 'load_omas_hdc', 'through_omas_hdc',
     'save_omas_nc', 'load_omas_nc', 'through_omas_nc',
     'save_omas_h5', 'load_omas_h5', 'through_omas_h5',
+    'save_omas_zarr', 'load_omas_zarr', 'through_omas_zarr',
+    'save_omas_mmap', 'load_omas_mmap', 'through_omas_mmap',
     'save_omas_ascii', 'load_omas_ascii', 'through_omas_ascii',
     'save_omas_ds', 'load_omas_ds', 'through_omas_ds',
     'load_omas_dx', 'save_omas_dx', 'through_omas_dx', 'ods_2_odx', 'odx_2_ods',
@@ -73,19 +75,21 @@ def force_imas_type(value):
 _consistency_warnings = {}
 
 
-def consistency_checker(location, value, info, consistency_check, imas_version):
+def consistency_checker(location, value, info, consistency_check, imas_version, copy=True):
     """
     Print warnings or raise errors if object does not satisfy IMAS data dictionary
     Converts numeric data to INT/FLOAT depending on IMAS specifications
 
     :param value: value to check consistency of
 
-    :param info: output of omas_info_node
+    :param info: output of omas_info_node (or `.info` of the schema_node record)
 
     :param consistency_check: True, False, 'warn'
 
     :param imas_version: IMAS version
 
+    :param copy: always return a copy of numpy arrays (if False arrays are copied only when the data type needs to be converted)
+
     :return: value
     """
     # force type consistent with data dictionary
@@ -97,11 +101,11 @@ def consistency_checker(location, value, info, consistency_check, imas_version):
             value = ODS()
             value.omas_data = []
         elif 'FLT' in info['data_type']:
-            value = value.astype(float)
+            value = value.astype(float, copy=copy)
         elif 'INT' in info['data_type']:
-            value = value.astype(int)
+            value = value.astype(int, copy=copy)
         elif 'STR' in info['data_type']:
-            value = value.astype(str)
+            value = value.astype(str, copy=copy)
     elif isinstance(value, (int, float, numpy.integer, numpy.floating)):
         if 'FLT' in info['data_type']:
             value = float(value)
@@ -132,7 +136,7 @@ def consistency_checker(location, value, info, consistency_check, imas_version):
         and len(info['coordinates'])
         and (not isinstance(value, numpy.ndarray) or len(value.shape) != len(info['coordinates']))
     ):
-        txt = f'{location} shape {numpy.asarray(value).shape} is inconsistent with coordinates: {info["coordinates"]}'
+        txt = f'{location} shape {numpy.asarray(value).shape} is inconsistent with coordinates: {list(info["coordinates"])}'
 
     if len(txt) and consistency_check is True:
         raise ValueError(txt)
@@ -146,6 +150,11 @@ def consistency_checker(location, value, info, consistency_check, imas_version):
     return value, txt
 
 
+# formats that can save/load the IDSs concurrently (`max_workers` and `processes` keywords)
+_parallel_save_formats = ['ascii']
+_parallel_load_formats = ['ascii']
+
+
 def _handle_extension(*args, **kw):
     if args[0] == 'ascii':
         ext = 'ascii'
@@ -155,6 +164,9 @@ def _handle_extension(*args, **kw):
     elif '/' not in args[0] and '.' not in os.path.split(args[0])[1]:
         ext = args[0]
         args = args[1:]
+    # Zarr directory (possibly with trailing separator) or zip stores
+    elif os.path.splitext(args[0].rstrip('/' + os.sep))[-1] == '.zarr' or args[0].endswith('.zarr.zip'):
+        ext = 'zarr'
     else:
         ext = os.path.splitext(args[0])[-1].strip('.')
         if not ext:
@@ -169,6 +181,47 @@ def _handle_extension(*args, **kw):
     return ext, args
 
 
+# columnar storage of arrays of structures (see ODS.columnar)
+# {id(array of structures ODS): (weakref to the ODS, {path relative to each structure: stacked numpy array})}
+_aos_columns = {}
+
+# paths indexes that are alive (see ODS.paths_index), so that ODSs look up the index of their top-level ODS only if there is one
+_paths_indexes = weakref.WeakSet()
+
+# cache of COCOS normalization factors {(transform, cocosin, cocosout, absolute): norm}
+_cocos_norms = {}
+
+
+def _cocos_norm(transform, cocosin, cocosout, absolute=False):
+    """
+    Cached normalization factor of a COCOS transformation
+
+    :param transform: transformation (or list of transformations) as defined in omas_physics.cocos_signals
+
+    :param cocosin: input COCOS
+
+    :param cocosout: output COCOS
+
+    :param absolute: return the absolute value of the normalization factor (as used by `_error_upper` and `_error_lower` nodes)
+
+    :return: normalization factor (or read-only array of factors for a list of transformations)
+    """
+    key = (transform if isinstance(transform, str) else tuple(transform), cocosin, cocosout, absolute)
+    if key not in _cocos_norms:
+        if isinstance(transform, str):
+            norm = omas_physics._cocos_transform(cocosin, cocosout)[transform]
+        else:
+            norm = numpy.ones(len(transform))
+            for itf, tf in enumerate(transform):
+                norm[itf] = omas_physics._cocos_transform(cocosin, cocosout)[tf]
+        if absolute:
+            norm = abs(norm)
+        if isinstance(norm, numpy.ndarray):
+            norm.flags.writeable = False
+        _cocos_norms[key] = norm
+    return _cocos_norms[key]
+
+
 omas_ods_attrs = [
     '_consistency_check',
     '_imas_version',
@@ -190,11 +243,88 @@ class OmasDynamicException(RuntimeError):
     pass
 
 
+class PathsIndex(object):
+    """
+    Sorted index of the paths (as tuples) to the leaves of an ODS
+
+    NOTE: tuples of keys can always be compared with one another, since the first key that differs
+          between two paths belongs to the same ODS node, and thus is either an integer or a string in both paths.
+          This does not hold for arbitrary queries (eg. `equilibrium.0`), which raise a TypeError when compared.
+    """
+
+    __slots__ = ['sorted', 'lookup', '__weakref__']
+
+    def __init__(self, paths=()):
+        self.sorted = sorted(set(map(tuple, paths)))
+        self.lookup = set(self.sorted)
+        _paths_indexes.add(self)
+
+    def __len__(self):
+        return len(self.sorted)
+
+    def __contains__(self, path):
+        return path in self.lookup
+
+    def add(self, path):
+        """
+        Add a path to the index
+
+        :param path: tuple of keys
+        """
+        if path in self.lookup:
+            return
+        self.lookup.add(path)
+        if not self.sorted or path > self.sorted[-1]:
+            self.sorted.append(path)
+        else:
+            bisect.insort(self.sorted, path)
+
+    def update(self, paths):
+        """
+        Add paths to the index
+
+        :param paths: iterable of paths (lists or tuples of keys)
+        """
+        for path in paths:
+            self.add(tuple(path))
+
+    def _bounds(self, prefix):
+        start = stop = bisect.bisect_left(self.sorted, prefix)
+        n = len(prefix)
+        while stop < len(self.sorted) and self.sorted[stop][:n] == prefix:
+            stop += 1
+        return start, stop
+
+    def range(self, prefix):
+        """
+        :param prefix: tuple of keys
+
+        :return: sorted list of the paths that start with prefix
+        """
+        start, stop = self._bounds(prefix)
+        return self.sorted[start:stop]
+
+    def discard(self, prefix):
+        """
+        Remove from the index the paths that start with prefix
+
+        :param prefix: tuple of keys
+        """
+        start, stop = self._bounds(prefix)
+        if stop > start:
+            self.lookup.difference_update(self.sorted[start:stop])
+            del self.sorted[start:stop]
+
+
 class ODS(MutableMapping):
     """
     OMAS Data Structure class
     """
 
+    # an ODS is made of many nodes, so we keep them lean: attributes are stored in slots
+    # and the settings shared across the whole ODS (imas_version, cocos, *io) are read from the top-level node
+    __slots__ = ['omas_data'] + omas_ods_attrs + ['_paths_index', '__weakref__']
+
     def __init__(
         self,
         imas_version=omas_rcparams['default_imas_version'],
@@ -205,6 +335,7 @@ class ODS(MutableMapping):
         unitsio=None,
         uncertainio=None,
         dynamic=None,
+        paths_index=False,
     ):
         """
         :param imas_version: IMAS version to use as a constrain for the nodes names
@@ -222,8 +353,11 @@ class ODS(MutableMapping):
         :param uncertainio: ODS will return data with uncertainties if True
 
         :param dynamic: internal keyword used for dynamic data loading
+
+        :param paths_index: keep an index of the paths to the leaves of the ODS (see `ODS.paths_index`)
         """
         self.omas_data = None
+        self._paths_index = None
         self._consistency_check = consistency_check
         if consistency_check and imas_version not in imas_versions:
             raise ValueError("Unrecognized IMAS version `%s`. Possible options are:\n%s" % (imas_version, imas_versions.keys()))
@@ -235,6 +369,7 @@ class ODS(MutableMapping):
         self.unitsio = unitsio
         self.uncertainio = uncertainio
         self.dynamic = dynamic
+        self.paths_index = paths_index
 
     def homogeneous_time(self, key='', default=True):
         """
@@ -415,8 +550,8 @@ class ODS(MutableMapping):
                 continue
 
             # identify time-dependent data
-            info = omas_info_node(o2u(self.ulocation + '.' + str(item)))
-            if 'coordinates' in info and any(k.endswith('.time') for k in info['coordinates']):
+            coordinates = schema_node(o2u(self.ulocation + '.' + str(item)), self.imas_version).coordinates
+            if any(k.endswith('.time') for k in coordinates):
 
                 # time-dependent arrays
                 if not isinstance(self.getraw(item), ODS):
@@ -468,6 +603,12 @@ class ODS(MutableMapping):
     @parent.setter
     def parent(self, value):
         if value is None:
+            # a detached ODS becomes a top-level ODS, so it keeps the settings that it inherited
+            if self._parent is not None:
+                top = self.top
+                if top is not self:
+                    for item in ['_imas_version', '_cocos', '_cocosio', '_coordsio', '_unitsio', '_uncertainio']:
+                        setattr(self, item, getattr(top, item))
             self._parent = None
         else:
             self._parent = weakref.ref(value)
@@ -508,10 +649,11 @@ class ODS(MutableMapping):
         Property which returns instance of top level ODS
         """
         top = self
-        parent = self.parent
-        while parent is not None:
+        while top._parent is not None:
+            parent = top._parent()
+            if parent is None:
+                break
             top = parent
-            parent = parent.parent
         return top
 
     @property
@@ -528,13 +670,10 @@ class ODS(MutableMapping):
 
         :return: string with imas_version
         """
-        if not hasattr(self, '_imas_version'):
-            self._imas_version = omas_rcparams['default_imas_version']
         top = self.top
         if top._imas_version is None:
             top._imas_version = omas_rcparams['default_imas_version']
-        self._imas_version = top._imas_version
-        return self._imas_version
+        return top._imas_version
 
     @imas_version.setter
     def imas_version(self, imas_version_value):
@@ -549,8 +688,6 @@ class ODS(MutableMapping):
 
         :return: True/False/'warn'/'drop'/'strict' or a combination of those strings
         """
-        if not hasattr(self, '_consistency_check'):
-            self._consistency_check = omas_rcparams['consistency_check']
         return self._consistency_check
 
     @consistency_check.setter
@@ -625,8 +762,11 @@ class ODS(MutableMapping):
                         # check that value is consistent
                         if not isinstance(self.getraw(item), ODS):
                             location = l2o([location] + [item])
-                            info = omas_info_node(o2u(location), imas_version=self.imas_version)
-                            value, txt = consistency_checker(location, self.getraw(item), info, consistency_value, self.imas_version)
+                            info = schema_node(o2u(location), self.imas_version).info
+                            # data is already in the ODS, so arrays do not need to be copied (eg. memory-mapped arrays)
+                            value, txt = consistency_checker(
+                                location, self.getraw(item), info, consistency_value, self.imas_version, copy=False
+                            )
                             if not len(txt):
                                 pass
                             elif isinstance(consistency_value, str) and ('warn' in consistency_value or 'drop' in consistency_value):
@@ -658,13 +798,10 @@ class ODS(MutableMapping):
         """
         property that tells in what COCOS format the data is stored internally of the ODS
         """
-        if not hasattr(self, '_cocos'):
-            self._cocos = omas_rcparams['cocos']
         top = self.top
         if top._cocos is None:
             top._cocos = omas_rcparams['cocos']
-        self._cocos = top._cocos
-        return self._cocos
+        return top._cocos
 
     @cocos.setter
     def cocos(self, cocos_value):
@@ -677,13 +814,10 @@ class ODS(MutableMapping):
         """
         property that tells in what COCOS format the data will be input/output
         """
-        if not hasattr(self, '_cocosio'):
-            self._cocosio = omas_rcparams['cocos']
         top = self.top
         if top._cocosio is None:
             top._cocosio = omas_rcparams['cocos']
-        self._cocosio = top._cocosio
-        return self._cocosio
+        return top._cocosio
 
     @cocosio.setter
     def cocosio(self, cocosio_value):
@@ -696,13 +830,10 @@ class ODS(MutableMapping):
         """
         property that if data should be returned with units or not
         """
-        if not hasattr(self, '_unitsio'):
-            self._unitsio = {}
         top = self.top
         if top._unitsio is None:
             top._unitsio = {}
-        self._unitsio = top._unitsio
-        return self._unitsio
+        return top._unitsio
 
     @unitsio.setter
     def unitsio(self, unitsio_value):
@@ -715,13 +846,10 @@ class ODS(MutableMapping):
         """
         property that if data should be returned with units or not
         """
-        if not hasattr(self, '_uncertainio'):
-            self._uncertainio = {}
         top = self.top
         if top._uncertainio is None:
             top._uncertainio = {}
-        self._uncertainio = top._uncertainio
-        return self._uncertainio
+        return top._uncertainio
 
     @uncertainio.setter
     def uncertainio(self, uncertainio_value):
@@ -734,13 +862,10 @@ class ODS(MutableMapping):
         """
         property that tells in what COCOS format the data will be input/output
         """
-        if not hasattr(self, '_coordsio'):
-            self._coordsio = {}
         top = self.top
         if top._coordsio is None:
             top._coordsio = {}
-        self._coordsio = top._coordsio
-        return self._coordsio
+        return top._coordsio
 
     @coordsio.setter
     def coordsio(self, coordsio_value):
@@ -753,11 +878,7 @@ class ODS(MutableMapping):
         """
         property that point to dynamic_ODS object
         """
-        if not hasattr(self, '_dynamic'):
-            self._coordsio = None
-        top = self.top
-        self._dynamic = top._dynamic
-        return self._dynamic
+        return self.top._dynamic
 
     @property
     def active_dynamic(self):
@@ -772,6 +893,55 @@ class ODS(MutableMapping):
     def dynamic(self, dynamic_value):
         self.top._dynamic = dynamic_value
 
+    @property
+    def paths_index(self):
+        """
+        property that tells whether the top-level ODS keeps an index of the paths to its leaves
+
+        When enabled, the index is kept up to date by `setraw`, `__delitem__` and `clear`, and it is used by
+        `paths()` (and thus by `full_paths()`, `search_paths()`, `flat()`, ...) and `__contains__`
+        instead of traversing the ODS.
+        NOTE: changes made by directly manipulating the `.omas_data` of the ODS nodes are not tracked
+        """
+        return self.top._paths_index is not None
+
+    @paths_index.setter
+    def paths_index(self, paths_index_value):
+        top = self.top
+        if not paths_index_value:
+            top._paths_index = None
+        elif isinstance(top, ODC):
+            raise TypeError('Paths index is not supported for ODC objects')
+        else:
+            top._paths_index = None
+            top._paths_index = PathsIndex(top.paths(traverse_code_parameters=False))
+
+    def _top_paths_index(self):
+        """
+        :return: paths index of the top-level ODS (None if it does not keep one)
+        """
+        # the top-level ODS is not looked up when no paths index exists
+        if not _paths_indexes:
+            return None
+        return self.top._paths_index
+
+    def _update_paths_index(self, key):
+        """
+        Update the paths index of the top-level ODS after `key` of this ODS is set
+
+        :param key: key of this ODS that was set
+        """
+        index = self._top_paths_index()
+        if index is None:
+            return
+        path = p2t(self.location) + (key,)
+        index.discard(path)
+        value = self.omas_data[key]
+        if isinstance(value, ODS):
+            index.update(value.paths(traverse_code_parameters=False, path=list(path)))
+        else:
+            index.add(path)
+
     @property
     def ulocation(self):
         """
@@ -861,12 +1031,13 @@ class ODS(MutableMapping):
 
         # full path where we want to place the data
         location = l2o([self.location, key[0]])
+        ulocation = o2u(location)
 
         # perform consistency check with IMAS structure
         if self.consistency_check and '.code.parameters.' not in location:
             structure_key = key[0] if not isinstance(key[0], int) else ':'
             try:
-                structure = imas_structure(self.imas_version, location)
+                structure = imas_structure(self.imas_version, ulocation)
                 if isinstance(value, ODS):
                     if value.omas_data is None and not len(structure) and '.code.parameters' not in location:
                         raise ValueError('`%s` has no data' % location)
@@ -924,37 +1095,29 @@ class ODS(MutableMapping):
 
             # now that all checks are completed we can assign the structure information
             if self.consistency_check and '.code.parameters.' not in location:
-                ulocation = o2u(location)
-                blocation = re.sub(r'_error_(upper|lower)$', '', ulocation)
+                # get node information
+                node = schema_node(ulocation, self.imas_version)
+                info = node.info
 
                 # handle cocos transformations coming in
                 if (
-                    self.cocosio
+                    node.cocos_signal is not None
+                    and self.cocosio
                     and self.cocosio != self.cocos
                     and '.' in location
-                    and blocation in omas_physics.cocos_signals
                     and not isinstance(value, ODS)
                 ):
-                    transform = omas_physics.cocos_signals[blocation]
-                    if isinstance(transform, list):
-                        norm = np.ones(len(transform))
-                        for itf, tf in enumerate(transform):
-                            norm[itf] = omas_physics.cocos_transform(self.cocosio, self.cocos)[tf]
-                    elif transform == '?':
+                    transform = omas_physics.cocos_signals[node.cocos_location]
+                    if transform == '?':
                         if isinstance(self.consistency_check, str) and 'warn' in self.consistency_check:
-                            printe('COCOS translation has not been setup: %s' % blocation)
+                            printe('COCOS translation has not been setup: %s' % node.cocos_location)
                             norm = 1.0
                         else:
-                            raise ValueError('COCOS translation has not been setup: %s' % blocation)
-
+                            raise ValueError('COCOS translation has not been setup: %s' % node.cocos_location)
                     else:
-                        norm = omas_physics.cocos_transform(self.cocosio, self.cocos)[transform]
-                    norm = norm if blocation == ulocation else abs(norm)
+                        norm = _cocos_norm(transform, self.cocosio, self.cocos, node.cocos_location != ulocation)
                     value = value * norm
 
-                # get node information
-                info = omas_info_node(ulocation, imas_version=self.imas_version)
-
                 # handle units (Python pint package)
                 if str(value.__class__).startswith("<class 'pint."):
                     import pint
@@ -1089,14 +1252,16 @@ class ODS(MutableMapping):
         """
         if cls is None:
             cls = self.__class__
-        return cls(
-            imas_version=self.imas_version,
-            consistency_check=self._consistency_check,
-            cocos=self._cocos,
-            cocosio=self._cocosio,
-            coordsio=self._coordsio,
-            dynamic=self.dynamic,
-        )
+        # the settings shared across the ODS are read from the top-level ODS once the new ODS is attached to this one,
+        # but a copy of the ones that describe the data is kept, so that they are not lost if the top-level ODS is garbage collected
+        ods = cls.__new__(cls)
+        ods.omas_data = None
+        ods._consistency_check = self._consistency_check
+        ods._imas_version = self.imas_version
+        ods._cocos = self.cocos
+        ods._cocosio = ods._coordsio = ods._unitsio = ods._uncertainio = None
+        ods._dynamic = ods._parent = ods._paths_index = None
+        return ods
 
     def setraw(self, key, value):
         """
@@ -1110,6 +1275,10 @@ class ODS(MutableMapping):
 
         :return: value
         """
+        # data assigned to an array of structures reverts it from columnar storage
+        if _aos_columns:
+            self._drop_columns()
+
         # accept path as list of keys
         if isinstance(key, list):
             if len(key) > 1:
@@ -1126,6 +1295,7 @@ class ODS(MutableMapping):
             if value.parent is not None:
                 value = copy.deepcopy(value)
             value.parent = self
+            value._paths_index = None
 
         # structure
         if isinstance(key, str) or isinstance(self, ODC):
@@ -1141,8 +1311,10 @@ class ODS(MutableMapping):
                 else:
                     self.omas_data[key] = nominal_values(value)
                     self.omas_data[key + '_error_upper'] = std_devs(value)
+                self._update_paths_index(key + '_error_upper')
             else:
                 self.omas_data[key] = value
+            self._update_paths_index(key)
 
         # arrays of structures
         else:
@@ -1168,9 +1340,10 @@ class ODS(MutableMapping):
                         '`%s[%d]` but maximum index is %d\nPerhaps you want to use `with omas_environment(ods, dynamic_path_creation=\'dynamic_array_structures\')'
                         % (self.location, key, len(self.omas_data) - 1)
                     )
+            self._update_paths_index(key)
         return value
 
-    def __getitem__(self, key, cocos_and_coords=True):
+    def __getitem__(self, key, cocos_and_coords=True, _top=None):
         """
         ODS getitem method allows support for different syntaxes to access data
 
@@ -1190,6 +1363,8 @@ class ODS(MutableMapping):
               * False: enabled COCOS and disabled interpolation
               * None: disabled COCOS and disabled interpolation
 
+        :param _top: top-level ODS (passed down while traversing a path, so that it is not looked up again at each level)
+
         :return: ODS value
         """
 
@@ -1224,22 +1399,32 @@ class ODS(MutableMapping):
 
         dynamically_created = False
 
+        # data slicing of arrays of structures in columnar storage
+        if isinstance(key[0], slice) and _aos_columns and id(self) in _aos_columns:
+            column = self._column(key[1:])
+            if (
+                column is not None
+                and not self.active_dynamic
+                and not self.coordsio
+                and not self.unitsio
+                and not self.uncertainio
+                and (cocos_and_coords is None or self.cocosio == self.cocos)
+            ):
+                return column[key[0]]
+
         # data slicing
         # NOTE: OMAS will try to return numpy arrays if the sliced data can be stacked in a uniform array
         # otherwise a list will be returned (that's where we do `return data0` below)
         if isinstance(key[0], slice):
-            data0 = []
-            for k in self.keys(dynamic=1)[key[0]]:
-                try:
-                    data0.append(self.__getitem__([k] + key[1:], cocos_and_coords))
-                except ValueError:
-                    data0.append([])
+            data0 = self._gather(key, cocos_and_coords)
             # raise an error if no data is returned
             if not len(data0):
                 raise ValueError('`%s` has no data' % self.location)
 
             # if they are filled but do not have the same number of dimensions
-            shapes = [numpy.asarray(item).shape for item in data0 if numpy.asarray(item).size]
+            arrays = [numpy.asarray(item) for item in data0]
+            filled = [array for array in arrays if array.size]
+            shapes = [array.shape for array in filled]
             if not len(shapes):
                 return numpy.asarray(data0)
             if not all(len(shape) == len(shapes[0]) for shape in shapes[1:]):
@@ -1256,9 +1441,7 @@ class ODS(MutableMapping):
             max_shape = tuple([len(data0)] + max_shape)
 
             # find types
-            dtypes = [numpy.asarray(item).dtype for item in data0 if numpy.asarray(item).size]
-            if not len(dtypes):
-                return numpy.asarray(data0)
+            dtypes = [array.dtype for array in filled]
             if not all(dtype.char == dtypes[0].char for dtype in dtypes[1:]):
                 return data0
             dtype = dtypes[0]
@@ -1278,11 +1461,14 @@ class ODS(MutableMapping):
                 raise ValueError('Not an IMAS data type %s' % dtype.char)
 
             # place the data in the empty array
-            if len(max_shape) == 1:
+            if len(filled) == len(data0) and all(array.shape == max_shape[1:] for array in arrays):
+                # all the data has the same shape
+                data[...] = numpy.stack(arrays)
+            elif len(max_shape) == 1:
                 for k, item in enumerate(data0):
                     if isinstance(item, list):  # item is [] if a subtree was missing in one of the slices
                         return data0
-                    data[k] = numpy.asarray(item).item()
+                    data[k] = arrays[k].item()
             else:
                 for k, item in enumerate(data0):
                     if not sum(numpy.squeeze(item).shape):
@@ -1321,7 +1507,7 @@ class ODS(MutableMapping):
             # if the user has entered a path rather than a single key
             try:
                 if isinstance(value, ODS):
-                    return value.__getitem__(key[1:], cocos_and_coords)
+                    return value.__getitem__(key[1:], cocos_and_coords, self.top if _top is None else _top)
                 else:
                     return value[l2o(key[1:])]
             except ValueError:  # ValueError is raised when nodes have no data
@@ -1329,38 +1515,41 @@ class ODS(MutableMapping):
                     del self[key[0]]
                 raise
         else:
-
-            if cocos_and_coords is not None and self.consistency_check and not isinstance(value, ODS):
+            # the transforms of the ODS environment are resolved once from the top-level ODS,
+            # and the processing of the data on the way out is skipped altogether if none of them is active
+            top = self.top if _top is None else _top
+            if (
+                cocos_and_coords is not None
+                and self.consistency_check
+                and not isinstance(value, ODS)
+                and ((top.cocosio and top.cocosio != top.cocos) or (cocos_and_coords and top.coordsio) or top.unitsio)
+            ):
 
                 location = l2o([self.location, key[0]])
                 ulocation = o2u(location)
-                blocation = re.sub(r'_error_(upper|lower)$', '', ulocation)
+
+                # get node information
+                node = schema_node(ulocation, self.imas_version)
+                info = node.info
 
                 # handle cocos transformations going out
-                if self.cocosio and self.cocosio != self.cocos and '.' in location and blocation in omas_physics.cocos_signals:
-                    transform = omas_physics.cocos_signals[blocation]
+                if node.cocos_signal is not None and top.cocosio and top.cocosio != top.cocos and '.' in location:
+                    transform = omas_physics.cocos_signals[node.cocos_location]
                     if isinstance(transform, list):
-                        norm = numpy.ones(len(transform))
-                        for itf, tf in enumerate(transform):
-                            norm[itf] = omas_physics.cocos_transform(self.cocosio, self.cocos)[tf]
+                        norm = _cocos_norm(transform, top.cocosio, top.cocos, node.cocos_location != ulocation)
                     elif transform == '?':
                         if self.consistency_check == 'warn':
-                            printe('COCOS translation has not been setup: %s' % blocation)
+                            printe('COCOS translation has not been setup: %s' % node.cocos_location)
                             norm = 1.0
                         else:
-                            raise ValueError('COCOS translation has not been setup: %s' % blocation)
-
+                            raise ValueError('COCOS translation has not been setup: %s' % node.cocos_location)
                     else:
-                        norm = omas_physics.cocos_transform(self.cocos, self.cocosio)[transform]
-                    norm = norm if blocation == ulocation else abs(norm)
+                        norm = _cocos_norm(transform, top.cocos, top.cocosio, node.cocos_location != ulocation)
                     value = value * norm
 
-                # get node information
-                info = omas_info_node(ulocation, imas_version=self.imas_version)
-
                 # coordinates interpolation
-                ods_coordinates = self.top
-                output_coordinates = self.coordsio
+                ods_coordinates = top
+                output_coordinates = top.coordsio
                 if cocos_and_coords and output_coordinates:
                     all_coordinates = []
                     coordinates = []
@@ -1426,7 +1615,7 @@ class ODS(MutableMapping):
                         value = output_coordinates.__getitem__(location, False)
 
                 # handle units (Python pint package)
-                if 'units' in info and self.unitsio:
+                if 'units' in info and top.unitsio:
                     import pint
                     from .omas_setup import ureg
 
@@ -1437,7 +1626,7 @@ class ODS(MutableMapping):
                     value = value * getattr(ureg[0], info['units'])
 
             # return uncertain array if errors are filled
-            if self.uncertainio and isinstance(key[0], str) and key[0] + '_error_upper' in self:
+            if top.uncertainio and isinstance(key[0], str) and key[0] + '_error_upper' in self:
                 if key[0] + '_error_lower' in self:
                     raise TypeError(f"Error for {self.location+'.'+key[0]} is not symmetrical")
                 error_upper = self.__getitem__(key[0] + '_error_upper', cocos_and_coords)
@@ -1448,6 +1637,49 @@ class ODS(MutableMapping):
 
             return value
 
+    def _gather(self, key, cocos_and_coords=True):
+        """
+        Collect the data of the structures addressed by a slice in a single traversal
+
+        Leaves are read directly from the structures when they do not need any processing on the way out
+        (COCOS, coordinates, units, uncertainties, dynamic loading). Otherwise, or if a structure
+        does not have the requested data, this falls back on __getitem__ for that structure.
+
+        :param key: list of keys, the first of which is a slice
+
+        :param cocos_and_coords: processing of cocos transforms and coordinates interpolations (see __getitem__)
+
+        :return: list with the data of each of the sliced structures ([] for structures that have no data)
+        """
+        rest = key[1:]
+        raw = not (self.active_dynamic or self.coordsio or self.unitsio or self.uncertainio) and (
+            cocos_and_coords is None or self.cocosio == self.cocos
+        )
+        data0 = []
+        for k in self.keys(dynamic=1)[key[0]]:
+            try:
+                if not raw:
+                    raise KeyError(k)
+                value = self.omas_data[k]
+                for kstep, step in enumerate(rest):
+                    # nested slices
+                    if isinstance(step, str) and ':' in step:
+                        value = value.__getitem__(rest[kstep:], cocos_and_coords)
+                        break
+                    value = value.omas_data[step]
+                else:
+                    if isinstance(value, ODS):
+                        raise KeyError(k)
+                data0.append(value)
+            except ValueError:
+                data0.append([])
+            except (LookupError, AttributeError, TypeError):
+                try:
+                    data0.append(self.__getitem__([k] + rest, cocos_and_coords))
+                except ValueError:
+                    data0.append([])
+        return data0
+
     def __delitem__(self, key):
         # handle individual keys as well as full paths
         key = p2l(key)
@@ -1455,7 +1687,20 @@ class ODS(MutableMapping):
             # if the user has entered path rather than a single key
             del self.getraw(key[0])[key[1:]]
         else:
-            return self.omas_data.__delitem__(key[0])
+            if _aos_columns:
+                self._drop_columns()
+            index = self._top_paths_index()
+            if index is None:
+                return self.omas_data.__delitem__(key[0])
+            location = p2t(self.location)
+            if isinstance(self.omas_data, list):
+                # deleting from an array of structures shifts the indexes of the structures that follow
+                self.omas_data.__delitem__(key[0])
+                index.discard(location)
+                index.update(self.paths(traverse_code_parameters=False, path=list(location)))
+            else:
+                self.omas_data.__delitem__(key[0])
+                index.discard(location + (key[0],))
 
     def paths(self, return_empty_leaves=False, traverse_code_parameters=True, include_structures=False, dynamic=True, verbose=False, **kw):
         """
@@ -1476,6 +1721,11 @@ class ODS(MutableMapping):
             get_func = self.__getitem__
         else:
             get_func = self.getraw
+            # answer from the paths index
+            if not (kw or return_empty_leaves or include_structures or verbose):
+                index = self._top_paths_index()
+                if index is not None:
+                    return self._indexed_paths(index, traverse_code_parameters)
 
         paths = kw.setdefault('paths', [])
         path = kw.setdefault('path', [])
@@ -1508,6 +1758,126 @@ class ODS(MutableMapping):
             paths.append(path)
         return paths
 
+    def columnar(self):
+        """
+        Store the arrays of structures within this ODS in columnar form:
+        numerical leaves that have the same shape and data type across all the structures
+        of an array of structures are stacked in a single numpy array (with the array of structures index as first dimension),
+        and array leaves of the individual structures become views of it.
+
+        Slicing (eg. `ods['equilibrium.time_slice.:.profiles_1d.psi']`) then returns a view of the stacked array
+        instead of looping over the structures, while accessing individual structures works as usual.
+        Stacked scalars are returned as read-only arrays, since the individual scalar leaves are not views.
+        Assigning or deleting data within an array of structures reverts it to the standard storage.
+
+        :return: number of stacked leaves
+        """
+        n = 0
+        if isinstance(self.omas_data, list) and len(self.omas_data):
+            n += self._stack_columns()
+        for item in self.keys(dynamic=0):
+            if isinstance(self.getraw(item), ODS):
+                n += self.getraw(item).columnar()
+        return n
+
+    def _stack_columns(self):
+        """
+        Stack the leaves of this array of structures (see ODS.columnar)
+
+        :return: number of stacked leaves
+        """
+        structures = self.omas_data
+        if not all(isinstance(structure, ODS) for structure in structures):
+            return 0
+
+        columns = {}
+        for path in structures[0].paths(traverse_code_parameters=False, dynamic=False):
+            # nested arrays of structures are stacked on their own
+            if any(isinstance(k, int) for k in path):
+                continue
+            nodes = []
+            values = []
+            for structure in structures:
+                try:
+                    h = structure
+                    for k in path[:-1]:
+                        h = h.getraw(k)
+                    values.append(h.getraw(path[-1]))
+                    nodes.append(h)
+                except (LookupError, AttributeError):
+                    break
+            if len(values) != len(structures):
+                continue
+            value = values[0]
+            if isinstance(value, numpy.ndarray):
+                if value.dtype.kind not in 'biufc' or not all(
+                    isinstance(item, numpy.ndarray) and item.shape == value.shape and item.dtype == value.dtype for item in values
+                ):
+                    continue
+                column = numpy.stack(values)
+                for k, h in enumerate(nodes):
+                    h.omas_data[path[-1]] = column[k]
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if not all(type(item) is type(value) for item in values):
+                    continue
+                column = numpy.array(values)
+                column.flags.writeable = False
+            else:
+                continue
+            columns[tuple(path)] = column
+
+        if columns:
+            key = id(self)
+            _aos_columns[key] = (weakref.ref(self, lambda ref: _aos_columns.pop(key, None)), columns)
+        return len(columns)
+
+    def _column(self, path):
+        """
+        :param path: path relative to the structures of this array of structures
+
+        :return: stacked numpy array for path, or None if this is not available
+        """
+        ref, columns = _aos_columns.get(id(self), (None, {}))
+        if ref is None or ref() is not self:
+            return None
+        column = columns.get(tuple(path), None)
+        if column is None or len(column) != len(self.omas_data):
+            return None
+        return column
+
+    def _drop_columns(self):
+        """
+        Revert this ODS and its parents from columnar storage
+        """
+        h = self
+        while h is not None:
+            _aos_columns.pop(id(h), None)
+            h = h.parent
+
+    def _indexed_paths(self, index, traverse_code_parameters=True):
+        """
+        Return paths to the leaves of this ODS from the paths index of the top-level ODS
+
+        :param index: PathsIndex of the top-level ODS
+
+        :param traverse_code_parameters: traverse code parameters
+
+        :return: list of paths that have data
+        """
+        n = len(p2t(self.location))
+        paths = []
+        for path in index.range(p2t(self.location)):
+            path = list(path[n:])
+            if traverse_code_parameters and path[-1] == 'parameters':
+                value = self
+                for k in path:
+                    value = value.getraw(k)
+                if isinstance(value, CodeParameters):
+                    value.paths(paths=paths, path=path)
+                    continue
+            paths.append(path)
+        return paths
+
     def pretty_paths(self, **kw):
         r"""
         Traverse the ods and return paths that have data formatted nicely
@@ -1562,6 +1932,18 @@ class ODS(MutableMapping):
         key = p2l(key)
         h = self
 
+        # leaves and structures with leaves are found in the paths index
+        index = self._top_paths_index()
+        if index is not None and len(key) and not self.active_dynamic:
+            if all((isinstance(k, str) and ':' not in k) or (isinstance(k, int) and k >= 0) for k in key):
+                path = p2t(self.location) + tuple(key)
+                try:
+                    if path in index or len(index.range(path)):
+                        return True
+                except TypeError:
+                    # the query mixes strings and integers where the stored paths do not (see PathsIndex)
+                    pass
+
         for c, k in enumerate(key):
             # h.omas_data is None when dict/list behaviour is not assigned
             if h.omas_data is not None and k in h.keys(dynamic=0):
@@ -1691,20 +2073,27 @@ class ODS(MutableMapping):
         return self[key]
 
     def __getstate__(self):
-        state = {}
-        for item in ['omas_data'] + omas_ods_attrs:
-            if item in self.__dict__:
-                # we do not want to carry with us this information
-                if item in ['_cocosio', '_coordsio', '_unitsio', '_uncertainio', '_parent', '_dynamic']:
-                    state[item] = None
-                else:
-                    state[item] = self.__dict__[item]
+        state = {'omas_data': self.omas_data}
+        for item in omas_ods_attrs:
+            # we do not want to carry with us this information
+            if item in ['_cocosio', '_coordsio', '_unitsio', '_uncertainio', '_parent', '_dynamic']:
+                continue
+            # settings that are not set are not stored
+            elif getattr(self, item, None) is not None:
+                state[item] = getattr(self, item)
+        # a pickled subtree becomes a top-level ODS, so it carries the settings that it inherits
+        if self.parent is not None:
+            state['_imas_version'] = self.imas_version
+            state['_cocos'] = self.cocos
+            state['_consistency_check'] = self.consistency_check
+        if self._paths_index is not None:
+            state['_paths_index'] = True
         return state
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
-        for item in omas_ods_attrs:
-            self.__dict__.setdefault(item, None)
+        for item in ['omas_data'] + omas_ods_attrs:
+            setattr(self, item, state.get(item, None))
+        self._paths_index = None
         if isinstance(self.omas_data, list):
             for value in self.omas_data:
                 if isinstance(value, ODS):
@@ -1713,9 +2102,23 @@ class ODS(MutableMapping):
             for key in self.omas_data:
                 if isinstance(self.omas_data[key], ODS):
                     self.omas_data[key].parent = self
+        if state.get('_paths_index', False):
+            self.paths_index = True
         return self
 
     def __deepcopy__(self, memo):
+        tmp = self._deepcopy(memo)
+        # the copy is a top-level ODS
+        tmp._imas_version = self.imas_version
+        tmp._cocos = self.cocos
+        tmp._cocosio = self.cocosio
+        tmp._coordsio = self.coordsio
+        tmp._dynamic = self.dynamic
+        if self.paths_index:
+            tmp.paths_index = True
+        return tmp
+
+    def _deepcopy(self, memo):
         tmp = self.same_init_ods()
         memo[id(self)] = tmp
         if self.omas_data is None:
@@ -1723,13 +2126,13 @@ class ODS(MutableMapping):
         elif isinstance(self.omas_data, list):
             tmp.omas_data = []
             for k, value in enumerate(self.omas_data):
-                tmp.omas_data.append(value.__deepcopy__(memo=memo))
+                tmp.omas_data.append(value._deepcopy(memo=memo))
                 tmp.omas_data[k].parent = tmp
         else:
             tmp.omas_data = {}
             for key in self.omas_data:
                 if isinstance(self.omas_data[key], ODS):
-                    tmp.omas_data[key] = self[key].__deepcopy__(memo=memo)
+                    tmp.omas_data[key] = self.getraw(key)._deepcopy(memo=memo)
                     tmp.omas_data[key].parent = tmp
                 else:
                     tmp.omas_data[key] = copy.deepcopy(self[key], memo=memo)
@@ -1747,10 +2150,15 @@ class ODS(MutableMapping):
 
         :return: current ODS object
         """
+        if _aos_columns:
+            self._drop_columns()
         if isinstance(self.omas_data, dict):
             self.omas_data.clear()
         elif isinstance(self.omas_data, list):
             self.omas_data[:] = []
+        index = self._top_paths_index()
+        if index is not None:
+            index.discard(p2t(self.location))
         return self
 
     def copy_attrs_from(self, ods):
@@ -1762,8 +2170,10 @@ class ODS(MutableMapping):
         :return: self
         """
         for item in omas_ods_attrs:
-            if item not in ['_parent', '_dynamic']:
-                setattr(self, item, getattr(ods, item, None))
+            if item not in ['_parent', '_dynamic', '_consistency_check']:
+                # settings shared across the ODS are read from (and set in) the top-level ODS
+                setattr(self, item[1:], getattr(ods, item[1:]))
+        self._consistency_check = ods._consistency_check
         return self
 
     def prune(self):
@@ -1781,6 +2191,83 @@ class ODS(MutableMapping):
                     del self[item]
         return n
 
+    def cocos_convert(self, cocos, cocosin=None):
+        """
+        Convert in place the data of this ODS to a different COCOS convention
+
+        The leaves that have a COCOS transformation are collected in a single pass over the ODS
+        and are multiplied by the cached transformation factors. The data is modified only after
+        all the transformations have been collected, so the ODS is left untouched if one of them is not defined.
+        When called on the top-level ODS, the `cocos` and `cocosio` attributes are set to the new COCOS convention.
+
+        :param cocos: COCOS convention to convert the data to
+
+        :param cocosin: COCOS convention the data is stored in (`cocos` attribute of the ODS if None)
+
+        :return: number of leaves that were converted
+        """
+        if cocosin is None:
+            cocosin = self.cocos
+        updates = []
+        if cocos != cocosin:
+            self._cocos_updates(o2u(self.location), cocosin, cocos, self.imas_version, updates)
+        dropped = set()
+        for node, key, value in updates:
+            node.omas_data[key] = value
+            if id(node) not in dropped:
+                dropped.add(id(node))
+                node._drop_columns()
+        if self.parent is None:
+            self.cocos = cocos
+            self.cocosio = cocos
+        return len(updates)
+
+    def _cocos_updates(self, ulocation, cocosin, cocosout, imas_version, updates):
+        """
+        Collect the COCOS transformations of the leaves of this ODS (see ODS.cocos_convert)
+
+        :param ulocation: universal location of this ODS
+
+        :param cocosin: COCOS convention the data is stored in
+
+        :param cocosout: COCOS convention to convert the data to
+
+        :param imas_version: imas version of the data structure
+
+        :param updates: list where the tuples (ODS, key, transformed value) are appended
+        """
+        if self.omas_data is None:
+            return
+        elif isinstance(self.omas_data, list):
+            items = enumerate(self.omas_data)
+        else:
+            items = self.omas_data.items()
+        for item, value in items:
+            uitem = ':' if isinstance(item, int) else item
+            location = ulocation + '.' + uitem if ulocation else uitem
+            if isinstance(value, ODS):
+                value._cocos_updates(location, cocosin, cocosout, imas_version, updates)
+                continue
+            elif '.' not in location or '.code.parameters' in location or isinstance(value, CodeParameters):
+                continue
+            node = schema_node(location, imas_version)
+            if node.cocos_signal is None:
+                continue
+            # same conversion that is applied when reading data stored in `cocosin` with cocosio=`cocosout`
+            transform = omas_physics.cocos_signals[node.cocos_location]
+            if isinstance(transform, list):
+                norm = _cocos_norm(transform, cocosout, cocosin, node.cocos_location != location)
+            elif transform == '?':
+                if isinstance(self.consistency_check, str) and 'warn' in self.consistency_check:
+                    printe('COCOS translation has not been setup: %s' % node.cocos_location)
+                    continue
+                raise ValueError('COCOS translation has not been setup: %s' % node.cocos_location)
+            else:
+                norm = _cocos_norm(transform, cocosin, cocosout, node.cocos_location != location)
+            if numpy.all(norm == 1):
+                continue
+            updates.append((self, item, value * norm))
+
     def set_time_array(self, key, time_index, value):
         """
         Convenience function for setting time dependent arrays
@@ -1818,8 +2305,7 @@ class ODS(MutableMapping):
         :param ods2: dictionary or ODS to be added into the ODS
         """
         if isinstance(ods2, ODS):
-            for item in ods2.paths():
-                self[item] = ods2[item]
+            self.from_flat(ods2.flat())
         else:
             with omas_environment(self, dynamic_path_creation='dynamic_array_structures'):
                 for item in ods2.keys():
@@ -2076,9 +2562,13 @@ class ODS(MutableMapping):
         r"""
         Save OMAS data
 
-        :param filename: filename.XXX where the extension is used to select save format method (eg. 'pkl','nc','h5','ds','json','ids')
+        :param filename: filename.XXX where the extension is used to select save format method (eg. 'pkl','nc','h5','zarr','mmap','ds','json','ids')
                          set to `imas`, `s3`, `hdc`, `mongo` for load methods that do not have a filename with extension
 
+        :param max_workers: number of IDSs that are saved concurrently, for the formats that support it (eg. `ascii` with multiple files)
+
+        :param processes: use a pool of processes instead of a pool of threads to save IDSs concurrently
+
         :param \*args: extra arguments passed to save_omas_XXX() method
 
         :param \**kw: extra keywords passed to save_omas_XXX() method
@@ -2087,6 +2577,10 @@ class ODS(MutableMapping):
         """
         # figure out format used
         ext, args = _handle_extension(*args)
+        # other formats are saved serially
+        if ext not in _parallel_save_formats:
+            kw.pop('max_workers', None)
+            kw.pop('processes', None)
         # save
         return eval('save_omas_' + ext)(self, *args, **kw)
 
@@ -2094,11 +2588,21 @@ class ODS(MutableMapping):
         r"""
         Load OMAS data
 
-        :param filename: filename.XXX where the extension is used to select load format method (eg. 'pkl','nc','h5','ds','json','ids')
+        :param filename: filename.XXX where the extension is used to select load format method (eg. 'pkl','nc','h5','zarr','mmap','ds','json','ids')
                          set to `imas`, `s3`, `hdc`, `mongo` for save methods that do not have a filename with extension
 
         :param consistency_check: perform consistency check once the data is loaded
 
+        :param max_workers: number of IDSs that are loaded concurrently, for the formats that support it (`ascii` with multiple files)
+
+        :param processes: use a pool of processes instead of a pool of threads to load IDSs concurrently
+
+        :param paths: list of paths to load (see paths_filter), for the formats that support it (all but `hdc` and `machine`)
+
+        :param time: time [s] at which the loaded IDSs are sliced (see load_subset)
+
+        :param time_index: time index at which the loaded IDSs are sliced (has precedence over time)
+
         :param \*args: extra arguments passed to load_omas_XXX() method
 
         :param \**kw: extra keywords passed to load_omas_XXX() method
@@ -2107,6 +2611,10 @@ class ODS(MutableMapping):
         """
         # figure out format used
         ext, args = _handle_extension(*args)
+        # other formats are loaded serially
+        if ext not in _parallel_load_formats:
+            kw.pop('max_workers', None)
+            kw.pop('processes', None)
 
         # manage consistency_check logic
         if 'consistency_check' in kw:
@@ -2154,7 +2662,7 @@ class ODS(MutableMapping):
         r"""
         Dynamically load OMAS data for seekable storage formats
 
-        :param filename: filename.XXX where the extension is used to select load format method (eg. 'nc','h5','ds','json','ids')
+        :param filename: filename.XXX where the extension is used to select load format method (eg. 'nc','h5','zarr','ds','json','ids')
                          set to `imas`, `s3`, `hdc`, `mongo` for save methods that do not have a filename with extension
 
         :param consistency_check: perform consistency check once the data is loaded
@@ -2183,8 +2691,8 @@ class ODS(MutableMapping):
         # figure out format used
         ext, args = _handle_extension(*args)
 
-        storage_options = ['nc', 'imas']
-        if ext in ['nc', 'imas', 'machine']:
+        storage_options = ['nc', 'h5', 'zarr', 'imas']
+        if ext in ['nc', 'h5', 'zarr', 'imas', 'machine']:
             # apply consistency checks
             if consistency_check != self.consistency_check:
                 self.consistency_check = consistency_check
@@ -2193,6 +2701,14 @@ class ODS(MutableMapping):
                 from omas.omas_nc import dynamic_omas_nc
 
                 self.dynamic = dynamic_omas_nc(*args, **kw)
+            elif ext == 'h5':
+                from omas.omas_h5 import dynamic_omas_h5
+
+                self.dynamic = dynamic_omas_h5(*args, **kw)
+            elif ext == 'zarr':
+                from omas.omas_zarr import dynamic_omas_zarr
+
+                self.dynamic = dynamic_omas_zarr(*args, **kw)
             elif ext == 'imas':
                 from omas.omas_imas import dynamic_omas_imas
 
@@ -2290,6 +2806,122 @@ class ODS(MutableMapping):
                 self[item].consistency_check = self.consistency_check
         return self
 
+    def from_flat(self, flat):
+        """
+        Bulk assignment of data starting from a flat dictionary {path: value} (eg. as returned by .flat())
+
+        Paths are sorted and the tree is built in a single pass, so that each intermediate
+        structure is created and checked against the IMAS schema only once.
+        Assignments that need special handling (cocosio, coordsio, code.parameters, dynamic ODSs,
+        ODS values, `+`/`:`/negative indexes, or paths that fail the schema check) go through __setitem__
+
+        :param flat: dictionary with ODS paths (any of the syntaxes supported by __setitem__) as keys
+
+        :return: self
+        """
+        consistency_check = self.consistency_check
+        imas_version = self.imas_version
+        location = p2l(self.location)
+        fast = not (
+            isinstance(self, ODC) or self.active_dynamic or (self.cocosio and self.cocosio != self.cocos) or self.coordsio or self.unitsio
+        )
+
+        def sort_key(item):
+            return [(0, k) if isinstance(k, int) else (1, k) for k in item[0]]
+
+        # (created) ODS nodes and their universal locations indexed by path
+        nodes = {(): (self, o2u(self.location))}
+
+        for path, value in sorted(((list(p2l(key)), value) for key, value in flat.items()), key=sort_key):
+            if not len(path):
+                continue
+            elif (
+                not fast
+                or isinstance(value, (ODS, dict))
+                or str(value.__class__).startswith("<class 'pint.")
+                or 'parameters' in path
+                or any((isinstance(k, int) and k < 0) or (isinstance(k, str) and (k == '+' or ':' in k)) for k in path)
+            ):
+                self[path] = value
+                continue
+
+            # start from the deepest structure that was already traversed
+            k0 = len(path) - 1
+            while k0 and tuple(path[:k0]) not in nodes:
+                k0 -= 1
+            h, ulocation = nodes[tuple(path[:k0])]
+            created = []
+
+            # traverse and create intermediate structures
+            for k in range(k0, len(path)):
+                step = path[k]
+                # check type of container
+                if (isinstance(step, int) and isinstance(h.omas_data, dict)) or (isinstance(step, str) and isinstance(h.omas_data, list)):
+                    break
+                # check IMAS schema
+                structure = None
+                if consistency_check:
+                    try:
+                        if (':' if isinstance(step, int) else step) not in imas_structure(imas_version, ulocation):
+                            break
+                        structure = imas_structure(imas_version, l2o([ulocation, ':' if isinstance(step, int) else step]))
+                    except (LookupError, TypeError):
+                        break
+                ulocation = l2o([ulocation, ':' if isinstance(step, int) else step])
+                # leaf
+                if k == len(path) - 1:
+                    if isinstance(step, int) and step > len(h.omas_data or []):
+                        break
+                    value = force_imas_type(value)
+                    if consistency_check:
+                        value, txt = consistency_checker(
+                            l2o(location + path), value, schema_node(ulocation, imas_version).info, consistency_check, imas_version
+                        )
+                        if not len(txt):
+                            pass
+                        elif isinstance(consistency_check, str) and ('warn' in consistency_check or 'drop' in consistency_check):
+                            if 'warn' in consistency_check:
+                                if 'drop' in consistency_check:
+                                    printe(f'Dropping invalid {txt}')
+                                else:
+                                    printe(f'Invalid {txt}')
+                            if 'drop' in consistency_check:
+                                h = None
+                    if h is not None:
+                        h.setraw(step, value)
+                    h = None
+                    break
+                # existing structures
+                if h.omas_data is not None and (step in h.omas_data if isinstance(step, str) else step < len(h.omas_data)):
+                    child = h.getraw(step)
+                    if not isinstance(child, ODS):
+                        break
+                # new structures
+                else:
+                    if (isinstance(step, int) and step > len(h.omas_data or [])) or (structure is not None and not len(structure)):
+                        break
+                    child = h.same_init_ods(cls=ODS)
+                    if structure is not None:
+                        child.omas_data = [] if ':' in structure else {}
+                    h.setraw(step, child)
+                    created.append((h, step, tuple(path[: k + 1])))
+                nodes[tuple(path[: k + 1])] = (child, ulocation)
+                h = child
+
+            # anything that could not be handled by the fast path
+            if h is not None:
+                try:
+                    self[path] = value
+                except Exception:
+                    # remove the structures that were created for this path
+                    for parent, step, key in reversed(created):
+                        if not parent.getraw(step).omas_data:
+                            del parent.omas_data[step]
+                            del nodes[key]
+                    raise
+
+        return self
+
     def codeparams2xml(self):
         """
         Convert code.parameters to a XML string
@@ -2454,6 +3086,8 @@ class ODC(ODS):
     OMAS Data Collection class
     """
 
+    __slots__ = []
+
     def __init__(self, *args, **kw):
         ODS.__init__(self, *args, **kw)
         self.omas_data = {}
@@ -2836,6 +3470,77 @@ except ImportError as _excp:
     printe('OMAS plotting function are not available: ' + repr(_excp))
 
 
+# --------------------------------------------
+# partial loading of ODSs
+# --------------------------------------------
+def _ods_subset(ods, pfilter, path, time=None):
+    """
+    Recursive utility function to remove from an ODS the data that is not selected by a paths_filter (operates in place)
+    The structures of arrays of structures that are before the selected ones are left empty, so that their indexes are preserved
+
+    :param ods: ODS
+
+    :param pfilter: paths_filter
+
+    :param path: location of the ODS (as a list)
+
+    :param time: argument passed to paths_filter.match
+
+    :return: whether some data was selected
+    """
+    if _aos_columns:
+        ods._drop_columns()
+    data = ods.omas_data
+    if isinstance(data, dict):
+        for key in list(data.keys()):
+            if isinstance(data[key], ODS):
+                if not pfilter.walk(path + [key]) or not _ods_subset(data[key], pfilter, path + [key], time):
+                    del data[key]
+            elif not pfilter.match(path + [key], time):
+                del data[key]
+        ods._paths_index = None
+        return bool(data)
+    elif isinstance(data, list):
+        keep = []
+        for k, value in enumerate(data):
+            keep.append(pfilter.walk(path + [k]) and _ods_subset(value, pfilter, path + [k], time))
+            if not keep[-1]:
+                value.omas_data = None
+        del data[max([k + 1 for k in range(len(keep)) if keep[k]], default=0) :]
+        ods._paths_index = None
+        return bool(data)
+    return False
+
+
+def load_subset(ods, paths=None, time=None, time_index=None):
+    """
+    Apply the `paths`, `time`, and `time_index` selections of the load_omas_XXX functions to a loaded ODS (operates in place)
+
+    :param ods: ODS
+
+    :param paths: list of paths to select, or paths_filter (see paths_filter for the syntax)
+
+    :param time: time [s] at which the IDSs are sliced (see ODS.slice_at_time)
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
+    :return: ODS
+    """
+    if not isinstance(paths, paths_filter):
+        paths = paths_filter(paths, time=time is not None or time_index is not None)
+    if paths:
+        _ods_subset(ods, paths, [])
+    if time is not None or time_index is not None:
+        for ds in ods.keys(dynamic=0):
+            # IDSs with a single time (eg. static IDSs) are left untouched
+            if isinstance(ods.getraw(ds), ODS) and len(numpy.atleast_1d(ods.getraw(ds).get('time', []))) > 1:
+                ods.getraw(ds).slice_at_time(time=time, time_index=time_index)
+        # remove the time arrays that were loaded only to slice the data in time
+        if paths:
+            _ods_subset(ods, paths, [], time=False)
+    return ods
+
+
 # --------------------------------------------
 # save and load OMAS with Python pickle
 # --------------------------------------------
@@ -2857,26 +3562,85 @@ def save_omas_pkl(ods, filename, **kw):
         pickle.dump(ods, f, **kw)
 
 
-def load_omas_pkl(filename, consistency_check=None, imas_version=None):
+def load_omas_pkl(filename, consistency_check=None, imas_version=None, paths=None, time=None, time_index=None):
     """
     Load ODS or ODC from Python pickle
+    NOTE: paths, time, and time_index are not supported for ODCs (a ValueError is raised)
 
-    :param filename: filename to save to
+    :param filename: filename or file descriptor to load from
 
     :param consistency_check: verify that data is consistent with IMAS schema (skip if None)
 
     :param imas_version: imas version to use for consistency check (leave original if None)
 
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  NOTE: pickles are not seekable, so the data is selected after the whole file is loaded
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :returns: ods OMAS data set
     """
-    printd('Loading from %s' % filename, topic='pkl')
+    if isinstance(filename, str):
+        printd('Loading from %s' % filename, topic='pkl')
+        with open(filename, 'rb') as f:
+            return load_omas_pkl(f, consistency_check, imas_version, paths=paths, time=time, time_index=time_index)
+
+    f = filename
+    try:
+        tmp = pickle.load(f)
+    except UnicodeDecodeError:
+        # to support ODSs created with Python2
+        f.seek(0)
+        tmp = pickle.load(f, encoding="latin1")
+    if isinstance(tmp, ODC):
+        if paths is not None or time is not None or time_index is not None:
+            raise ValueError('paths, time, and time_index are not supported when loading an ODC')
+    elif isinstance(tmp, ODS):
+        load_subset(tmp, paths, time=time, time_index=time_index)
+    if imas_version is not None:
+        tmp.imas_version = imas_version
+    if consistency_check is not None:
+        tmp.consistency_check = consistency_check
+    return tmp
 
-    with open(filename, 'rb') as f:
-        try:
-            tmp = pickle.load(f)
-        except UnicodeDecodeError:
-            # to support ODSs created with Python2
-            tmp = pickle.load(f, encoding="latin1")
+
+def ods_to_buffers(ods):
+    """
+    Pickle ODS with protocol 5 out-of-band buffers
+
+    The numpy arrays in the ODS are not copied into the pickle stream, and are instead
+    returned as a list of raw buffers that can be sent separately (eg. via shared memory, or socket.sendmsg)
+
+    NOTE: the buffers share memory with the arrays in the ODS
+
+    :param ods: OMAS data set
+
+    :return: tuple with pickle stream (bytes) and list of raw buffers (memoryviews)
+    """
+    buffers = []
+    data = pickle.dumps(ods, protocol=5, buffer_callback=buffers.append)
+    return data, [buffer.raw() for buffer in buffers]
+
+
+def ods_from_buffers(data, buffers, consistency_check=None, imas_version=None):
+    """
+    Load ODS or ODC from pickle stream and out-of-band buffers generated by `ods_to_buffers`
+
+    NOTE: the numpy arrays in the ODS share memory with the buffers (and are read-only if the buffers are read-only)
+
+    :param data: pickle stream
+
+    :param buffers: list of buffers (any object supporting the buffer protocol)
+
+    :param consistency_check: verify that data is consistent with IMAS schema (skip if None)
+
+    :param imas_version: imas version to use for consistency check (leave original if None)
+
+    :returns: ods OMAS data set
+    """
+    tmp = pickle.loads(data, buffers=buffers)
     if imas_version is not None:
         tmp.imas_version = imas_version
     if consistency_check is not None:
@@ -2909,6 +3673,8 @@ from .omas_json import *
 from .omas_hdc import *
 from .omas_uda import *
 from .omas_h5 import *
+from .omas_zarr import *
+from .omas_mmap import *
 from .omas_ds import *
 from .omas_ascii import *
 from .omas_mongo import *
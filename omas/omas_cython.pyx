@@ -1,4 +1,54 @@
 import re
+from functools import lru_cache
+
+# maximum number of entries in each of the memoization caches of the path conversion functions
+_paths_cache_size = 2**16
+
+
+@lru_cache(maxsize=_paths_cache_size)
+def _p2t(key):
+    """
+    Memoized conversion of a string ODS path (any syntax) to a tuple of keys ('bla',0,'bla')
+
+    :param key: ods location as a string
+
+    :return: tuple of keys that make the ods path
+    """
+    if not ('.' in key or '[' in key):
+        if len(key):
+            try:
+                return (int(key),)
+            except ValueError:
+                return (key,)
+        else:
+            return ()
+
+    key = [k for k in key.replace('[', '.').replace(']', '').split('.') if k]
+    for k, item in enumerate(key):
+        try:
+            key[k] = int(item)
+        except ValueError:
+            pass
+
+    return tuple(key)
+
+
+def p2t(key):
+    """
+    Converts the many different ways of addressing an ODS path to an immutable tuple of keys ('bla',0,'bla')
+    NOTE: string paths are memoized, so this is cheaper than p2l() when the keys do not need to be modified
+
+    :param key: ods location in some format
+
+    :return: tuple of keys that make the ods path
+    """
+    if isinstance(key, str):
+        return _p2t(key)
+
+    if isinstance(key, tuple):
+        return key
+
+    return tuple(p2l(key))
 
 
 def p2l(key):
@@ -12,38 +62,22 @@ def p2l(key):
     if isinstance(key, list):
         return key
 
+    if isinstance(key, str):
+        return list(_p2t(key))
+
     if isinstance(key, tuple):
         return list(key)
 
     if isinstance(key, int):
         return [int(key)]
 
-    if isinstance(key, str) and not ('.' in key or '[' in key):
-        if len(key):
-            try:
-               return [int(key)]
-            except ValueError:
-                return [key]
-        else:
-            return []
-
     if key is None:
         raise TypeError('OMAS key cannot be None')
 
     if isinstance(key, dict):
         raise TypeError('OMAS key cannot be of type dictionary')
 
-    if not isinstance(key, (list, tuple)):
-        key = str(key).replace('[', '.').replace(']', '').split('.')
-
-    key = [k for k in key if k]
-    for k, item in enumerate(key):
-        try:
-            key[k] = int(item)
-        except ValueError:
-            pass
-
-    return key
+    return list(_p2t(str(key)))
 
 
 def l2i(path):
@@ -81,6 +115,7 @@ _o2u_pattern_no_split = re.compile(r'^[0-9:]+')
 _o2i_pattern = re.compile(r'\.([:0-9]+)')
 
 
+@lru_cache(maxsize=_paths_cache_size)
 def o2u(path):
     """
     Converts an ODS path 'bla.0.bla' into a universal path 'bla.:.bla'
@@ -90,9 +125,9 @@ def o2u(path):
     :return: universal ODS path format
     """
     if '.' in path:
-        return re.sub(_o2u_pattern, '.:', path)
+        return _o2u_pattern.sub('.:', path)
     else:
-        return re.sub(_o2u_pattern_no_split, ':', path)
+        return _o2u_pattern_no_split.sub(':', path)
 
 
 _o2i_pattern = re.compile(r'\.([:0-9]+)')
@@ -109,6 +144,7 @@ def i2o(path):
     return path.replace(']', '').replace('[', '.')
 
 
+@lru_cache(maxsize=_paths_cache_size)
 def o2i(path):
     """
     Formats a ODS path 'bla.0.bla' into an IMAS path 'bla[0].bla'
@@ -117,7 +153,7 @@ def o2i(path):
 
     :return: IMAS path format
     """
-    return re.sub(_o2i_pattern, r'[\1]', path)
+    return _o2i_pattern.sub(r'[\1]', path)
 
 
 def u2o(upath, path):
@@ -133,6 +169,16 @@ def u2o(upath, path):
     """
     if upath.startswith('1...'):
         return upath
+    if isinstance(path, str):
+        return _u2o(upath, path)
+    return _u2o.__wrapped__(upath, path)
+
+
+@lru_cache(maxsize=_paths_cache_size)
+def _u2o(upath, path):
+    """
+    Memoized implementation of u2o()
+    """
     ul = p2l(upath)
     ol = p2l(path)
     for k in range(min([len(ul), len(ol)])):
@@ -192,3 +238,11 @@ def trim_common_path(p1, p2):
     p2 = p2l(p2)
     both = [x if x[0] == x[1] else None for x in zip(p1, p2)] + [None]
     return p1[both.index(None) :], p2[both.index(None) :]
+
+
+def clear_paths_cache():
+    """
+    Clear the memoization caches of the path conversion functions
+    """
+    for func in [_p2t, o2u, o2i, _u2o]:
+        func.cache_clear()
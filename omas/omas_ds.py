@@ -4,7 +4,7 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS, omas_environment
+from .omas_core import ODS, omas_environment, load_subset
 import itertools
 
 
@@ -171,7 +171,7 @@ def odx_2_ods(odx, consistency_check=True):
     return ods
 
 
-def load_omas_ds(filename, consistency_check=True):
+def load_omas_ds(filename, consistency_check=True, paths=None, time=None, time_index=None):
     """
     Load ODS from xarray dataset
 
@@ -179,15 +179,28 @@ def load_omas_ds(filename, consistency_check=True):
 
     :param consistency_check: verify that data is consistent with IMAS schema
 
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the selected variables are read from the file
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :return: OMAS data set
     """
     import xarray
 
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
     DS = xarray.open_dataset(filename, engine="netcdf4")
+    if pfilter:
+        DS = DS[[item for item in DS.data_vars if pfilter.walk(p2l(item)) or pfilter.match(p2l(item))]]
     DS.load()
     DS.close()
     odx = ODX(DS)
-    ods = odx_2_ods(odx, consistency_check=consistency_check)
+    ods = odx_2_ods(odx, consistency_check=False)
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
+    ods.consistency_check = consistency_check
     return ods
 
 
@@ -4,7 +4,41 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS
+from .omas_core import ODS, dynamic_ODS, load_subset
+
+
+def h5_dataset_options(value, compression):
+    """
+    Keywords for h5py `create_dataset` that implement a compression policy
+
+    :param value: numpy array to be stored
+
+    :param compression: codec (eg. 'gzip', 'lzf', or gzip compression level), or dictionary with compression policy:
+                        * compression: codec
+                        * compression_opts: codec options (eg. compression level for gzip)
+                        * shuffle: use the shuffle filter
+                        * fletcher32: use the fletcher32 checksum filter
+                        * chunks: True for automatic chunking, or chunk shape (matched against the trailing dimensions of the arrays)
+                        * min_size: number of elements below which arrays are stored contiguous and without filters
+
+    :return: dictionary with keywords for h5py `create_dataset`
+    """
+    if not compression:
+        return {}
+    if not isinstance(compression, dict):
+        compression = {'compression': compression}
+    if not value.shape or value.size < max(compression.get('min_size', 0), 1):
+        return {}
+    kw = {item: compression[item] for item in ['compression', 'compression_opts', 'shuffle', 'fletcher32'] if compression.get(item)}
+    chunks = compression.get('chunks', True)
+    if isinstance(chunks, (tuple, list)):
+        chunks = tuple(chunks)[-value.ndim :]
+        trailing = value.shape[value.ndim - len(chunks) :]
+        chunks = (1,) * (value.ndim - len(chunks)) + tuple(max(1, min(c, n)) for c, n in zip(chunks, trailing))
+    elif not kw:
+        return {}
+    kw['chunks'] = chunks
+    return kw
 
 
 def dict2hdf5(filename, dictin, groupname='', recursive=True, lists_as_dicts=False, compression=None):
@@ -21,7 +55,7 @@ def dict2hdf5(filename, dictin, groupname='', recursive=True, lists_as_dicts=Fal
 
     :param lists_as_dicts: convert lists to dictionaries with integer strings
 
-    :param compression: gzip compression level
+    :param compression: compression codec, or dictionary with compression policy (see h5_dataset_options)
     """
     import h5py
 
@@ -61,63 +95,333 @@ def dict2hdf5(filename, dictin, groupname='', recursive=True, lists_as_dicts=Fal
                 tmp = tmp.astype('S')
             elif tmp.dtype.name.lower().startswith('o'):
                 if is_uncertain(tmp):
-                    g.create_dataset(key + '_error_upper', std_devs(tmp).shape, dtype=std_devs(tmp).dtype, compression=compression)[
-                        ...
-                    ] = std_devs(tmp)
+                    g.create_dataset(
+                        key + '_error_upper', std_devs(tmp).shape, dtype=std_devs(tmp).dtype, **h5_dataset_options(tmp, compression)
+                    )[...] = std_devs(tmp)
                     tmp = nominal_values(tmp)
                 else:
                     continue
-            if tmp.shape == ():
-                g.create_dataset(key, tmp.shape, dtype=tmp.dtype)[...] = tmp
-            else:
-                g.create_dataset(key, tmp.shape, dtype=tmp.dtype, compression=compression)[...] = tmp
+            g.create_dataset(key, tmp.shape, dtype=tmp.dtype, **h5_dataset_options(tmp, compression))[...] = tmp
 
     return g
 
 
-def save_omas_h5(ods, filename):
+def ods2hdf5_tensor(filename, ods, homogeneous='time', compression='gzip'):
+    """
+    Utility function to save an ODS to hdf5 file, stacking the leaves of arrays of structures in tensors
+
+    Leaves that have the same shape and data type across the arrays of structures are stored
+    as a single chunked dataset with the arrays of structures indexes as leading dimensions,
+    under a group named `:` (eg. `equilibrium/time_slice/:/profiles_1d/psi`).
+    All other leaves are stored as in the standard layout (eg. `equilibrium/time_slice/0/profiles_2d/0/psi`)
+
+    The arrays of structures are collected with the same criteria of `ODS.dataset(homogeneous=...)`,
+    but `ODS.dataset` is not used to build the tensors since it fails as a whole if any leaf is not homogeneous,
+    whereas here each leaf that cannot be stacked falls back to the standard layout
+
+    :param filename: hdf5 file to save to
+
+    :param ods: OMAS data set
+
+    :param homogeneous: * 'time': collect arrays of structures only along the time dimension
+                        * 'full': collect arrays of structures along all dimensions
+
+    :param compression: compression codec, or dictionary with compression policy (see h5_dataset_options)
+    """
+    import h5py
+
+    if homogeneous not in ['time', 'full']:
+        raise ValueError("OMAS h5 homogeneous attribute can only be [False, 'time', 'full']")
+
+    if isinstance(filename, str):
+        with h5py.File(filename, 'w') as g:
+            ods2hdf5_tensor(g, ods, homogeneous=homogeneous, compression=compression)
+        return
+
+    # group the leaves by their location in the stacked layout
+    time_aos = {}
+    groups = OrderedDict()
+    for location, value in ods.flat().items():
+        path = p2l(location)
+        spath = list(path)
+        index = []
+        if 'parameters' not in path:
+            for k, step in enumerate(path):
+                if not isinstance(step, int):
+                    continue
+                if homogeneous == 'time':
+                    ulocation = l2u(path[:k])
+                    if ulocation not in time_aos:
+                        time_aos[ulocation] = any(c.endswith('.time') for c in schema_node(ulocation, ods.imas_version).coordinates)
+                    if not time_aos[ulocation]:
+                        continue
+                spath[k] = ':'
+                index.append(step)
+        groups.setdefault(tuple(spath), []).append((tuple(index), path, value))
+
+    stacked = {spath: _stack_leaves(leaves) if ':' in spath else None for spath, leaves in groups.items()}
+    for spath, leaves in groups.items():
+        data = stacked[spath]
+        # uncertainties are stacked only along with their nominal values, so that they are paired when loaded
+        if data is not None and spath[-1].endswith('_error_upper'):
+            base = spath[:-1] + (spath[-1][: -len('_error_upper')],)
+            if stacked.get(base) is None or stacked[base].shape != data.shape:
+                data = None
+        if data is not None:
+            filename.create_dataset('/'.join(map(str, spath)), data=data, **h5_dataset_options(data, compression))
+        # standard layout
+        else:
+            for index, path, value in leaves:
+                dict2hdf5(filename.require_group('/'.join(map(str, path[:-1]))), {path[-1]: value}, compression=compression)
+
+
+def _stack_leaves(leaves):
+    """
+    Stack leaves that are numeric, and have the same shape and type in all the structures of the arrays of structures
+
+    :param leaves: list of tuples with (indexes in the arrays of structures, path, value)
+
+    :return: stacked numpy array, or None if the leaves cannot be stacked
+    """
+    values = [value for index, path, value in leaves]
+    value = values[0]
+    shape = tuple(max(index[k] for index, path, item in leaves) + 1 for k in range(len(leaves[0][0])))
+    if len(leaves) != numpy.prod(shape):
+        return None
+    elif isinstance(value, numpy.ndarray) and value.dtype.kind in 'biufc':
+        if not all(isinstance(item, numpy.ndarray) and item.shape == value.shape and item.dtype == value.dtype for item in values):
+            return None
+        data = numpy.empty(shape + value.shape, dtype=value.dtype)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        if not all(type(item) is type(value) for item in values):
+            return None
+        data = numpy.empty(shape, dtype=numpy.asarray(value).dtype)
+    else:
+        return None
+    for index, path, item in leaves:
+        data[index] = item
+    return data
+
+
+def save_omas_h5(
+    ods, filename, homogeneous=False, compression=None, compression_opts=None, shuffle=False, fletcher32=False, chunks=True, min_size=0
+):
     """
     Save an ODS to HDF5
 
     :param ods: OMAS data set
 
     :param filename: filename or file descriptor to save to
+
+    :param homogeneous: * False: one HDF5 group per structure of the arrays of structures
+                        * 'time': stack the arrays of structures leaves along the time dimension (see ods2hdf5_tensor)
+                        * 'full': stack the arrays of structures leaves along all dimensions (see ods2hdf5_tensor)
+
+    :param compression: compression codec (eg. 'gzip', 'lzf'), False for no compression, or None ('gzip' for the stacked layouts, else no compression)
+
+    :param compression_opts: codec options (eg. compression level 0-9 for gzip)
+
+    :param shuffle: use the shuffle filter
+
+    :param fletcher32: use the fletcher32 checksum filter
+
+    :param chunks: True for automatic chunking, or chunk shape (matched against the trailing dimensions of the arrays)
+
+    :param min_size: number of elements below which arrays are stored contiguous and without filters
+    """
+    if homogeneous and compression is None:
+        compression = 'gzip'
+    policy = {
+        'compression': compression,
+        'compression_opts': compression_opts,
+        'shuffle': shuffle,
+        'fletcher32': fletcher32,
+        'chunks': chunks,
+        'min_size': min_size,
+    }
+    if homogeneous:
+        return ods2hdf5_tensor(filename, ods, homogeneous=homogeneous, compression=policy)
+    return dict2hdf5(filename, ods, lists_as_dicts=True, compression=policy)
+
+
+def _h5_uncertain(data, item):
+    """
+    :param data: HDF5 group
+
+    :param item: dataset name
+
+    :return: whether the dataset has a `_error_upper` dataset with the same shape, with which it is loaded as uncertain quantity
+    """
+    return item + '_error_upper' in data and item in data and data[item].shape == data[item + '_error_upper'].shape
+
+
+def get_h5_item(data, item, index=()):
     """
-    return dict2hdf5(filename, ods, lists_as_dicts=True)
+    Convenience function for loading OMAS data stored in a HDF5 dataset
+    Handles arrays, scalars, and uncertain quantities
+
+    :param data: HDF5 group
+
+    :param item: dataset name
+
+    :param index: leading indexes of stacked datasets (only this hyperslab is read from the file)
 
+    :return: data
+    """
+    if _h5_uncertain(data, item):
+        if isinstance(data[item][index], (float, numpy.floating)):
+            return ufloat(data[item][index], data[item + '_error_upper'][index])
+        else:
+            return uarray(data[item][index], data[item + '_error_upper'][index])
+    else:
+        return data[item][index]
 
-def convertDataset(ods, data):
+
+def _h5_node(ods, path):
+    """
+    Traverse an ODS creating the structures that are missing
+
+    :param ods: input ODS
+
+    :param path: list of keys
+
+    :return: ODS at path
+    """
+    h = ods
+    for step in path:
+        if isinstance(step, int):
+            while len(h.omas_data or []) <= step:
+                h.setraw(len(h.omas_data or []), h.same_init_ods())
+        elif h.omas_data is None or step not in h.omas_data:
+            h.setraw(step, h.same_init_ods())
+        h = h.omas_data[step]
+    return h
+
+
+def _stacked_hyperslab(pfilter, spath, ndim):
+    """
+    Leading indexes of a stacked dataset that may hold selected data
+
+    :param pfilter: paths_filter to select the data to load (None to load everything)
+
+    :param spath: location of the stacked dataset (as a list, with `:` for the stacked dimensions)
+
+    :param ndim: number of stacked dimensions
+
+    :return: tuple of slices, one for each of the stacked dimensions
+    """
+    bounds = [None] * ndim
+    if not pfilter:
+        return tuple(slice(None) for k in range(ndim))
+    # the `time` arrays are selected based on the location of the structure they belong to
+    target = list(map(str, spath[:-1] if pfilter.time and spath[-1] == 'time' else spath))
+    positions = [k for k, step in enumerate(target) if step == ':']
+    for regex, prefix in pfilter.patterns:
+        if not all(step == item or step == ':' or (item == ':' and step.isdigit()) for step, item in zip(prefix, target)):
+            continue
+        for d, k in enumerate(positions):
+            if bounds[d] == slice(None):
+                continue
+            elif k >= len(prefix) or not prefix[k].isdigit():
+                bounds[d] = slice(None)
+            elif bounds[d] is None:
+                bounds[d] = slice(int(prefix[k]), int(prefix[k]) + 1)
+            else:
+                bounds[d] = slice(min(bounds[d].start, int(prefix[k])), max(bounds[d].stop, int(prefix[k]) + 1))
+    return tuple(slice(None) if item is None else item for item in bounds)
+
+
+def convertStacked(ods, data, pfilter=None, location=[]):
+    """
+    Utility function to map the stacked HDF5 datasets under a `:` group to the structures of an array of structures
+
+    :param ods: array of structures ODS to be populated
+
+    :param data: HDF5 `:` group
+
+    :param pfilter: paths_filter to select the data to load (None to load everything)
+
+    :param location: location of the array of structures (as a list)
+    """
+    import h5py
+
+    datasets = []
+    data.visititems(lambda name, item: datasets.append(name) if isinstance(item, h5py.Dataset) else None)
+    for name in datasets:
+        path = name.split('/')
+        if path[-1].endswith('_error_upper') and _h5_uncertain(data[name].parent, path[-1][: -len('_error_upper')]):
+            continue
+        spath = location + [':'] + [convert_int(step) for step in path]
+        if pfilter and not (pfilter.walk(spath) or pfilter.match(spath)):
+            continue
+        ndim = path.count(':') + 1
+        # only the hyperslab with the structures that may be selected is read from the file
+        hyperslab = _stacked_hyperslab(pfilter, spath, ndim)
+        value = get_h5_item(data[name].parent, path[-1], index=hyperslab)
+        offset = [item.start or 0 for item in hyperslab]
+        for index in numpy.ndindex(*value.shape[:ndim]):
+            steps = iter(k + start for k, start in zip(index, offset))
+            lpath = [next(steps)] + [next(steps) if step == ':' else convert_int(step) for step in path[:-1]]
+            if pfilter and not pfilter.match(location + lpath + [path[-1]]):
+                continue
+            _h5_node(ods, lpath).setraw(path[-1], value[index])
+
+
+def convertDataset(ods, data, pfilter=None, location=[]):
     """
     Recursive utility function to map HDF5 structure to ODS
 
     :param ods: input ODS to be populated
 
     :param data: HDF5 dataset of group
+
+    :param pfilter: paths_filter to select the data to load (None to load everything)
+                    groups and datasets that are not selected are not read from the file
+
+    :param location: location of the data (as a list)
     """
     import h5py
 
-    keys = data.keys()
+    keys = [item for item in data.keys() if item != ':']
     try:
         keys = sorted(list(map(int, keys)))
     except ValueError:
         pass
+    # stacked arrays of structures
+    if ':' in data:
+        convertStacked(ods, data[':'], pfilter, location)
     for oitem in keys:
         item = str(oitem)
-        if item.endswith('_error_upper'):
+        if item.endswith('_error_upper') and _h5_uncertain(data, item[: -len('_error_upper')]):
             continue
         if isinstance(data[item], h5py.Dataset):
-            if item + '_error_upper' in data:
-                if isinstance(data[item][()], (float, numpy.floating)):
-                    ods.setraw(item, ufloat(data[item][()], data[item + '_error_upper'][()]))
-                else:
-                    ods.setraw(item, uarray(data[item][()], data[item + '_error_upper'][()]))
-            else:
-                ods.setraw(item, data[item][()])
+            if pfilter and not pfilter.match(location + [oitem]):
+                continue
+            ods.setraw(item, get_h5_item(data, item))
         elif isinstance(data[item], h5py.Group):
-            convertDataset(ods.setraw(oitem, ods.same_init_ods()), data[item])
-
-
-def load_omas_h5(filename, consistency_check=True, imas_version=omas_rcparams['default_imas_version'], cls=ODS):
+            if pfilter and not pfilter.walk(location + [oitem]):
+                # keep the indexes of the structures of the arrays of structures
+                if isinstance(oitem, int) and len(ods.omas_data or []) <= oitem:
+                    ods.setraw(oitem, ods.same_init_ods())
+                continue
+            # structures may have already been created from stacked datasets
+            if isinstance(ods.omas_data, list) and isinstance(oitem, int) and oitem < len(ods.omas_data):
+                convertDataset(ods.omas_data[oitem], data[item], pfilter, location + [oitem])
+            elif isinstance(ods.omas_data, dict) and oitem in ods.omas_data:
+                convertDataset(ods.omas_data[oitem], data[item], pfilter, location + [oitem])
+            else:
+                convertDataset(ods.setraw(oitem, ods.same_init_ods()), data[item], pfilter, location + [oitem])
+
+
+def load_omas_h5(
+    filename,
+    consistency_check=True,
+    imas_version=omas_rcparams['default_imas_version'],
+    cls=ODS,
+    paths=None,
+    time=None,
+    time_index=None,
+):
     """
     Load ODS or ODC from HDF5
 
@@ -129,17 +433,168 @@ def load_omas_h5(filename, consistency_check=True, imas_version=omas_rcparams['d
 
     :param cls: class to use for loading the data
 
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the selected groups and datasets are read from the file
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :return: OMAS data set
     """
     import h5py
 
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
     ods = cls(imas_version=imas_version, consistency_check=False)
     with h5py.File(filename, 'r') as data:
-        convertDataset(ods, data)
+        convertDataset(ods, data, pfilter)
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
     ods.consistency_check = consistency_check
     return ods
 
 
+class dynamic_omas_h5(dynamic_ODS):
+    """
+    Class that provides dynamic data loading from HDF5 file
+    This class is not to be used by itself, but via the ODS.open() method.
+    """
+
+    def __init__(self, filename):
+        self.kw = {'filename': filename}
+        self.data = None
+        self.cache = {}
+        self.active = False
+
+    def open(self):
+        printd('Dynamic open  %s' % self.kw, topic='dynamic')
+        import h5py
+
+        self.data = h5py.File(self.kw['filename'], 'r')
+        self.cache = {}
+        self.active = True
+        return self
+
+    def close(self):
+        printd('Dynamic close %s' % self.kw, topic='dynamic')
+        if self.data is not None:
+            self.data.close()
+        self.data = None
+        self.active = False
+        return self
+
+    def _groups(self, path):
+        """
+        :param path: ODS path as a list
+
+        :return: list of tuples with the HDF5 groups where path is stored and the leading indexes of the stacked datasets in them
+        """
+        import h5py
+
+        groups = [(self.data, ())]
+        for step in path:
+            tmp = []
+            for group, index in groups:
+                if str(step) in group and isinstance(group[str(step)], h5py.Group):
+                    tmp.append((group[str(step)], index))
+                if isinstance(step, int) and ':' in group:
+                    tmp.append((group[':'], index + (step,)))
+            groups = tmp
+        return groups
+
+    @staticmethod
+    def _in_range(dataset, index):
+        """
+        :return: whether the leading indexes are within the shape of the dataset
+        """
+        return len(dataset.shape) >= len(index) and all(k < n for k, n in zip(index, dataset.shape))
+
+    def _length(self, group, index):
+        """
+        :param group: HDF5 `:` group
+
+        :param index: leading indexes of the stacked datasets
+
+        :return: number of structures stored in the stacked datasets
+        """
+        import h5py
+
+        key = (group.name, index)
+        if key not in self.cache:
+            lengths = [0]
+            group.visititems(
+                lambda name, item: lengths.append(item.shape[len(index)])
+                if isinstance(item, h5py.Dataset) and self._in_range(item, index) and len(item.shape) > len(index)
+                else None
+            )
+            self.cache[key] = max(lengths)
+        return self.cache[key]
+
+    def _has_data(self, group, index):
+        """
+        :param group: HDF5 group
+
+        :param index: leading indexes of the stacked datasets
+
+        :return: whether the group contains data for the leading indexes
+        """
+        import h5py
+
+        if not len(index):
+            return True
+        key = (group.name, index, None)
+        if key not in self.cache:
+            self.cache[key] = bool(
+                group.visititems(lambda name, item: isinstance(item, h5py.Dataset) and self._in_range(item, index) or None)
+            )
+        return self.cache[key]
+
+    def _dataset(self, key):
+        """
+        :param key: ODS location
+
+        :return: HDF5 group, dataset name, and leading indexes for the location (group is None if it is not in the file)
+        """
+        import h5py
+
+        path = p2l(key)
+        item = str(path[-1])
+        for group, index in self._groups(path[:-1]):
+            if item in group and isinstance(group[item], h5py.Dataset) and self._in_range(group[item], index):
+                return group, item, index
+        return None, item, ()
+
+    def __getitem__(self, key):
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        printd('Dynamic read  %s: %s' % (self.kw['filename'], key), topic='dynamic')
+        group, item, index = self._dataset(key)
+        if group is None:
+            raise LookupError('`%s` is not in %s' % (key, self.kw['filename']))
+        return get_h5_item(group, item, index)
+
+    def __contains__(self, key):
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        return self._dataset(key)[0] is not None
+
+    def keys(self, location):
+        import h5py
+
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        keys = set()
+        for group, index in self._groups(p2l(location) if location else []):
+            for item in group.keys():
+                if item == ':':
+                    keys.update(range(self._length(group[':'], index)))
+                elif item.endswith('_error_upper') and _h5_uncertain(group, item[: -len('_error_upper')]):
+                    continue
+                elif self._has_data(group[item], index) if isinstance(group[item], h5py.Group) else self._in_range(group[item], index):
+                    keys.add(convert_int(item))
+        return sorted(keys, key=lambda k: (isinstance(k, str), k))
+
+
 def through_omas_h5(ods, method=['function', 'class_method'][1]):
     """
     Test save and load OMAS HDF5
@@ -4,7 +4,7 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS, codeparams_xml_save, codeparams_xml_load, dynamic_ODS, omas_environment
+from .omas_core import ODS, codeparams_xml_save, codeparams_xml_load, dynamic_ODS, omas_environment, load_subset
 from .omas_utils import _extra_structures
 
 
@@ -478,7 +478,8 @@ def load_omas_imas(
     skip_uncertainties=False,
     consistency_check=True,
     verbose=True,
-    backend='MDSPLUS'
+    backend='MDSPLUS',
+    time_index=None,
 ):
     """
     Load OMAS data from IMAS
@@ -507,6 +508,8 @@ def load_omas_imas(
 
     :param backend: Which backend to use, can be one of MDSPLUS, ASCII, HDF5, MEMORY, UDA, NO
 
+    :param time_index: time index at which the loaded IDSs are sliced (see load_subset)
+
     :return: OMAS data set
     """
 
@@ -595,6 +598,9 @@ def load_omas_imas(
             printd("ids.close()", topic='imas_code')
             ids.close()
 
+    if time_index is not None:
+        load_subset(ods, time_index=time_index)
+
     # add dataset_description information to this ODS
     if paths is None:
         ods.setdefault('dataset_description.data_entry.user', str(user))
@@ -4,13 +4,40 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS, ODC
+from .omas_core import ODS, ODC, load_subset
+import io
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+json_engines = ['orjson', 'json']
+
+
+def json_engine(engine=None):
+    """
+    Select the engine used to encode/decode Json
+
+    :param engine: `orjson` (C-accelerated with native numpy arrays serialization) or `json` (standard library)
+        None uses `omas_rcparams['json_engine']` (`json` by default, since `orjson` writes NaN as null,
+        does not indent the output, and builds the whole Json document in memory)
+
+    :return: name of the engine
+    """
+    if engine is None:
+        engine = omas_rcparams['json_engine']
+    if engine not in json_engines:
+        raise ValueError('Json engine `%s` is not one of %s' % (engine, json_engines))
+    if engine == 'orjson' and orjson is None:
+        raise ImportError('Json engine `orjson` is not installed')
+    return engine
 
 
 # ---------------------------
 # save and load OMAS to Json
 # ---------------------------
-def save_omas_json(ods, filename, objects_encode=None, **kw):
+def save_omas_json(ods, filename, objects_encode=None, engine=None, **kw):
     """
     Save an ODS to Json
 
@@ -22,8 +49,16 @@ def save_omas_json(ods, filename, objects_encode=None, **kw):
         * True: encode numpy arrays, complex, and uncertain
         * None: numpy arrays as lists, encode complex, and uncertain
         * False: numpy arrays as lists, fail on complex, and uncertain
+        * 'base64': numeric numpy arrays as base64 encoded binary data, encode complex, and uncertain
+
+    :param engine: Json engine to use (see `json_engine`)
+        NOTE: `orjson` writes NaN as null (converted back to NaN when loading) and builds the whole Json document in memory
 
-    :param kw: arguments passed to the json.dumps method
+    :param kw: arguments passed to the json.dump method
+        (`indent`, `separators`, and `sort_keys` are handled by the streaming encoder that writes
+        the file chunk by chunk, other arguments fall back to json.dump)
+        `orjson` only supports `sort_keys` and `indent` (indentation of 2 spaces if > 0),
+        other arguments fall back to the `json` engine
     """
 
     printd('Saving OMAS data to Json: %s' % filename, topic=['Json', 'json'])
@@ -32,17 +67,52 @@ def save_omas_json(ods, filename, objects_encode=None, **kw):
     kw.setdefault('separators', (',', ': '))
     kw.setdefault('sort_keys', True)
 
-    json_string = json.dumps(ods, default=lambda x: json_dumper(x, objects_encode), **kw)
+    default = lambda x: json_dumper(x, objects_encode)
+
+    if json_engine(engine) == 'orjson' and set(kw).issubset(['indent', 'separators', 'sort_keys']):
+        option = orjson.OPT_NON_STR_KEYS
+        # with objects_encode=None numpy arrays are saved as lists, which orjson does natively
+        if objects_encode is None:
+            option |= orjson.OPT_SERIALIZE_NUMPY
+        if kw['sort_keys']:
+            option |= orjson.OPT_SORT_KEYS
+        if kw['indent']:
+            option |= orjson.OPT_INDENT_2
+        json_bytes = orjson.dumps(ods, default=default, option=option)
+        if isinstance(filename, str):
+            with open(filename, 'wb') as f:
+                f.write(json_bytes)
+        elif isinstance(filename, io.TextIOBase):
+            filename.write(json_bytes.decode('utf-8'))
+        else:
+            filename.write(json_bytes)
+        return
+
+    def dump(f):
+        if set(kw).issubset(['indent', 'separators', 'sort_keys']):
+            json_stream_dump(ods, f, default=default, **kw)
+        else:
+            json.dump(ods, f, default=default, **kw)
 
     if isinstance(filename, str):
         with open(filename, 'w') as f:
-            f.write(json_string)
+            dump(f)
     else:
-        f = filename
-        f.write(json_string)
-
-
-def load_omas_json(filename, consistency_check=True, imas_version=omas_rcparams['default_imas_version'], cls=ODS, **kw):
+        dump(filename)
+
+
+def load_omas_json(
+    filename,
+    consistency_check=True,
+    imas_version=omas_rcparams['default_imas_version'],
+    cls=ODS,
+    stream=False,
+    engine=None,
+    paths=None,
+    time=None,
+    time_index=None,
+    **kw,
+):
     """
     Load ODS or ODC from Json
 
@@ -54,23 +124,26 @@ def load_omas_json(filename, consistency_check=True, imas_version=omas_rcparams[
 
     :param cls: class to use for loading the data
 
-    :param kw: arguments passed to the json.loads mehtod
+    :param stream: parse the file chunk by chunk building the ODS as it is read
+        (peak memory is bounded by the largest array instead of the size of the file, at the cost of slower loading)
+
+    :param engine: Json engine to use (see `json_engine`)
+        `orjson` is used only if no `kw` are passed, and falls back on `json` for files with NaN or Infinity
+
+    :param paths: list of paths to load (see `paths_filter`), None to load everything
+        the file is parsed chunk by chunk (like with `stream=True`) and the data that is not selected is skipped without being built
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
+    :param kw: arguments passed to the json.loads mehtod (ignored when `stream=True` or `paths` are specified)
 
     :return: OMAS data set
     """
 
     printd('Loading OMAS data from Json: %s' % filename, topic='json')
 
-    if isinstance(filename, str):
-        with open(filename, 'r') as f:
-            json_string = f.read()
-    else:
-        json_string = filename.read()
-
-    # allow for empty json file
-    if not len(json_string.strip()):
-        return ODS(imas_version=imas_version, consistency_check=consistency_check)
-
     def base_class(x):
         clsODS = lambda: ODS(imas_version=imas_version, consistency_check=False)
         clsODC = lambda: ODC(imas_version=imas_version, consistency_check=False)
@@ -80,10 +153,55 @@ def load_omas_json(filename, consistency_check=True, imas_version=omas_rcparams[
             tmp = json_loader(x, clsODC, null_to=numpy.NaN)
         return tmp
 
-    tmp = json.loads(json_string, object_pairs_hook=lambda x: base_class(x), **kw)
+    def object_pairs(x):
+        # orjson does not support object_pairs_hook, so the objects are converted after parsing
+        if isinstance(x, dict):
+            return base_class([(key, object_pairs(value)) for key, value in x.items()])
+        elif isinstance(x, list) and len(x) and isinstance(x[0], (dict, list)):
+            return [object_pairs(value) for value in x]
+        return x
+
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
+
+    def load(f):
+        if pfilter:
+            return json_stream_load(f, object_pairs_hook=base_class, select=pfilter.select)
+        elif stream:
+            return json_stream_load(f, object_pairs_hook=base_class)
+        json_string = f.read()
+        # allow for empty json file
+        if not len(json_string.strip()):
+            return None
+        if json_engine(engine) == 'orjson' and not kw:
+            try:
+                return object_pairs(orjson.loads(json_string))
+            except orjson.JSONDecodeError:
+                pass
+        return json.loads(json_string, object_pairs_hook=base_class, **kw)
+
+    if isinstance(filename, str):
+        with open(filename, 'r') as f:
+            tmp = load(f)
+    else:
+        tmp = load(filename)
+
+    if tmp is None:
+        return ODS(imas_version=imas_version, consistency_check=consistency_check)
 
     # convert to cls
-    tmp.__class__ = cls
+    try:
+        tmp.__class__ = cls
+    except TypeError:
+        # subclasses with a different layout (eg. without __slots__) are built and the loaded data is moved into them
+        ods = cls(imas_version=imas_version, consistency_check=False)
+        ods.omas_data = tmp.omas_data
+        for value in ods.omas_data.values() if isinstance(ods.omas_data, dict) else ods.omas_data or []:
+            if isinstance(value, ODS):
+                value.parent = ods
+        tmp = ods
+
+    if pfilter or time is not None or time_index is not None:
+        load_subset(tmp, pfilter, time=time, time_index=time_index)
 
     # perform consistency check
     tmp.consistency_check = consistency_check
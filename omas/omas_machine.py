@@ -194,7 +194,10 @@ def resolve_mapped(ods, machine, pulse,  mappings, location, idm, options_with_d
     elif 'COCOSIO_TDI' in mapped:
         TDI = mapped['COCOSIO_TDI'].format(**options_with_defaults)
         treename = mapped['treename'].format(**options_with_defaults) if 'treename' in mapped else None
-        cocosio = int(mdsvalue(machine, treename, pulse, TDI).raw())
+        if cache and (machine, treename, pulse, TDI) in cache:
+            cocosio = int(cache[machine, treename, pulse, TDI])
+        else:
+            cocosio = int(mdsvalue(machine, treename, pulse, TDI).raw())
 
     # CONSTANT VALUE
     if 'VALUE' in mapped:
@@ -243,7 +246,14 @@ def resolve_mapped(ods, machine, pulse,  mappings, location, idm, options_with_d
         try:
             TDI = mapped['TDI'].format(**options_with_defaults)
             treename = mapped['treename'].format(**options_with_defaults) if 'treename' in mapped else None
-            data0 = data = mdsvalue(machine, treename, pulse, TDI).raw()
+            # data may have been fetched in batch by mds_prefetch
+            # (arrays are copied, since the same TDI may be assigned to multiple locations)
+            if cache and (machine, treename, pulse, TDI) in cache:
+                data0 = data = cache[machine, treename, pulse, TDI]
+                if isinstance(data, numpy.ndarray):
+                    data0 = data = data.copy()
+            else:
+                data0 = data = mdsvalue(machine, treename, pulse, TDI).raw()
             if data is None:
                 raise ValueError('data is None')
         except Exception as e:
@@ -296,6 +306,99 @@ def resolve_mapped(ods, machine, pulse,  mappings, location, idm, options_with_d
     return ods, {'raw_data': data0, 'processed_data': data, 'cocosio': cocosio, 'branch': mappings['__branch__']}
 
 
+def mds_fetch_plan(machine, pulse, locations, options={}, branch='', user_machine_mappings=None):
+    """
+    Collect the MDS+ TDI expressions that are needed to fill a set of ODS locations,
+    grouped by the MDS+ connection that is used to evaluate them
+
+    :param machine: machine name
+
+    :param pulse: pulse number
+
+    :param locations: list of ODS locations to be populated (locations ending with `.*` include all the locations below them)
+
+    :param options: dictionary with options to use when loading the data
+
+    :param branch: load machine mappings from a specific GitHub branch
+
+    :param user_machine_mappings: allow specification of external mappings
+
+    :return: dictionary with the set of TDI expressions for each (server, treename, pulse)
+    """
+    pulse = int(pulse)
+    mappings = machine_mappings(machine, branch, user_machine_mappings)
+    plan = {}
+    servers = {}
+    for location in locations:
+        location = l2o(p2l(location))
+        options_with_defaults = copy.copy(mappings['__options__'])
+        options_with_defaults.update(options)
+        options_with_defaults.update({'machine': machine, 'pulse': pulse, 'location': location})
+        if location.endswith('.*'):
+            keys = [key for key in mappings if location.split('.*')[0] in key and not key.startswith('__')]
+        else:
+            keys = [location] if location in mappings else []
+        for key in keys:
+            mapped = mappings[key]
+            # same precedence as in resolve_mapped
+            expressions = []
+            if 'COCOSIO' not in mapped and 'COCOSIO_PYTHON' not in mapped and 'COCOSIO_TDI' in mapped:
+                expressions.append(mapped['COCOSIO_TDI'])
+            if not any(item in mapped for item in ['VALUE', 'EVAL', 'ENVIRON', 'PYTHON']) and 'TDI' in mapped:
+                expressions.append(mapped['TDI'])
+            for TDI in expressions:
+                try:
+                    TDI = TDI.format(**options_with_defaults)
+                    treename = mapped['treename'].format(**options_with_defaults) if 'treename' in mapped else None
+                except (KeyError, IndexError, ValueError):
+                    # errors are raised when the location is resolved
+                    continue
+                if treename not in servers:
+                    servers[treename] = mdsvalue(machine, treename, pulse, '').server
+                plan.setdefault((servers[treename], treename, pulse), set()).add(TDI)
+    return plan
+
+
+def mds_prefetch(machine, pulse, locations, options={}, branch='', user_machine_mappings=None, cache=None):
+    """
+    Fetch the MDS+ data that is needed to fill a set of ODS locations with one `getMany` round trip for each MDS+ connection
+    The data is stored in the cache that is used by `machine_to_omas` and `resolve_mapped`
+
+    :param machine: machine name
+
+    :param pulse: pulse number
+
+    :param locations: list of ODS locations to be populated (locations ending with `.*` include all the locations below them)
+
+    :param options: dictionary with options to use when loading the data
+
+    :param branch: load machine mappings from a specific GitHub branch
+
+    :param user_machine_mappings: allow specification of external mappings
+
+    :param cache: dictionary to be populated (a new one is created if None)
+
+    :return: cache dictionary with the data of each (machine, treename, pulse, TDI)
+    """
+    pulse = int(pulse)
+    if cache is None:
+        cache = {}
+    for (server, treename, pulse), TDIs in mds_fetch_plan(machine, pulse, locations, options, branch, user_machine_mappings).items():
+        TDIs = [TDI for TDI in sorted(TDIs) if (machine, treename, pulse, TDI) not in cache]
+        if not TDIs:
+            continue
+        try:
+            results = mdsvalue(machine, treename, pulse, '').raw(TDIs)
+        except Exception as _excp:
+            # expressions that could not be fetched in batch are fetched one by one when the locations are resolved
+            printd(f'Batch fetch from {server} {treename} #{pulse} failed: {_excp!r}', topic='machine')
+            continue
+        for TDI in TDIs:
+            if results.get(TDI, None) is not None and not isinstance(results[TDI], Exception):
+                cache[machine, treename, pulse, TDI] = results[TDI]
+    return cache
+
+
 _machine_mappings = {}
 _namespace_mappings = {}
 _user_machine_mappings = {}
@@ -759,6 +862,22 @@ def tunnel_mds(server, treename):
 _mds_connection_cache = {}
 
 
+def _mds_data(value):
+    """
+    Convert MDS+ data to python/numpy data
+
+    :param value: value returned by the MDS+ connection
+
+    :return: python/numpy data
+    """
+    try:
+        import MDSplus
+    except ImportError:
+        # connections that are not MDSplus.Connection objects (eg. for testing) return python/numpy data
+        return value
+    return MDSplus.Data.data(value)
+
+
 class mdstree(dict):
     """
     Class to handle the structure of an MDS+ tree.
@@ -846,7 +965,6 @@ class mdsvalue(dict):
             import time
 
             t0 = time.time()
-            import MDSplus
 
             def mdsk(value):
                 """
@@ -863,6 +981,8 @@ class mdsvalue(dict):
                 # try connecting and re-try on fail
                 for fallback in [0, 1]:
                     if (self.server, self.treename, self.pulse) not in _mds_connection_cache:
+                        import MDSplus
+
                         conn = MDSplus.Connection(self.server)
                         if self.treename is not None:
                             conn.openTree(self.treename, self.pulse)
@@ -901,20 +1021,20 @@ class mdsvalue(dict):
                         results = {}
                         for name, expr in TDI.items():
                             try:
-                                results[name] = MDSplus.Data.data(res[mdsk(name)][mdsk('value')])
+                                results[name] = _mds_data(res[mdsk(name)][mdsk('value')])
                             except KeyError:
                                 try:
-                                    results[name] = MDSplus.Data.data(res[str(name)][str('value')])
+                                    results[name] = _mds_data(res[str(name)][str('value')])
                                 except KeyError:
                                     try:
-                                        results[name] = Exception(MDSplus.Data.data(res[mdsk(name)][mdsk('error')]))
+                                        results[name] = Exception(_mds_data(res[mdsk(name)][mdsk('error')]))
                                     except KeyError:
-                                        results[name] = Exception(MDSplus.Data.data(res[str(name)][str('error')]))
+                                        results[name] = Exception(_mds_data(res[str(name)][str('error')]))
                         out_results = results
 
                 # single TDI expression
                 else:
-                    out_results = MDSplus.Data.data(conn.get(TDI))
+                    out_results = _mds_data(conn.get(TDI))
 
                 # return values
                 return out_results
@@ -1028,9 +1148,11 @@ def load_omas_machine(
 ):
     printd('Loading from %s' % machine, topic='machine')
     ods = cls(imas_version=imas_version, consistency_check=consistency_check)
-    for location in [location for location in machine_mappings(machine, branch, user_machine_mappings) if not location.startswith('__')]:
-        if location.endswith(':'):
-            continue
+    locations = [location for location in machine_mappings(machine, branch, user_machine_mappings) if not location.startswith('__')]
+    locations = [location for location in locations if not location.endswith(':')]
+    # fetch all the MDS+ data with as few round trips as possible
+    cache = mds_prefetch(machine, pulse, locations, options, branch, user_machine_mappings)
+    for location in locations:
         print(location)
-        machine_to_omas(ods, machine, pulse, location, options, branch)
+        machine_to_omas(ods, machine, pulse, location, options, branch, user_machine_mappings, cache)
     return ods
@@ -0,0 +1,208 @@
+'''save/load from memory-mapped raw arrays routines
+
+The format is made of a small Json file with the skeleton of the ODS (scalars, strings, and the dtype/shape/offset of the arrays)
+plus a `.bin` sidecar file with the raw data of the numeric arrays, which are loaded as views of a `numpy.memmap` of the sidecar
+
+-------
+'''
+
+from .omas_utils import *
+from .omas_core import ODS, load_subset
+
+_mmap_alignment = 64
+
+
+def _mmap_blob(filename):
+    """
+    :param filename: filename of the Json skeleton
+
+    :return: filename of the binary sidecar
+    """
+    return filename + '.bin'
+
+
+def ods2mmap(value, f):
+    """
+    Recursive utility function that writes the numeric arrays of an ODS to a binary file and returns the ODS skeleton
+
+    :param value: ODS, or ODS leaf
+
+    :param f: binary file descriptor (arrays are written at the current position, aligned to 64 bytes)
+
+    :return: json-compatible skeleton of the ODS
+    """
+    if isinstance(value, ODS):
+        value = value.omas_data
+    if isinstance(value, dict):
+        return {key: ods2mmap(item, f) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [ods2mmap(item, f) for item in value]
+    elif isinstance(value, numpy.ndarray) and value.dtype.kind in 'biufc':
+        offset = f.tell()
+        if offset % _mmap_alignment:
+            offset += _mmap_alignment - offset % _mmap_alignment
+            f.seek(offset)
+        f.write(numpy.ascontiguousarray(value).data)
+        return {'__mmap__': offset, 'dtype': value.dtype.str, 'shape': value.shape}
+    elif value is None or isinstance(value, (str, int, float)):
+        return value
+    return json_dumper(value)
+
+
+def mmap2ods(ods, skeleton, data, pfilter=None, location=[]):
+    """
+    Recursive utility function to map an ODS skeleton and memory-mapped data to ODS
+
+    :param ods: input ODS to be populated
+
+    :param skeleton: json skeleton of the ODS
+
+    :param data: numpy.memmap of the binary sidecar
+
+    :param pfilter: paths_filter to select the data to load (None to load everything)
+
+    :param location: location of the data (as a list)
+    """
+    items = skeleton.items() if isinstance(skeleton, dict) else enumerate(skeleton)
+    for key, value in items:
+        encoded = isinstance(value, dict) and next(iter(value), '').startswith('__')
+        structure = isinstance(value, (dict, list)) and not encoded
+        if pfilter and not (pfilter.walk(location + [key]) if structure else pfilter.match(location + [key])):
+            # keep the indexes of the structures of the arrays of structures
+            if isinstance(key, int):
+                ods.setraw(key, ods.same_init_ods())
+            continue
+        if encoded:
+            if '__mmap__' in value:
+                dtype = numpy.dtype(value['dtype'])
+                shape = tuple(value['shape'])
+                if int(numpy.prod(shape)) and data is not None:
+                    value = numpy.ndarray(shape, dtype=dtype, buffer=data, offset=value['__mmap__'])
+                else:
+                    value = numpy.zeros(shape, dtype=dtype)
+            else:
+                value = json_loader(list(value.items()))
+            ods.setraw(key, value)
+        elif isinstance(value, (dict, list)):
+            mmap2ods(ods.setraw(key, ods.same_init_ods()), value, data, pfilter, location + [key])
+        else:
+            ods.setraw(key, value)
+
+
+def _merge_skeleton(old, new):
+    """
+    Recursive utility function to merge ODS skeletons (`new` takes precedence)
+    """
+    if isinstance(old, dict) and isinstance(new, dict) and not next(iter(new), '').startswith('__'):
+        for key, value in new.items():
+            old[key] = _merge_skeleton(old[key], value) if key in old else value
+        return old
+    elif isinstance(old, list) and isinstance(new, list):
+        return [_merge_skeleton(old[k], item) if k < len(old) else item for k, item in enumerate(new)] + old[len(new) :]
+    return new
+
+
+def save_omas_mmap(ods, filename, append=False):
+    """
+    Save an ODS as Json skeleton plus `.bin` sidecar file with the raw data of the numeric arrays
+
+    :param ods: OMAS data set
+
+    :param filename: filename of the Json skeleton (the sidecar is `filename + '.bin'`)
+
+    :param append: append the arrays to the existing sidecar and merge the skeletons (ODS data takes precedence),
+                   without rewriting the data that is already in the file
+    """
+    printd('Saving OMAS data to mmap: %s' % filename, topic=['mmap'])
+
+    append = append and os.path.exists(filename) and os.path.exists(_mmap_blob(filename))
+    # the files are written to temporary files that are then moved in place, so that the sidecar and the skeleton
+    # are never out of sync, and the arrays of ODSs that map the old sidecar (eg. the ODS being saved) stay valid
+    # NOTE: when appending, the data is added at the end of the existing sidecar, which does not alter its mapped data
+    blob = _mmap_blob(filename) if append else _mmap_blob(filename) + '.tmp'
+    try:
+        with open(blob, 'r+b' if append else 'wb') as f:
+            f.seek(0, os.SEEK_END)
+            skeleton = ods2mmap(ods, f)
+        if append:
+            with open(filename, 'r') as f:
+                skeleton = _merge_skeleton(json.load(f)['data'], skeleton)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump({'format': 'omas_mmap', 'version': 1, 'data': skeleton}, f)
+        if not append:
+            os.replace(blob, _mmap_blob(filename))
+        os.replace(filename + '.tmp', filename)
+    finally:
+        for item in [filename + '.tmp', _mmap_blob(filename) + '.tmp']:
+            if os.path.exists(item):
+                os.remove(item)
+
+
+def load_omas_mmap(
+    filename,
+    consistency_check=True,
+    imas_version=omas_rcparams['default_imas_version'],
+    cls=ODS,
+    mode='c',
+    paths=None,
+    time=None,
+    time_index=None,
+):
+    """
+    Load ODS or ODC from Json skeleton plus `.bin` sidecar file
+    The numeric arrays are views of a `numpy.memmap` of the sidecar file, and their data is read from disk only when accessed
+
+    :param filename: filename of the Json skeleton (the sidecar is `filename + '.bin'`)
+
+    :param consistency_check: verify that data is consistent with IMAS schema
+
+    :param imas_version: imas version to use for consistency check
+
+    :param cls: class to use for loading the data
+
+    :param mode: numpy.memmap mode 'r' (read-only arrays) or 'c' (copy-on-write: arrays can be modified, but changes are not written to disk)
+
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the selected arrays are mapped
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
+    :return: OMAS data set
+    """
+    printd('Loading OMAS data from mmap: %s' % filename, topic=['mmap'])
+
+    with open(filename, 'r') as f:
+        skeleton = json.load(f)['data']
+    data = None
+    if os.path.getsize(_mmap_blob(filename)):
+        data = numpy.memmap(_mmap_blob(filename), dtype=numpy.uint8, mode=mode)
+
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
+    ods = cls(imas_version=imas_version, consistency_check=False)
+    if skeleton:
+        mmap2ods(ods, skeleton, data, pfilter)
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
+    ods.consistency_check = consistency_check
+    return ods
+
+
+def through_omas_mmap(ods, method=['function', 'class_method'][1]):
+    """
+    Test save and load OMAS mmap
+
+    :param ods: ods
+
+    :return: ods
+    """
+    filename = omas_testdir(__file__) + '/test.mmap'
+    ods = copy.deepcopy(ods)  # make a copy to make sure save does not alter entering ODS
+    if method == 'function':
+        save_omas_mmap(ods, filename)
+        ods1 = load_omas_mmap(filename)
+    else:
+        ods.save(filename)
+        ods1 = ODS().load(filename)
+    return ods1
@@ -8,51 +8,161 @@ import pathlib
 # mongod --dbpath $DIRECTORY_WHERE_TO_STORE_DATA
 
 from .omas_utils import *
-from .omas_core import ODS
+from .omas_core import ODS, load_subset
 
 
 # -----------------------------
 # save and load OMAS to MongoDB
 # -----------------------------
-def save_omas_mongo(ods, collection, database='omas', server=omas_rcparams['default_mongo_server']):
+_mongo_clients = {}
+
+
+def mongo_client(server=omas_rcparams['default_mongo_server'], database='', collection=''):
+    """
+    Return MongoDB client for a server
+    Clients (and their connection pools) are shared among calls that connect to the same server URI
+
+    :param server: server name, or MongoClient instance (returned as is)
+
+    :param database: database name on the server (used to look for credentials)
+
+    :param collection: collection name in the database (used to look for credentials)
+
+    :return: MongoClient
+    """
+    if not isinstance(server, str):
+        return server
+    uri = server.format(**get_mongo_credentials(server, database, collection))
+    if uri not in _mongo_clients:
+        from pymongo import MongoClient
+
+        _mongo_clients[uri] = MongoClient(uri)
+    return _mongo_clients[uri]
+
+
+def ods2mongo(value, fs=None, binary_size=1024, gridfs_size=2**20):
+    """
+    Recursive utility function to convert an ODS to a MongoDB document
+
+    :param value: ODS, or ODS leaf
+
+    :param fs: GridFS where to store large arrays
+
+    :param binary_size: numeric arrays of this size in bytes or larger are stored as binary subdocuments (None to store arrays as lists)
+
+    :param gridfs_size: numeric arrays of this size in bytes or larger are stored in GridFS (None to never use GridFS)
+
+    :return: document
+    """
+    if isinstance(value, ODS):
+        value = value.omas_data
+    if isinstance(value, dict):
+        return {key: ods2mongo(item, fs, binary_size, gridfs_size) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [ods2mongo(item, fs, binary_size, gridfs_size) for item in value]
+    elif isinstance(value, numpy.ndarray) and value.ndim and value.dtype.kind in 'biufc':
+        info = {'dtype': value.dtype.str, 'shape': list(value.shape)}
+        # the marker is the first key, since it is used to identify the encoded objects
+        if gridfs_size is not None and fs is not None and value.nbytes >= gridfs_size:
+            return dict(__gridfs__=fs.put(numpy.ascontiguousarray(value).tobytes()), **info)
+        elif binary_size is not None and value.nbytes >= binary_size:
+            from bson.binary import Binary
+
+            return dict(__binary__=Binary(numpy.ascontiguousarray(value).tobytes()), **info)
+        elif value.dtype.kind == 'c':
+            return ods2mongo(json_dumper(value, None))
+        return value.tolist()
+    elif value is None or isinstance(value, (str, int, float)):
+        return value
+    return ods2mongo(json_dumper(value, None))
+
+
+def mongo2ods(value, fs=None):
+    """
+    Recursive utility function to decode the objects (arrays, uncertain, complex) in a MongoDB document
+
+    :param value: document
+
+    :param fs: GridFS where large arrays are stored
+
+    :return: structure of dictionaries and lists that can be passed to ODS.from_structure()
+    """
+    if isinstance(value, dict):
+        if next(iter(value), '').startswith('__'):
+            if '__gridfs__' in value:
+                return numpy.frombuffer(fs.get(value['__gridfs__']).read(), dtype=value['dtype']).reshape(value['shape']).copy()
+            elif '__binary__' in value:
+                return numpy.frombuffer(value['__binary__'], dtype=value['dtype']).reshape(value['shape']).copy()
+            return json_loader(list(value.items()))
+        return {key: mongo2ods(item, fs) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [mongo2ods(item, fs) for item in value]
+    return value
+
+
+def mongo_projection(paths, time=False):
+    """
+    Convert a list of ODS paths to a MongoDB projection
+    NOTE: the projection includes all the structures of the arrays of structures, regardless of the indexes in the paths,
+          and for regular expressions it includes all of the data below the steps that precede the first regular expression token
+
+    :param paths: list of ODS paths or regular expressions (eg. ['equilibrium.time_slice.0.global_quantities.ip', 'core_profiles'])
+
+    :param time: also include the `time` arrays that are needed to slice in time the selected data
+
+    :return: MongoDB projection, or None if the whole documents need to be fetched
+    """
+    projection = {}
+    for regex, prefix in paths_filter(paths).patterns:
+        steps = [step for step in prefix if step != ':' and not step.isdigit()]
+        if not steps:
+            return None
+        projection['.'.join(steps)] = 1
+        if time:
+            for k in range(1, len(steps)):
+                projection['.'.join(steps[:k] + ['time'])] = 1
+    # MongoDB rejects projections where a key is below another one (path collision)
+    return {key: 1 for key in projection if not any(key.startswith(item + '.') for item in projection)}
+
+
+def save_omas_mongo(ods, collection, database='omas', server=omas_rcparams['default_mongo_server'], binary_size=1024, gridfs_size=2**20):
     """
     Save an ODS to MongoDB
 
-    :param ods: OMAS data set
+    :param ods: OMAS data set, or list of OMAS data sets (inserted with a single `insert_many`)
 
     :param collection: collection name in the database
 
     :param database: database name on the server
 
-    :param server: server name
+    :param server: server name, or MongoClient instance
 
-    :return: unique `_id` identifier of the record
+    :param binary_size: numeric arrays of this size in bytes or larger are stored as binary subdocuments (None to store arrays as lists)
+
+    :param gridfs_size: numeric arrays of this size in bytes or larger are stored in GridFS, to avoid the 16MB documents size limit
+                        (None to never use GridFS)
+
+    :return: unique `_id` identifier of the record (or list of identifiers if `ods` is a list)
     """
 
     printd('Saving OMAS data to MongoDB: collection=%s database=%s  server=%s' % (collection, database, server), topic='MongoDB')
 
-    # importing module
-    from pymongo import MongoClient
-
-    # connect
-    client = MongoClient(server.format(**get_mongo_credentials(server, database, collection)))
+    import gridfs
 
     # access database
-    db = client[database]
+    db = mongo_client(server, database, collection)[database]
 
     # access collection
     coll = db[collection]
 
-    # a cheap way to encode data
-    kw = {'indent': 0, 'separators': (',', ': '), 'sort_keys': True}
-    json_string = json.dumps(ods, default=lambda x: json_dumper(x, None), **kw)
-    data = json.loads(json_string)
-
-    # avoid insert_one() to modify data
-    data = copy.copy(data)
+    # large arrays are stored in GridFS
+    fs = gridfs.GridFS(db, collection=collection) if gridfs_size is not None else None
 
-    # insert record
-    res = coll.insert_one(data)
+    # insert records
+    if isinstance(ods, (list, tuple)):
+        res = coll.insert_many([ods2mongo(item, fs, binary_size, gridfs_size) for item in ods])
+        return [str(_id) for _id in res.inserted_ids]
+    res = coll.insert_one(ods2mongo(ods, fs, binary_size, gridfs_size))
     return str(res.inserted_id)
 
 
@@ -64,6 +174,9 @@ def load_omas_mongo(
     consistency_check=True,
     imas_version=omas_rcparams['default_imas_version'],
     limit=None,
+    paths=None,
+    time=None,
+    time_index=None,
 ):
     """
     Load an ODS from MongoDB
@@ -74,7 +187,7 @@ def load_omas_mongo(
 
     :param database: database name on the server
 
-    :param server: server name
+    :param server: server name, or MongoClient instance
 
     :param consistency_check: verify that data is consistent with IMAS schema
 
@@ -82,11 +195,18 @@ def load_omas_mongo(
 
     :param limit: return at most `limit` number of results
 
+    :param paths: list of ODS paths to load (None to load the whole ODS)
+                  only these subtrees are transferred from the server (see `mongo_projection`)
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :return: list of OMAS data set that match find criterion
     """
 
     # importing module
-    from pymongo import MongoClient
+    import gridfs
     from bson.objectid import ObjectId
 
     # allow search by _id
@@ -98,27 +218,30 @@ def load_omas_mongo(
 
     printd('Loading OMAS data from MongoDB: collection=%s database=%s  server=%s' % (collection, database, server), topic='MongoDB')
 
-    # connect
-    client = MongoClient(server.format(**get_mongo_credentials(server, database, collection)))
-
     # access database
-    db = client[database]
+    db = mongo_client(server, database, collection)[database]
 
     # access collection
     coll = db[collection]
 
     # find all the matching records
-    found = coll.find(find)
+    projection = None
+    if paths is not None:
+        projection = mongo_projection(paths, time=time is not None or time_index is not None)
+    found = coll.find(find, projection)
     if limit is not None:
         found = found.limit(limit)
 
     # populate ODSs
+    fs = gridfs.GridFS(db, collection=collection)
     results = {}
     for record in found:
         ods = ODS(consistency_check=consistency_check, imas_version=imas_version)
         _id = record['_id']
         del record['_id']
-        ods.from_structure(record)
+        ods.from_structure(mongo2ods(record, fs))
+        if paths is not None or time is not None or time_index is not None:
+            load_subset(ods, paths, time=time, time_index=time_index)
         results[_id] = ods
 
     return results
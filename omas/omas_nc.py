@@ -4,13 +4,98 @@
 '''
 
 from .omas_utils import *
-from .omas_core import ODS, ODC, dynamic_ODS
+from .omas_core import ODS, ODC, dynamic_ODS, omas_environment, load_subset
 
 
 # --------------------------------------------
 # save and load OMAS with NetCDF
 # --------------------------------------------
-def save_omas_nc(ods, filename, **kw):
+def nc_chunksizes(shape, itemsize, max_bytes=2**22):
+    """
+    Chunk shape for NetCDF variables: the whole variable if it is smaller than `max_bytes`,
+    otherwise the leading dimensions are split until the chunk is smaller than `max_bytes`
+
+    :param shape: shape of the variable
+
+    :param itemsize: size in bytes of the data type
+
+    :param max_bytes: maximum size in bytes of the chunks
+
+    :return: list with chunk shape
+    """
+    chunks = list(shape)
+    for k in range(len(chunks)):
+        while numpy.prod(chunks) * itemsize > max_bytes and chunks[k] > 1:
+            chunks[k] = int(numpy.ceil(chunks[k] / 2.0))
+    return chunks
+
+
+def nc_dimensions(group, location, shape, info):
+    """
+    Name (and create) the dimensions of a NetCDF variable after the IMAS coordinates of the data, so that they are shared across variables
+
+    * coordinates that are locations in the ODS (eg. `equilibrium.time_slice[:].profiles_2d[:].grid.dim1`) are named after that location
+    * 1D data with `1...N` coordinates are named after the data itself (these are typically the coordinates of other data)
+    * otherwise (or if the length of a named dimension is not consistent) dimensions are named after their length (`dim_%d`)
+
+    :param group: NetCDF group of the IDS
+
+    :param location: ODS location of the data (relative to the IDS)
+
+    :param shape: shape of the data
+
+    :param info: schema information of the data
+
+    :return: list of dimensions names
+    """
+    ids = group.name.strip('/')
+    coordinates = list(info.get('coordinates', []))
+    dims = []
+    for k, n in enumerate(shape):
+        dim = None
+        if len(coordinates) == len(shape):
+            coordinate = i2o(coordinates[k])
+            if coordinate.startswith(ids + '.'):
+                dim = u2o(coordinate, ids + '.' + location)[len(ids) + 1 :]
+            elif len(shape) == 1 and coordinate.startswith('1...'):
+                dim = location
+        if dim is None or (dim in group.dimensions and len(group.dimensions[dim]) != n):
+            dim = 'dim_%d' % n
+        if dim not in group.dimensions:
+            group.createDimension(dim, n)
+        dims.append(dim)
+    return dims
+
+
+def nc_variable(group, name, data, dims, zlib=False, complevel=4, shuffle=True, min_size=64):
+    """
+    Create a NetCDF variable
+
+    :param group: NetCDF group (or dataset)
+
+    :param name: variable name
+
+    :param data: numpy array
+
+    :param dims: list of dimensions names
+
+    :param zlib: compress numeric arrays with zlib
+
+    :param complevel: zlib compression level
+
+    :param shuffle: use the HDF5 shuffle filter
+
+    :param min_size: number of elements below which arrays are stored contiguous and without compression
+
+    :return: NetCDF variable
+    """
+    kw = {}
+    if zlib and data.dtype.kind in 'biufc' and data.ndim and data.size >= min_size:
+        kw = {'zlib': True, 'complevel': complevel, 'shuffle': shuffle, 'chunksizes': nc_chunksizes(data.shape, data.dtype.itemsize)}
+    return group.createVariable(name, data.dtype, dims, **kw)
+
+
+def save_omas_nc(ods, filename, grouped=False, zlib=None, complevel=4, shuffle=True, min_size=64, **kw):
     """
     Save an ODS to NetCDF file
 
@@ -18,30 +103,57 @@ def save_omas_nc(ods, filename, **kw):
 
     :param filename: filename to save to
 
+    :param grouped: * False: one variable per ODS location, with dimensions named by their length
+                    * True: one NetCDF group per IDS, with dimensions named after the IMAS coordinates of the data (see nc_dimensions)
+
+    :param zlib: compress numeric arrays with zlib (None: compress only if `grouped`)
+
+    :param complevel: zlib compression level
+
+    :param shuffle: use the HDF5 shuffle filter
+
+    :param min_size: number of elements below which arrays are stored contiguous and without compression
+
     :param kw: arguments passed to the netCDF4 Dataset function
     """
     printd('Saving to %s' % filename, topic='nc')
 
     from netCDF4 import Dataset
 
+    if zlib is None:
+        zlib = bool(grouped)
+    compression = {'zlib': zlib, 'complevel': complevel, 'shuffle': shuffle, 'min_size': min_size}
+
     odsf = ods.flat()
     with Dataset(filename, 'w', **kw) as dataset:
+        # all variables are defined before writing the data, since for NetCDF4 files
+        # every switch between define and data mode updates the metadata of the whole file
+        variables = []
         for item in odsf:
-            dims = []
             data = numpy.asarray(odsf[item])
             std = None
             if is_uncertain(odsf[item]):
                 std = std_devs(data)
                 data = nominal_values(data)
-            for k in range(len(numpy.asarray(odsf[item]).shape)):
-                dims.append('dim_%d' % (data.shape[k]))
-                if dims[-1] not in dataset.dimensions:
-                    dataset.createDimension(dims[-1], data.shape[k])
-            if std is None:
-                dataset.createVariable(item, data.dtype, dims)[:] = data
+            if grouped:
+                ids, name = item.split('.', 1)
+                if ids not in dataset.groups:
+                    dataset.createGroup(ids)
+                group = dataset.groups[ids]
+                dims = nc_dimensions(group, name, data.shape, schema_node(o2u(item), ods.imas_version).info)
             else:
-                dataset.createVariable(item, data.dtype, dims)[:] = data
-                dataset.createVariable(item + '_error_upper', data.dtype, dims)[:] = std
+                group = dataset
+                name = item
+                dims = []
+                for k in range(len(data.shape)):
+                    dims.append('dim_%d' % (data.shape[k]))
+                    if dims[-1] not in dataset.dimensions:
+                        dataset.createDimension(dims[-1], data.shape[k])
+            variables.append((nc_variable(group, name, data, dims, **compression), data))
+            if std is not None:
+                variables.append((nc_variable(group, name + '_error_upper', std, dims, **compression), std))
+        for variable, data in variables:
+            variable[:] = data
 
 
 def get_ds_item(dataset, item):
@@ -75,7 +187,9 @@ def get_ds_item(dataset, item):
     return tmp
 
 
-def load_omas_nc(filename, consistency_check=True, imas_version=omas_rcparams['default_imas_version'], cls=ODS):
+def load_omas_nc(
+    filename, consistency_check=True, imas_version=omas_rcparams['default_imas_version'], cls=ODS, paths=None, time=None, time_index=None
+):
     """
     Load ODS or ODC from NetCDF file
 
@@ -87,18 +201,36 @@ def load_omas_nc(filename, consistency_check=True, imas_version=omas_rcparams['d
 
     :param cls: class to use for loading the data
 
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the selected variables are read from the file
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
     :return: OMAS data set
     """
     printd('Loading from %s' % filename, topic='nc')
 
     from netCDF4 import Dataset
 
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
     ods = cls(imas_version=imas_version, consistency_check=False)
-    with Dataset(filename, 'r') as dataset:
+    with Dataset(filename, 'r') as dataset, omas_environment(ods, dynamic_path_creation='dynamic_array_structures'):
         for item in dataset.variables.keys():
-            if item.endswith('_error_upper'):
+            if item.endswith('_error_upper') or not pfilter.match(p2l(item)):
                 continue
             ods.setraw(p2l(item), get_ds_item(dataset, item))
+        # grouped layout
+        for ids, group in dataset.groups.items():
+            if not pfilter.walk([ids]):
+                continue
+            for item in group.variables.keys():
+                if item.endswith('_error_upper') or not pfilter.match(p2l(ids + '.' + item)):
+                    continue
+                ods.setraw(p2l(ids + '.' + item), get_ds_item(group, item))
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
     ods.consistency_check = consistency_check
     return ods
 
@@ -112,6 +244,7 @@ class dynamic_omas_nc(dynamic_ODS):
     def __init__(self, filename):
         self.kw = {'filename': filename}
         self.dataset = None
+        self.index = {}
         self.active = False
 
     def open(self):
@@ -119,6 +252,19 @@ class dynamic_omas_nc(dynamic_ODS):
         from netCDF4 import Dataset
 
         self.dataset = Dataset(self.kw['filename'], 'r')
+        # locations of the variables in the file (for the grouped layout the IDS is the group name)
+        variables = list(self.dataset.variables.keys())
+        for ids, group in self.dataset.groups.items():
+            variables.extend(ids + '.' + item for item in group.variables.keys())
+        # index of the keys under each location
+        self.index = {}
+        variables = set(variables)
+        for item in variables:
+            if item.endswith('_error_upper') and item[: -len('_error_upper')] in variables:
+                continue
+            path = item.split('.')
+            for k in range(len(path)):
+                self.index.setdefault('.'.join(path[:k]), set()).add(convert_int(path[k]))
         self.active = True
         return self
 
@@ -126,24 +272,41 @@ class dynamic_omas_nc(dynamic_ODS):
         printd('Dynamic close %s' % self.kw, topic='dynamic')
         self.dataset.close()
         self.dataset = None
+        self.index = {}
         self.active = False
         return self
 
+    def _variable(self, key):
+        """
+        :param key: ODS location
+
+        :return: NetCDF group (or dataset) and variable name for the location (group is None if location is not in the file)
+        """
+        if key in self.dataset.variables:
+            return self.dataset, key
+        ids, _, item = key.partition('.')
+        if ids in self.dataset.groups and item in self.dataset.groups[ids].variables:
+            return self.dataset.groups[ids], item
+        return None, key
+
     def __getitem__(self, key):
         if not self.active:
             raise RuntimeError('Dynamic link broken: %s' % self.kw)
         printd('Dynamic read  %s: %s' % (self.kw['filename'], key), topic='dynamic')
-        return get_ds_item(self.dataset, key)
+        group, item = self._variable(key)
+        if group is None:
+            raise LookupError('`%s` is not in %s' % (key, self.kw['filename']))
+        return get_ds_item(group, item)
 
     def __contains__(self, key):
         if not self.active:
             raise RuntimeError('Dynamic link broken: %s' % self.kw)
-        return key in self.dataset.variables
+        return self._variable(key)[0] is not None
 
     def keys(self, location):
-        return numpy.unique(
-            [convert_int(k[len(location) :].lstrip('.').split('.')[0]) for k in self.dataset.variables.keys() if k.startswith(location)]
-        )
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        return sorted(self.index.get(location, []), key=lambda k: (isinstance(k, str), k))
 
 
 def through_omas_nc(ods, method=['function', 'class_method'][1]):
@@ -2517,6 +2517,20 @@ def define_cocos(cocos_ind):
 
     :param cocos_ind: COCOS index
 
+    :return: dictionary with COCOS coefficients
+    """
+    return dict(_define_cocos(cocos_ind))
+
+
+@lru_cache(maxsize=None)
+def _define_cocos(cocos_ind):
+    """
+    Cached table of COCOS coefficients (see define_cocos)
+
+    NOTE: the returned dictionary is shared and must not be modified
+
+    :param cocos_ind: COCOS index
+
     :return: dictionary with COCOS coefficients
     """
 
@@ -2624,6 +2638,23 @@ def cocos_transform(cocosin_index, cocosout_index):
 
     :param cocosout_index: COCOS index out
 
+    :return: dictionary with transformation multipliers
+    """
+    return dict(_cocos_transform(cocosin_index, cocosout_index))
+
+
+@lru_cache(maxsize=None)
+def _cocos_transform(cocosin_index, cocosout_index):
+    """
+    Cached table of COCOS transformation multipliers (see cocos_transform)
+
+    The table is filled lazily, one entry per pair of COCOS indexes.
+    NOTE: the returned dictionary is shared and must not be modified
+
+    :param cocosin_index: COCOS index in
+
+    :param cocosout_index: COCOS index out
+
     :return: dictionary with transformation multipliers
     """
 
@@ -2637,8 +2668,8 @@ def cocos_transform(cocosin_index, cocosout_index):
         sigma_rhotp_eff = 1
     else:
         printd("COCOS tranformation from " + str(cocosin_index) + " to " + str(cocosout_index), topic='cocos')
-        cocosin = define_cocos(cocosin_index)
-        cocosout = define_cocos(cocosout_index)
+        cocosin = _define_cocos(cocosin_index)
+        cocosout = _define_cocos(cocosout_index)
 
         sigma_Ip_eff = cocosin['sigma_RpZ'] * cocosout['sigma_RpZ']
         sigma_B0_eff = cocosin['sigma_RpZ'] * cocosout['sigma_RpZ']
@@ -3137,6 +3168,11 @@ Once done, you can reload the cocos definitions with:
             exec(f.read(), namespace)
         self.clear()
         self.update(namespace['_cocos_signals'])
+        # the compiled schema index caches the COCOS signals
+        from . import omas_utils
+
+        omas_utils._schema_index = {}
+        omas_utils._schema_index_ids = {}
 
 
 # cocos_signals is the actual dictionary
@@ -4,7 +4,7 @@
 '''
 
 from .omas_utils import *
-from .omas_core import save_omas_pkl, load_omas_pkl, ODS
+from .omas_core import load_omas_pkl, ODS
 
 
 def _base_S3_uri(user):
@@ -14,6 +14,151 @@ def _base_S3_uri(user):
 # --------------------------------------------
 # save and load OMAS with S3
 # --------------------------------------------
+def s3_transfer_config(**kw):
+    """
+    :param kw: keywords passed to boto3 TransferConfig (by default multipart uploads and concurrent part transfers are enabled)
+
+    :return: boto3 TransferConfig
+    """
+    from boto3.s3.transfer import TransferConfig
+
+    kw.setdefault('use_threads', True)
+    return TransferConfig(**kw)
+
+
+def _s3_split(uri):
+    """
+    :param uri: s3://bucket/key uri
+
+    :return: tuple with bucket and key
+    """
+    location = uri.split('://', 1)[1]
+    return location.split('/')[0], '/'.join(location.split('/')[1:])
+
+
+def _s3_require_bucket(client, s3bucket):
+    """
+    Create S3 bucket if it does not exist
+
+    :param client: boto3 S3 client
+
+    :param s3bucket: bucket name
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        client.head_bucket(Bucket=s3bucket)
+    except ClientError as _excp:
+        # If a client error is thrown, then check that it was a 404 error.
+        # If it was a 404 error, then the bucket does not exist.
+        error_code = int(_excp.response['Error']['Code'])
+        if error_code == 404:
+            client.create_bucket(Bucket=s3bucket)
+        else:
+            raise
+
+
+class _s3_pipe_reader(object):
+    """
+    Read end of the pipe that streams data to an S3 upload
+    Raises the exception of the writer, so that the upload is aborted rather than completed with truncated data
+    """
+
+    def __init__(self, f, errors):
+        self.f = f
+        self.errors = errors
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        if not data and self.errors:
+            raise self.errors[0]
+        return data
+
+    def seekable(self):
+        return False
+
+
+def s3_upload_stream(write, uri, client=None, config=None):
+    """
+    Upload to S3 the data that function `write` writes to a file object
+    Data is streamed into a multipart upload as it is written, without temporary files
+
+    :param write: function that takes a binary file object as argument and writes data to it
+
+    :param uri: s3://bucket/key uri to upload to (bucket is created if it does not exist)
+
+    :param client: boto3 S3 client (None to create one)
+
+    :param config: boto3 TransferConfig (None for `s3_transfer_config()`)
+    """
+    import threading
+
+    if client is None:
+        import boto3
+
+        client = boto3.client('s3')
+    if config is None:
+        config = s3_transfer_config()
+
+    s3bucket, s3filename = _s3_split(uri)
+    printd('Streaming upload to %s' % uri, topic='s3')
+    _s3_require_bucket(client, s3bucket)
+
+    r, w = os.pipe()
+    errors = []
+
+    def writer():
+        f = os.fdopen(w, 'wb')
+        try:
+            write(f)
+        except Exception as _excp:
+            errors.append(_excp)
+        finally:
+            try:
+                f.close()
+            except Exception as _excp:
+                errors.append(_excp)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        with os.fdopen(r, 'rb') as f:
+            client.upload_fileobj(_s3_pipe_reader(f, errors), s3bucket, s3filename, Config=config)
+    finally:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def s3_download_stream(uri, client=None, config=None):
+    """
+    Download S3 object to memory (parts of large objects are downloaded concurrently)
+
+    :param uri: s3://bucket/key uri to download
+
+    :param client: boto3 S3 client (None to create one)
+
+    :param config: boto3 TransferConfig (None for `s3_transfer_config()`)
+
+    :return: BytesIO with the content of the object
+    """
+    from io import BytesIO
+
+    if client is None:
+        import boto3
+
+        client = boto3.client('s3')
+    if config is None:
+        config = s3_transfer_config()
+
+    s3bucket, s3filename = _s3_split(uri)
+    printd('Downloading %s' % uri, topic='s3')
+    f = BytesIO()
+    client.download_fileobj(s3bucket, s3filename, f, Config=config)
+    f.seek(0)
+    return f
+
+
 def remote_uri(uri, filename, action):
     """
     :param uri: uri of the container of the file
@@ -34,7 +179,6 @@ def remote_uri(uri, filename, action):
 
     if system == 's3':
         import boto3
-        from boto3.s3.transfer import TransferConfig
 
         s3bucket = location.split('/')[0]
         s3connection = boto3.resource('s3')
@@ -42,11 +186,8 @@ def remote_uri(uri, filename, action):
 
         if action == 'list':
             printd('Listing %s' % (uri), topic='s3')
-            files = list(map(lambda x: x.key, s3connection.Bucket(s3bucket).objects.all()))
-            s3filename = s3filename.strip('/')
-            if s3filename:
-                files = filter(lambda x: x.startswith(s3filename), files)
-            return files
+            # filtering is done on the server side
+            return [x.key for x in s3connection.Bucket(s3bucket).objects.filter(Prefix=s3filename.lstrip('/'))]
 
         if action == 'del':
             if filename is None:
@@ -61,32 +202,20 @@ def remote_uri(uri, filename, action):
             obj = s3connection.Object(s3bucket, s3filename)
             if not os.path.exists(os.path.abspath(os.path.split(filename)[0])):
                 os.makedirs(os.path.abspath(os.path.split(filename)[0]))
-            obj.download_file(filename, Config=TransferConfig(use_threads=False))
+            obj.download_file(filename, Config=s3_transfer_config())
 
         elif action == 'up':
             printd('Uploading %s to %s' % (filename, uri), topic='s3')
-            from botocore.exceptions import ClientError
-
             if s3filename.endswith('/'):
                 s3filename += filename.split('/')[-1]
-            try:
-                s3connection.meta.client.head_bucket(Bucket=s3bucket)
-            except ClientError as _excp:
-                # If a client error is thrown, then check that it was a 404 error.
-                # If it was a 404 error, then the bucket does not exist.
-                error_code = int(_excp.response['Error']['Code'])
-                if error_code == 404:
-                    s3connection.create_bucket(Bucket=s3bucket)
-                else:
-                    raise
-            bucket = s3connection.Bucket(s3bucket)
-            with open(filename, 'rb') as data:
-                bucket.put_object(Key=s3filename, Body=data)  # , Metadata=meta)
+            _s3_require_bucket(s3connection.meta.client, s3bucket)
+            s3connection.Bucket(s3bucket).upload_file(filename, s3filename, Config=s3_transfer_config())
 
 
 def save_omas_s3(ods, filename, user=os.environ.get('USER', 'dummy_user'), tmp_dir=omas_rcparams['tmp_omas_dir'], **kw):
     """
     Save an OMAS object to pickle and upload it to S3
+    The pickle is streamed into a multipart upload, without writing a local temporary file
 
     :param ods: OMAS data set
 
@@ -94,25 +223,33 @@ def save_omas_s3(ods, filename, user=os.environ.get('USER', 'dummy_user'), tmp_d
 
     :param user: username where to look for the file
 
-    :param tmp_dir: temporary folder for storing S3 file on local workstation
+    :param tmp_dir: not used (kept for backward compatibility)
 
-    :param kw: arguments passed to the save_omas_pkl function
+    :param kw: arguments passed to the pickle.dump function
     """
     printd('Saving to %s on S3' % (_base_S3_uri(user) + filename), topic='s3')
 
-    if not os.path.exists(os.path.abspath(tmp_dir)):
-        os.makedirs(os.path.abspath(tmp_dir))
-    save_omas_pkl(ods, os.path.abspath(tmp_dir) + os.sep + os.path.split(filename)[1], **kw)
-    return remote_uri(_base_S3_uri(user), os.path.abspath(tmp_dir) + os.sep + os.path.split(filename)[1], 'up')
+    kw.setdefault('protocol', omas_rcparams['pickle_protocol'])
+    s3_upload_stream(lambda f: pickle.dump(ods, f, **kw), _base_S3_uri(user) + os.path.split(filename)[1])
 
 
 def load_omas_s3(
-    filename, user=os.environ.get('USER', 'dummy_user'), consistency_check=None, imas_version=None, tmp_dir=omas_rcparams['tmp_omas_dir']
+    filename,
+    user=os.environ.get('USER', 'dummy_user'),
+    consistency_check=None,
+    imas_version=None,
+    tmp_dir=omas_rcparams['tmp_omas_dir'],
+    max_workers=8,
+    paths=None,
+    time=None,
+    time_index=None,
 ):
     """
     Download an OMAS object from S3 and read it as pickle
+    The object is downloaded to memory, without writing a local temporary file
+    NOTE: paths, time, and time_index are not supported for ODCs (see load_omas_pkl)
 
-    :param filename: filename to load from
+    :param filename: filename to load from (or list of filenames to load concurrently)
 
     :param user: username where to look for the file
 
@@ -120,18 +257,37 @@ def load_omas_s3(
 
     :param imas_version: imas version to use for consistency check (leave original if None)
 
-    :param tmp_dir: temporary folder for storing S3 file on local workstation
+    :param tmp_dir: not used (kept for backward compatibility)
 
-    :return: OMAS data set
+    :param max_workers: number of threads used to load a list of filenames
+
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  NOTE: pickles are not seekable, so the data is selected after the whole object is downloaded
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
+    :return: OMAS data set (or list of OMAS data sets if `filename` is a list)
     """
-    printd('loading from %s on S3' % (_base_S3_uri(user) + filename), topic='s3')
+    import boto3
+
+    # boto3 clients (unlike resources) can be shared among threads
+    client = boto3.client('s3')
+    config = s3_transfer_config()
+
+    def load(filename):
+        printd('loading from %s on S3' % (_base_S3_uri(user) + filename), topic='s3')
+        f = s3_download_stream(_base_S3_uri(user) + filename, client=client, config=config)
+        return load_omas_pkl(f, consistency_check, imas_version, paths=paths, time=time, time_index=time_index)
+
+    if isinstance(filename, str):
+        return load(filename)
+
+    from concurrent.futures import ThreadPoolExecutor
 
-    if not os.path.exists(os.path.abspath(tmp_dir)):
-        os.makedirs(os.path.abspath(tmp_dir))
-    remote_uri(_base_S3_uri(user) + filename, os.path.abspath(tmp_dir) + os.sep + os.sep + os.path.split(filename)[1], 'down')
-    return load_omas_pkl(
-        os.path.abspath(tmp_dir) + os.sep + os.path.split(filename)[1], consistency_check=consistency_check, imas_version=imas_version
-    )
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(load, filename))
 
 
 def list_omas_s3(user=''):
@@ -589,6 +589,8 @@ def add_extra_structures(extra_structures, lifecycle_status='tmp'):
     omas_utils._structures = {}
     omas_utils._structures_dict = {}
     omas_utils._ods_structure_cache = {}
+    omas_utils._schema_index = {}
+    omas_utils._schema_index_ids = {}
 
     # add _structures
     for _ids in extra_structures:
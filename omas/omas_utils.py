@@ -136,8 +136,7 @@ def different_ods_attrs(ods1, ods2, attrs=None, verbose=False):
 
         attrs = omas_ods_attrs
 
-    if '_parent' in attrs:
-        attrs.pop(attrs.index('_parent'))
+    attrs = [k for k in attrs if k != '_parent']
 
     n = max(list(map(lambda x: len(x), attrs)))
     l1 = set(list(map(lambda x: l2i(x[:-1]), ods1.paths(return_empty_leaves=True, traverse_code_parameters=False))))
@@ -149,8 +148,9 @@ def different_ods_attrs(ods1, ods2, attrs=None, verbose=False):
         first = True
         try:
             for k in attrs:
-                a1 = getattr(ods1[item], k)
-                a2 = getattr(ods2[item], k)
+                # settings shared across the ODS are accessed via properties
+                a1 = getattr(ods1[item], k.lstrip('_'))
+                a2 = getattr(ods2[item], k.lstrip('_'))
                 if a1 != a2:
                     if first:
                         if verbose:
@@ -234,7 +234,11 @@ def is_uncertain(var):
 
     if isinstance(var, str):
         return False
-    elif numpy.iterable(var) or isinstance(var, numpy.ndarray):  # isinstance needed for 0D arrays from squeeze
+    elif isinstance(var, numpy.ndarray):  # no copy of the data (eg. for memory-mapped arrays)
+        if var.dtype != object:
+            return False
+        return any(_uncertain_check(x) for x in var.flat)
+    elif numpy.iterable(var):
         tmp = numpy.array(var)
         if tmp.dtype not in ['O', 'object']:
             return False
@@ -300,6 +304,7 @@ def json_dumper(obj, objects_encode=True):
         * True: encode numpy arrays, complex, and uncertain
         * None: numpy arrays as lists, encode complex, and uncertain
         * False: numpy arrays as lists, fail on complex, and uncertain
+        * 'base64': numeric numpy arrays as base64 encoded binary data, encode complex, and uncertain
 
     :return: json-compatible object
     """
@@ -331,7 +336,13 @@ def json_dumper(obj, objects_encode=True):
                     shape=obj.shape,
                 )
         elif isinstance(obj, numpy.ndarray):
-            if 'complex' in str(obj.dtype).lower():
+            if objects_encode == 'base64' and obj.dtype.kind in 'biufc':
+                import base64
+
+                return dict(
+                    __ndarray__=base64.b64encode(numpy.ascontiguousarray(obj).data).decode('ascii'), dtype=obj.dtype.str, shape=obj.shape
+                )
+            elif 'complex' in str(obj.dtype).lower():
                 return dict(
                     __ndarray_tolist_real__=obj.real.tolist(),
                     __ndarray_tolist_imag__=obj.imag.tolist(),
@@ -445,12 +456,423 @@ def json_loader(object_pairs, cls=dict, null_to=None):
         import base64
 
         data = base64.b64decode(dct['__ndarray__'])
-        return numpy.frombuffer(data, dct['dtype']).reshape(dct['shape'])
+        return numpy.frombuffer(bytearray(data), dct['dtype']).reshape(dct['shape'])
     elif '__complex__' in dct:
         return complex(dct['real'], dct['imag'])
     return dct
 
 
+def _json_no_default(obj):
+    raise TypeError('Object of type %s is not JSON serializable' % obj.__class__.__name__)
+
+
+def json_stream_dump(obj, f, default=None, indent=None, separators=None, sort_keys=False):
+    """
+    Write json to a file descriptor chunk by chunk, without building the whole json string in memory
+
+    The output is the same as json.dump with the same arguments.
+    Objects are written as the hierarchy is traversed, while lists of json primitives
+    (eg. numpy arrays converted by `default`) are handed to the json C encoder in one go.
+
+    :param obj: object to write
+
+    :param f: file descriptor to write to
+
+    :param default: function that returns a serializable version of objects that json does not know how to serialize
+
+    :param indent: indentation level (as for json.dump)
+
+    :param separators: (item_separator, key_separator) tuple (as for json.dump)
+
+    :param sort_keys: output dictionaries sorted by key
+    """
+    if indent is not None and not isinstance(indent, str):
+        indent = ' ' * indent
+    if separators is None:
+        separators = (', ', ': ') if indent is None else (',', ': ')
+    item_separator, key_separator = separators
+
+    encoders = {}
+
+    def newline(level):
+        if indent is None:
+            return ''
+        return '\n' + indent * level
+
+    def encoder(level):
+        if level not in encoders:
+            encoders[level] = json.JSONEncoder(separators=(item_separator + newline(level), key_separator), default=_json_no_default)
+        return encoders[level].encode
+
+    def encode(o, level):
+        if o is None or isinstance(o, (str, int, float)):
+            f.write(encoder(0)(o))
+        elif isinstance(o, dict):
+            if not len(o):
+                f.write('{}')
+                return
+            f.write('{' + newline(level + 1))
+            items = sorted(o.items()) if sort_keys else o.items()
+            for k, (key, value) in enumerate(items):
+                if k:
+                    f.write(item_separator + newline(level + 1))
+                if not isinstance(key, str):
+                    key = encoder(0)(key).strip('"')
+                f.write(encoder(0)(key) + key_separator)
+                encode(value, level + 1)
+            f.write(newline(level) + '}')
+        elif isinstance(o, (list, tuple)):
+            if not len(o):
+                f.write('[]')
+                return
+            f.write('[' + newline(level + 1))
+            if not any(isinstance(item, (list, tuple, dict)) for item in o):
+                try:
+                    f.write(encoder(level + 1)(o)[1:-1])
+                    f.write(newline(level) + ']')
+                    return
+                except TypeError:
+                    pass
+            for k, item in enumerate(o):
+                if k:
+                    f.write(item_separator + newline(level + 1))
+                encode(item, level + 1)
+            f.write(newline(level) + ']')
+        elif default is not None:
+            encode(default(o), level)
+        else:
+            _json_no_default(o)
+
+    encode(obj, 0)
+
+
+class _JsonStream(object):
+    """
+    Incremental JSON parser that reads a file descriptor chunk by chunk (see json_stream_load)
+    """
+
+    _whitespace = re.compile(r'[ \t\n\r]*')
+    _delimiter = re.compile(r'[ \t\n\r,\]}]')
+    _structural = re.compile(r'[\[\]{}"]')
+    _constants = {'null': None, 'true': True, 'false': False, 'NaN': numpy.nan, 'Infinity': numpy.inf, '-Infinity': -numpy.inf}
+
+    def __init__(self, f, object_pairs_hook=None, chunk_size=2**20, select=None):
+        self.f = f
+        self.object_pairs_hook = object_pairs_hook
+        self.chunk_size = chunk_size
+        self.select = select
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def error(self, msg):
+        raise json.JSONDecodeError(msg, self.buffer, self.pos)
+
+    def fill(self):
+        """
+        Read the next chunk of the file, dropping the part of the buffer that was already parsed
+
+        :return: False when the end of the file is reached
+        """
+        if self.eof:
+            return False
+        # read at least as much as what is left in the buffer, to parse large values in linear time
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode('utf-8')
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        """
+        :return: next character that is not a whitespace ('' at the end of the file)
+        """
+        while True:
+            self.pos = self._whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def skip(self):
+        """
+        Skip the next value without building it
+        """
+        c = self.skip_whitespace()
+        if c == '"':
+            self.string()
+            return
+        elif c not in '[{':
+            self.value()
+            return
+        depth = 0
+        while True:
+            match = self._structural.search(self.buffer, self.pos)
+            if not match:
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    self.error('Unterminated value')
+                continue
+            self.pos = match.start()
+            if match.group() == '"':
+                self.string()
+                continue
+            self.pos += 1
+            depth += 1 if match.group() in '[{' else -1
+            if not depth:
+                return
+
+    def selected(self, path):
+        """
+        :param path: location of the value (None if all the values are selected)
+
+        :return: False to skip the value, True to select its content, 'all' to select the value and everything in it
+        """
+        if path is None:
+            return 'all'
+        return self.select(path)
+
+    def value(self, path=None):
+        c = self.skip_whitespace()
+        if c == '{':
+            return self.object(path)
+        elif c == '[':
+            return self.array(path)
+        elif c == '"':
+            return self.string()
+        elif not c:
+            self.error('Expecting value')
+        # literals are complete once a delimiter is found
+        while not self._delimiter.search(self.buffer, self.pos) and self.fill():
+            pass
+        match = json.scanner.NUMBER_RE.match(self.buffer, self.pos)
+        if match:
+            integer, frac, exp = match.groups()
+            self.pos = match.end()
+            if frac or exp:
+                return float(integer + (frac or '') + (exp or ''))
+            return int(integer)
+        for literal, value in self._constants.items():
+            if self.buffer.startswith(literal, self.pos):
+                self.pos += len(literal)
+                return value
+        self.error('Expecting value')
+
+    def string(self):
+        while True:
+            try:
+                value, self.pos = json.decoder.scanstring(self.buffer, self.pos + 1)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+    def array(self, path=None):
+        # arrays of numbers are parsed in one go
+        offset = 1
+        while True:
+            match = self._structural.search(self.buffer, self.pos + offset)
+            offset = len(self.buffer) - self.pos
+            if match or not self.fill():
+                break
+        if match and match.group() == ']':
+            value = json.loads(self.buffer[self.pos : match.end()])
+            self.pos = match.end()
+            return value
+        self.pos += 1
+        items = []
+        if self.skip_whitespace() == ']':
+            self.pos += 1
+            return items
+        while True:
+            selected = self.selected(path if path is None else path + (len(items),))
+            if selected:
+                items.append(self.value(None if selected == 'all' else path + (len(items),)))
+            else:
+                # placeholder preserves the indexes of the following items
+                self.skip()
+                items.append(self.object_pairs_hook([]) if self.object_pairs_hook is not None else {})
+            c = self.skip_whitespace()
+            self.pos += 1
+            if c == ']':
+                return items
+            elif c != ',':
+                self.pos -= 1
+                self.error("Expecting ',' delimiter")
+
+    def object(self, path=None):
+        self.pos += 1
+        pairs = []
+        if self.skip_whitespace() == '}':
+            self.pos += 1
+        else:
+            while True:
+                if self.skip_whitespace() != '"':
+                    self.error('Expecting property name enclosed in double quotes')
+                key = self.string()
+                if self.skip_whitespace() != ':':
+                    self.error("Expecting ':' delimiter")
+                self.pos += 1
+                selected = self.selected(path if path is None else path + (key,))
+                if selected:
+                    pairs.append((key, self.value(None if selected == 'all' else path + (key,))))
+                else:
+                    self.skip()
+                c = self.skip_whitespace()
+                self.pos += 1
+                if c == '}':
+                    break
+                elif c != ',':
+                    self.pos -= 1
+                    self.error("Expecting ',' delimiter")
+        if self.object_pairs_hook is not None:
+            return self.object_pairs_hook(pairs)
+        return dict(pairs)
+
+
+def json_stream_load(f, object_pairs_hook=None, chunk_size=2**20, select=None):
+    """
+    Load json from a file descriptor reading it chunk by chunk
+
+    Objects are built (via `object_pairs_hook`) as soon as they are parsed, so that memory usage
+    is bounded by the size of the largest array, and not by the size of the json document.
+    Arrays of numbers are handed to the json C decoder in one go.
+
+    :param f: file descriptor to read from
+
+    :param object_pairs_hook: function called with the list of (key, value) pairs of each object (like for json.load)
+
+    :param chunk_size: number of characters that are read at once
+
+    :param select: function called with the tuple of keys/indexes leading to each value, returning
+                   False if the value should be skipped without being built,
+                   True if the value should be parsed and its content selected by `select`,
+                   'all' if the value should be parsed with all of its content
+
+    :return: json object (None if the file is empty)
+    """
+    stream = _JsonStream(f, object_pairs_hook=object_pairs_hook, chunk_size=chunk_size, select=select)
+    if not stream.skip_whitespace():
+        return None
+    value = stream.value(None if select is None else ())
+    if stream.skip_whitespace():
+        stream.error('Extra data')
+    return value
+
+
+def parallel_map(function, items, max_workers=None, processes=False):
+    """
+    Apply function to each of the items, optionally with a pool of workers
+
+    :param function: function of one argument (must be picklable if `processes=True`)
+
+    :param items: iterable of arguments
+
+    :param max_workers: number of concurrent workers (None or 1 for serial execution)
+
+    :param processes: use a pool of processes instead of a pool of threads
+
+    :return: list with the results, in the same order as the items (regardless of the order of execution)
+    """
+    items = list(items)
+    if not max_workers or max_workers == 1 or len(items) < 2:
+        return list(map(function, items))
+
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(function, items))
+
+
+class paths_filter(object):
+    """
+    Class used by the load_omas_XXX functions to select the ODS locations to be loaded
+
+    Each path selects all of the data below it (eg. `equilibrium.time_slice.0` selects the whole time slice).
+    Paths can be ODS locations (where `:` selects all the structures of an array of structures)
+    or regular expressions in the syntax of `ODS.search_paths` (eg. `equilibrium.time_slice.[0-9]+.global_quantities.ip`)
+    """
+
+    def __init__(self, paths=None, time=False):
+        """
+        :param paths: list of paths to select (None to select everything)
+
+        :param time: also select the `time` arrays that are needed to slice in time the selected data
+        """
+        self.patterns = None
+        self.time = time
+        if paths is None:
+            return
+        if isinstance(paths, str):
+            paths = [paths]
+        self.patterns = []
+        for path in paths:
+            if not isinstance(path, str):
+                path = l2o(path)
+            regex = re.compile('(?:%s)(?:_error_upper)?(?:\\.|$)' % re.sub(r'(^|\.):(?=\.|$)', r'\1[0-9]+', path))
+            # leading steps of the path that do not depend on the regular expression, used to skip whole subtrees
+            prefix = []
+            tokens = path.split('.')
+            for k, token in enumerate(tokens):
+                if '|' in path or not re.match(r'^(\w+|:)$', token):
+                    break
+                elif k + 1 < len(tokens) and (not tokens[k + 1] or tokens[k + 1][0] in '*+?{'):
+                    break
+                prefix.append(token)
+            self.patterns.append((regex, prefix))
+
+    def __bool__(self):
+        return self.patterns is not None
+
+    def walk(self, path):
+        """
+        :param path: location of a structure (as a list, `:` matches any index)
+
+        :return: whether some of the data below the location may be selected
+        """
+        if self.patterns is None:
+            return True
+        path = list(map(str, path))
+        for regex, prefix in self.patterns:
+            if all(
+                step == item or (step == ':' and item.isdigit()) or (item == ':' and step.isdigit()) for step, item in zip(prefix, path)
+            ):
+                return True
+        return False
+
+    def match(self, path, time=None):
+        """
+        :param path: location of the data (as a list)
+
+        :param time: select the `time` arrays needed to slice the data in time (None to use the setting of the filter)
+
+        :return: whether the data is selected
+        """
+        if self.patterns is None:
+            return True
+        location = l2o(path)
+        if any(regex.match(location) for regex, prefix in self.patterns):
+            return True
+        if time is None:
+            time = self.time
+        return bool(time) and str(path[-1]) == 'time' and self.walk(path[:-1])
+
+    def select(self, path):
+        """
+        :param path: location of the data (as a list)
+
+        :return: 'all' if the data is selected, True if some of the data below the location may be selected, False otherwise
+        """
+        if self.match(path):
+            return 'all'
+        return self.walk(path)
+
+
 def recursive_glob(pattern='*', rootdir='.'):
     """
     Search recursively for files matching a specified pattern within a rootdir
@@ -664,6 +1086,10 @@ _structures_filenames = {}
 _ods_structure_cache = {}
 # similar to `_structures_dict` but for use in omas_info
 _info_structures = {}
+# compiled schema index: {imas_version: {ulocation: omas_schema_node}}
+_schema_index = {}
+# IDSs that have been compiled in the schema index: {imas_version: set of IDS names}
+_schema_index_ids = {}
 # dictionary that contains all the coordinates defined within the data dictionary
 _coordinates = {}
 # dictionary that contains all the times defined within the data dictionary
@@ -726,6 +1152,115 @@ def structures_filenames(imas_version):
     return _structures_filenames[imas_version]
 
 
+# bump this number whenever the content of the on-disk structures cache changes
+_structures_cache_format = 1
+
+
+def _structures_cache_filename(filename):
+    """
+    Filename of the on-disk cache of a IMAS structures json file
+
+    :param filename: full path to json file
+
+    :return: cache filename or None if the cache is disabled
+    """
+    cache_dir = omas_rcparams['structures_cache_dir']
+    if not cache_dir:
+        return None
+    version_dir = os.path.basename(os.path.dirname(os.path.abspath(filename)))
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return os.sep.join([cache_dir, version_dir, f'{name}.{sys.implementation.cache_tag}.marshal'])
+
+
+def cached_json_load(filename, process=None):
+    """
+    Load a json file of the IMAS data structures through a persistent on-disk cache.
+    The cache is stored in `omas_rcparams['structures_cache_dir']` (set to '' to disable)
+    and it is invalidated whenever the modification time or the size of the json file change.
+
+    :param filename: full path to json file
+
+    :param process: function applied to the json data before it is cached
+
+    :return: (processed) json data
+    """
+    stat = os.stat(filename)
+    stamp = (_structures_cache_format, stat.st_mtime_ns, stat.st_size)
+
+    # load from cache
+    cache_filename = _structures_cache_filename(filename)
+    if cache_filename is not None and os.path.exists(cache_filename):
+        try:
+            with open(cache_filename, 'rb') as f:
+                cache_stamp, data = marshal.loads(f.read())
+            if cache_stamp == stamp:
+                return data
+        except Exception as _excp:
+            printd('Invalid structures cache %s: %s' % (cache_filename, repr(_excp)), topic='structures')
+
+    # load from json
+    with open(filename, 'r') as f:
+        data = json.loads(f.read())
+    if process is not None:
+        data = process(data)
+
+    # write cache (atomically, since many processes may be doing the same)
+    if cache_filename is not None:
+        tmp_filename = cache_filename + '.%d' % os.getpid()
+        try:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            with open(tmp_filename, 'wb') as f:
+                f.write(marshal.dumps((stamp, data)))
+            os.replace(tmp_filename, cache_filename)
+        except OSError as _excp:
+            printd('Could not write structures cache %s: %s' % (cache_filename, repr(_excp)), topic='structures')
+    return data
+
+
+def _structure_hierarchy(structure):
+    """
+    Generate hierarchical structure from flat IMAS structure definitions
+
+    :param structure: flat structure definitions as stored in the json files
+
+    :return: tuple with flat and hierarchical structure
+    """
+    hierarchy = {}
+    for item in structure:
+        h = hierarchy
+        for step in i2o(item).split('.'):
+            if step not in h:
+                h[step] = {}
+            h = h[step]
+    return structure, hierarchy
+
+
+def build_structures_cache(imas_version=None):
+    """
+    Prebuild the on-disk cache of the IMAS structures json files (eg. at install time)
+
+    :param imas_version: IMAS version or list of IMAS versions to cache (all versions if None)
+
+    :return: number of json files that are cached
+    """
+    if imas_version is None:
+        imas_version = list(imas_versions.keys())
+    elif isinstance(imas_version, str):
+        imas_version = [imas_version]
+    n = 0
+    for version in imas_version:
+        printd('Caching IMAS structures `%s`' % version, topic='structures')
+        for filename in structures_filenames(version).values():
+            cached_json_load(filename, _structure_hierarchy)
+            n += 1
+        for item in ['_coordinates', '_times', '_global_quantities']:
+            filename = imas_json_dir + os.sep + imas_versions.get(version, version) + os.sep + item + '.json'
+            if os.path.exists(filename):
+                cached_json_load(filename)
+                n += 1
+    return n
+
+
 def load_structure(filename, imas_version):
     """
     load omas structure from given json filename or IDS name
@@ -749,10 +1284,8 @@ def load_structure(filename, imas_version):
         return _structures[id], _structures_dict[id]
 
     else:
-        with open(filename, 'r') as f:
-            dump_string = f.read()
-        # load flat definitions from json file
-        _structures[id] = json.loads(dump_string)
+        # load flat definitions and hierarchical structure from json file (through the on-disk cache)
+        _structures[id], _structures_dict[id] = cached_json_load(filename, _structure_hierarchy)
 
         # add _extra_structures definitions
         structure_name = os.path.splitext(os.path.split(filename)[1])[0]
@@ -763,15 +1296,11 @@ def load_structure(filename, imas_version):
                     _structures[id][item] = _extra_structures[structure_name][item]
                     if cs is not None:
                         cocos_signals[i2o(item)] = cs
-
-        # generate hierarchical structure
-        _structures_dict[id] = {}
-        for item in _structures[id]:
-            h = _structures_dict[id]
-            for step in i2o(item).split('.'):
-                if step not in h:
-                    h[step] = {}
-                h = h[step]
+                    h = _structures_dict[id]
+                    for step in i2o(item).split('.'):
+                        if step not in h:
+                            h[step] = {}
+                        h = h[step]
 
     return _structures[id], _structures_dict[id]
 
@@ -801,6 +1330,74 @@ def imas_structure(imas_version, location):
     return _ods_structure_cache[imas_version][ulocation]
 
 
+# immutable record with the schema information of a node in the IMAS data dictionary
+# * info: read-only view of the node entry as loaded by load_structure() (lists are stored as tuples)
+# * ndim: number of dimensions as defined by the coordinates (None for nodes without coordinates)
+# * cocos_signal: COCOS transformation of the node (None if the node does not need one)
+# * cocos_location: universal location of the node that defines the COCOS transformation (differs for _error_upper/_error_lower)
+omas_schema_node = namedtuple(
+    'omas_schema_node', ['info', 'data_type', 'ndim', 'coordinates', 'lifecycle_status', 'cocos_signal', 'cocos_location']
+)
+_empty_schema_node = omas_schema_node(MappingProxyType({}), None, None, (), None, None, None)
+
+
+def compile_schema_index(ids, imas_version):
+    """
+    Compile the IMAS schema of an IDS into a flat table that maps
+    universal ODS paths to immutable omas_schema_node records
+
+    :param ids: IDS name
+
+    :param imas_version: imas version
+
+    :return: dictionary with the schema index of all the IDSs compiled so far for this imas version
+    """
+    from .omas_physics import cocos_signals
+
+    index = _schema_index.setdefault(imas_version, {})
+    compiled = _schema_index_ids.setdefault(imas_version, set())
+    if ids not in compiled:
+        for item, entry in load_structure(ids, imas_version)[0].items():
+            ulocation = i2o(item)
+            blocation = re.sub(r'_error_(upper|lower)$', '', ulocation)
+            info = MappingProxyType({k: tuple(v) if isinstance(v, list) else v for k, v in entry.items()})
+            coordinates = info.get('coordinates', ())
+            index[ulocation] = omas_schema_node(
+                info=info,
+                data_type=info.get('data_type', None),
+                ndim=len(coordinates) if 'coordinates' in info else None,
+                coordinates=coordinates,
+                lifecycle_status=info.get('lifecycle_status', None),
+                cocos_signal=dict.get(cocos_signals, blocation, None),
+                cocos_location=blocation,
+            )
+        compiled.add(ids)
+    return index
+
+
+def schema_node(ulocation, imas_version=omas_rcparams['default_imas_version']):
+    """
+    Fast lookup of the schema information of a node (no copies are made)
+
+    :param ulocation: universal ODS path
+
+    :param imas_version: imas version
+
+    :return: omas_schema_node record (with empty info if the node is not found)
+    """
+    try:
+        return _schema_index[imas_version][ulocation]
+    except KeyError:
+        ids = ulocation.split('.')[0]
+        if ids in _schema_index_ids.get(imas_version, ()):
+            return _empty_schema_node
+        try:
+            return compile_schema_index(ids, imas_version).get(ulocation, _empty_schema_node)
+        except KeyError:
+            _schema_index_ids.setdefault(imas_version, set()).add(ids)
+            return _empty_schema_node
+
+
 def omas_coordinates(imas_version=omas_rcparams['default_imas_version']):
     """
     return list of coordinates
@@ -813,8 +1410,7 @@ def omas_coordinates(imas_version=omas_rcparams['default_imas_version']):
     if imas_version not in _coordinates:
         filename = imas_json_dir + os.sep + imas_versions.get(imas_version, imas_version) + os.sep + '_coordinates.json'
         if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                _coordinates[imas_version] = json.load(f)
+            _coordinates[imas_version] = cached_json_load(filename)
         else:
             from .omas_structure import extract_coordinates
 
@@ -834,8 +1430,7 @@ def omas_times(imas_version=omas_rcparams['default_imas_version']):
     if imas_version not in _times:
         filename = imas_json_dir + os.sep + imas_versions.get(imas_version, imas_version) + os.sep + '_times.json'
         if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                _times[imas_version] = json.load(f)
+            _times[imas_version] = cached_json_load(filename)
         else:
             from .omas_structure import extract_times
 
@@ -855,8 +1450,7 @@ def omas_global_quantities(imas_version=omas_rcparams['default_imas_version']):
     if imas_version not in _global_quantities:
         filename = imas_json_dir + os.sep + imas_versions.get(imas_version, imas_version) + os.sep + '_global_quantities.json'
         if os.path.exists(filename):
-            with open(filename, 'r') as f:
-                _global_quantities[imas_version] = json.load(f)
+            _global_quantities[imas_version] = cached_json_load(filename)
         else:
             from .omas_structure import extract_global_quantities
 
@@ -0,0 +1,365 @@
+'''save/load from Zarr routines
+
+-------
+'''
+
+from .omas_utils import *
+from .omas_core import ODS, dynamic_ODS, load_subset
+
+
+def zarr_group(filename, mode='r'):
+    """
+    Open the root group of a Zarr store
+
+    :param filename: directory of the Zarr store (or `.zip` file for a zip store)
+
+    :param mode: persistence mode: 'r' read only, 'w' create (overwrite if exists), 'a' read/write (create if does not exist)
+
+    :return: tuple with Zarr root group and store (the store must be closed when done writing/reading a zip file, else None)
+    """
+    import zarr
+
+    if isinstance(filename, str) and filename.endswith('.zip'):
+        store = zarr.storage.ZipStore(filename, mode=mode)
+        return zarr.open_group(store=store, mode=mode), store
+    return zarr.open_group(filename, mode=mode), None
+
+
+def dict2zarr(group, dictin, groupname='', **kw):
+    """
+    Utility function to save hierarchy of dictionaries containing numpy-compatible objects to a Zarr group
+
+    Structures and arrays of structures are stored as Zarr groups (the structures of the arrays of structures in groups named `0`, `1`, ...)
+    Numeric arrays are stored as chunked Zarr arrays, while scalars and strings are stored as attributes of the group they belong to
+    (complex scalars are stored as 0-d arrays)
+
+    :param group: Zarr group to save to
+
+    :param dictin: input dictionary
+
+    :param groupname: group to save the data in (overwritten if it exists)
+
+    :param kw: keywords passed to the Zarr `create_array` method (eg. `chunks`, `compressors`)
+    """
+    if isinstance(dictin, ODS):
+        dictin = dictin.omas_data
+    if isinstance(dictin, list):
+        dictin = dict(enumerate(dictin))
+
+    attrs = {}
+    arrays = {}
+    groups = {}
+    for key, item in (dictin or {}).items():
+        key = str(key)
+
+        if isinstance(item, ODS):
+            item = item.omas_data
+
+        if isinstance(item, (dict, list)):
+            groups[key] = item
+
+        elif isinstance(item, numpy.ndarray) and item.ndim and item.dtype.kind in 'biufc':
+            arrays[key] = item
+
+        elif isinstance(item, numpy.ndarray) and item.ndim and is_uncertain(item):
+            arrays[key] = nominal_values(item)
+            arrays[key + '_error_upper'] = std_devs(item)
+
+        elif isinstance(item, numpy.ndarray) and item.ndim and item.dtype.kind in 'SU':
+            attrs[key] = item.astype(str).tolist()
+
+        elif is_uncertain(item):
+            attrs[key] = nominal_values(item)
+            attrs[key + '_error_upper'] = std_devs(item)
+
+        elif isinstance(item, (complex, numpy.complexfloating)) or (isinstance(item, numpy.ndarray) and item.dtype.kind == 'c'):
+            # complex scalars cannot be stored as JSON attributes, so they are stored as 0-d arrays
+            arrays[key] = numpy.asarray(item)
+
+        elif isinstance(item, (numpy.generic, numpy.ndarray)):
+            attrs[key] = item.item()
+
+        elif isinstance(item, (str, int, float)):
+            attrs[key] = item
+
+        else:
+            raise TypeError('Cannot save `%s` of type %s to Zarr' % (key, type(item)))
+
+    # attributes are written together with the group metadata
+    if groupname:
+        group = group.create_group(groupname, attributes=attrs, overwrite=True)
+    elif attrs:
+        group.attrs.update(attrs)
+
+    for key, item in arrays.items():
+        group.create_array(key, data=item, overwrite=True, **kw)
+
+    for key, item in groups.items():
+        dict2zarr(group, item, key, **kw)
+
+    return group
+
+
+def save_omas_zarr(ods, filename, location=None, mode='w', **kw):
+    """
+    Save an ODS to Zarr
+
+    Different processes can write different IDSs or structures of arrays of structures to the same Zarr directory store concurrently
+    by saving sub-ODSs (eg. `save_omas_zarr(ods['equilibrium.time_slice.3'], filename, mode='a')`)
+
+    :param ods: OMAS data set
+
+    :param filename: directory of the Zarr store (or `.zip` file for a zip store)
+
+    :param location: location in the store where the ODS is saved (None to use the location of the ODS)
+
+    :param mode: 'w' to overwrite the store, 'a' to add to the data already in the store
+
+    :param kw: keywords passed to the Zarr `create_array` method (eg. `chunks`, `compressors`)
+    """
+    printd('Saving OMAS data to Zarr: %s' % filename, topic=['Zarr', 'zarr'])
+
+    if location is None:
+        location = ods.location
+
+    root, store = zarr_group(filename, mode=mode)
+    try:
+        if location:
+            path = list(map(str, p2l(location)))
+            group = root.require_group('/'.join(path[:-1])) if len(path) > 1 else root
+            dict2zarr(group, ods, path[-1], **kw)
+        else:
+            dict2zarr(root, ods, **kw)
+    finally:
+        if store is not None:
+            store.close()
+
+
+def get_zarr_items(group, select=None):
+    """
+    Convenience function for loading OMAS data stored in a Zarr group
+    Handles arrays, scalars, strings, and uncertain quantities
+
+    :param group: Zarr group
+
+    :param select: function called with the name of each array and attribute, returning whether it should be loaded
+                   (arrays that are not selected are not read from the store)
+
+    :return: dictionary with the data (numpy arrays, scalars, strings) and sub-groups in the group
+    """
+    import zarr
+
+    items = {}
+    for key, value in group.attrs.asdict().items():
+        if select is None or select(key):
+            items[key] = numpy.array(value) if isinstance(value, list) else value
+    for key, value in group.members():
+        if isinstance(value, zarr.Group):
+            items[key] = value
+        elif select is None or select(key):
+            items[key] = value[...] if value.ndim else value[()].item()
+    for key in list(items.keys()):
+        if key.endswith('_error_upper') and key[: -len('_error_upper')] in items:
+            base = key[: -len('_error_upper')]
+            if isinstance(items[base], numpy.ndarray):
+                items[base] = uarray(items[base], items.pop(key))
+            else:
+                items[base] = ufloat(items[base], items.pop(key))
+    return items
+
+
+def convertGroup(ods, group, pfilter=None, location=[]):
+    """
+    Recursive utility function to map Zarr structure to ODS
+
+    :param ods: input ODS to be populated
+
+    :param group: Zarr group
+
+    :param pfilter: paths_filter to select the data to load (None to load everything)
+
+    :param location: location of the group (as a list)
+    """
+    import zarr
+
+    select = None
+    if pfilter:
+        select = lambda key: pfilter.match(location + [convert_int(key)])
+    items = {convert_int(key): value for key, value in get_zarr_items(group, select).items()}
+    for key in sorted(items, key=lambda k: (isinstance(k, str), k)):
+        value = items[key]
+        if isinstance(value, zarr.Group):
+            # structures may be missing if they have not been written (yet)
+            if isinstance(key, int):
+                while len(ods.omas_data or []) < key:
+                    ods.setraw(len(ods.omas_data or []), ods.same_init_ods())
+            if pfilter and not pfilter.walk(location + [key]):
+                # keep the indexes of the structures of the arrays of structures
+                if isinstance(key, int):
+                    ods.setraw(key, ods.same_init_ods())
+                continue
+            convertGroup(ods.setraw(key, ods.same_init_ods()), value, pfilter, location + [key])
+        else:
+            ods.setraw(key, value)
+
+
+def load_omas_zarr(
+    filename,
+    consistency_check=True,
+    imas_version=omas_rcparams['default_imas_version'],
+    cls=ODS,
+    paths=None,
+    time=None,
+    time_index=None,
+):
+    """
+    Load ODS or ODC from Zarr
+
+    :param filename: directory of the Zarr store (or `.zip` file for a zip store)
+
+    :param consistency_check: verify that data is consistent with IMAS schema
+
+    :param imas_version: imas version to use for consistency check
+
+    :param cls: class to use for loading the data
+
+    :param paths: list of paths to load (see paths_filter), None to load everything
+                  only the selected arrays are read from the store
+
+    :param time: time [s] at which the IDSs are sliced
+
+    :param time_index: time index at which the IDSs are sliced (has precedence over time)
+
+    :return: OMAS data set
+    """
+    printd('Loading OMAS data from Zarr: %s' % filename, topic=['Zarr', 'zarr'])
+
+    pfilter = paths_filter(paths, time=time is not None or time_index is not None)
+    ods = cls(imas_version=imas_version, consistency_check=False)
+    root, store = zarr_group(filename, mode='r')
+    try:
+        convertGroup(ods, root, pfilter)
+    finally:
+        if store is not None:
+            store.close()
+    if pfilter or time is not None or time_index is not None:
+        load_subset(ods, pfilter, time=time, time_index=time_index)
+    ods.consistency_check = consistency_check
+    return ods
+
+
+class dynamic_omas_zarr(dynamic_ODS):
+    """
+    Class that provides dynamic data loading from Zarr store
+    This class is not to be used by itself, but via the ODS.open() method.
+    """
+
+    def __init__(self, filename):
+        self.kw = {'filename': filename}
+        self.data = None
+        self.store = None
+        self.cache = {}
+        self.active = False
+
+    def open(self):
+        printd('Dynamic open  %s' % self.kw, topic='dynamic')
+        self.data, self.store = zarr_group(self.kw['filename'], mode='r')
+        self.cache = {}
+        self.active = True
+        return self
+
+    def close(self):
+        printd('Dynamic close %s' % self.kw, topic='dynamic')
+        if self.store is not None:
+            self.store.close()
+        self.data = None
+        self.store = None
+        self.active = False
+        return self
+
+    def _group(self, path):
+        """
+        :param path: ODS path as a list
+
+        :return: tuple with Zarr group at path (None if it is not in the store) and its attributes
+        """
+        import zarr
+
+        path = tuple(path)
+        if path not in self.cache:
+            group = self.data
+            for step in path:
+                group = group.get(str(step), None)
+                if not isinstance(group, zarr.Group):
+                    group = None
+                    break
+            self.cache[path] = (group, group.attrs.asdict() if group is not None else {})
+        return self.cache[path]
+
+    def _item(self, key):
+        """
+        :param key: ODS location
+
+        :return: tuple with the Zarr group, attributes, and item name for the location (group is None if location is not in the store)
+        """
+        import zarr
+
+        path = p2l(key)
+        item = str(path[-1])
+        group, attrs = self._group(path[:-1])
+        if group is not None and (item in attrs or isinstance(group.get(item, None), zarr.Array)):
+            return group, attrs, item
+        return None, {}, item
+
+    def __getitem__(self, key):
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        printd('Dynamic read  %s: %s' % (self.kw['filename'], key), topic='dynamic')
+        group, attrs, item = self._item(key)
+        if group is None:
+            raise LookupError('`%s` is not in %s' % (key, self.kw['filename']))
+        values = []
+        for name in [item, item + '_error_upper']:
+            if name in attrs:
+                values.append(numpy.array(attrs[name]) if isinstance(attrs[name], list) else attrs[name])
+            elif name in group:
+                values.append(group[name][...] if group[name].ndim else group[name][()].item())
+        if len(values) == 1:
+            return values[0]
+        elif isinstance(values[0], numpy.ndarray):
+            return uarray(*values)
+        return ufloat(*values)
+
+    def __contains__(self, key):
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        return self._item(key)[0] is not None
+
+    def keys(self, location):
+        if not self.active:
+            raise RuntimeError('Dynamic link broken: %s' % self.kw)
+        group, attrs = self._group(p2l(location) if location else [])
+        if group is None:
+            return []
+        keys = set(attrs.keys()).union(group.keys())
+        keys = [convert_int(item) for item in keys if not (item.endswith('_error_upper') and item[: -len('_error_upper')] in keys)]
+        return sorted(keys, key=lambda k: (isinstance(k, str), k))
+
+
+def through_omas_zarr(ods, method=['function', 'class_method'][1]):
+    """
+    Test save and load OMAS Zarr
+
+    :param ods: ods
+
+    :return: ods
+    """
+    filename = omas_testdir(__file__) + '/test.zarr'
+    ods = copy.deepcopy(ods)  # make a copy to make sure save does not alter entering ODS
+    if method == 'function':
+        save_omas_zarr(ods, filename)
+        ods1 = load_omas_zarr(filename)
+    else:
+        ods.save(filename)
+        ods1 = ODS().load(filename)
+    return ods1
@@ -49,6 +49,13 @@ try:
 except (ImportError, RuntimeError, NoCredentialsError) as _excp:
     failed_S3 = _excp
 
+try:
+    import moto
+
+    failed_MOTO = False
+except ImportError as _excp:
+    failed_MOTO = _excp
+
 try:
     from pymongo import MongoClient
     from pymongo.errors import ServerSelectionTimeoutError
@@ -61,6 +68,29 @@ try:
 except (ImportError, ServerSelectionTimeoutError) as _excp:
     failed_MONGO = _excp
 
+try:
+    import mongomock
+    import mongomock.gridfs
+
+    mongomock.gridfs.enable_gridfs_integration()
+    failed_MONGOMOCK = False
+except ImportError as _excp:
+    failed_MONGOMOCK = _excp
+
+try:
+    import orjson
+
+    failed_ORJSON = False
+except ImportError as _excp:
+    failed_ORJSON = _excp
+
+try:
+    import zarr
+
+    failed_ZARR = False
+except ImportError as _excp:
+    failed_ZARR = _excp
+
 with warnings.catch_warnings():
     warnings.simplefilter('ignore')
     try:
@@ -92,6 +122,10 @@ __all__ = [
     'failed_HDC',
     'failed_S3',
     'failed_MONGO',
+    'failed_MONGOMOCK',
+    'failed_MOTO',
+    'failed_ORJSON',
+    'failed_ZARR',
     'failed_OMFIT',
     'failed_UDA',
     'failed_MDS',
@@ -12,6 +12,7 @@ Test script for omas/omas_core.py
 """
 
 import os
+import gc
 import numpy
 from pprint import pprint
 import xarray
@@ -193,6 +194,23 @@ class TestOmasCore(UnittestCaseOmas):
             equal_nan=True,
         )
 
+    def test_nested_data_slicing(self):
+        ods = ODS()
+        for k in range(3):
+            ods[f'equilibrium.time_slice.{k}.profiles_2d.0.psi'] = numpy.ones((2, 2)) * k
+            if k != 1:
+                ods[f'equilibrium.time_slice.{k}.global_quantities.ip'] = float(k)
+        psi = ods['equilibrium.time_slice.:.profiles_2d.:.psi']
+        assert psi.shape == (3, 1, 2, 2)
+        assert numpy.all(psi[2] == 2.0)
+        # structures that do not have data
+        ip = ods['equilibrium.time_slice.:.global_quantities.ip']
+        assert ip[0] == 0.0 and ip[1] == [] and ip[2] == 2.0
+        # data processed on the way out
+        with omas_environment(ods, cocosio=2):
+            psi2 = ods['equilibrium.time_slice.:.profiles_2d.:.psi']
+        assert numpy.allclose(psi2, -psi / (2 * numpy.pi))
+
     def test_uncertain_slicing(self):
         """Tests whether : slicing works properly with uncertain data"""
         from uncertainties import ufloat
@@ -202,6 +220,29 @@ class TestOmasCore(UnittestCaseOmas):
         result = ods['pulse_schedule.position_control.x_point.:.z.reference']
         # Trips a ValueError if the dtype of the uncertain array isn't handled properly.
 
+    def test_from_flat(self):
+        ods = ODS().sample(ntimes=2)
+        ods1 = ODS().from_flat(ods.flat())
+        assert not ods.diff(ods1)
+
+        # paths in any order and syntax
+        ods = ODS().from_flat(
+            {
+                'equilibrium.time_slice[1].global_quantities.ip': 2.0,
+                ('equilibrium', 'time_slice', 0, 'global_quantities', 'ip'): 1,
+                'equilibrium.time_slice.0.profiles_1d.psi': [0.0, 1.0],
+            }
+        )
+        assert ods['equilibrium.time_slice.0.global_quantities.ip'] == 1.0
+        assert isinstance(ods['equilibrium.time_slice.0.global_quantities.ip'], float)
+        assert isinstance(ods['equilibrium.time_slice.0.profiles_1d.psi'], numpy.ndarray)
+
+        # invalid locations are handled like with __setitem__
+        ods = ODS()
+        self.assertRaises(LookupError, ods.from_flat, {'equilibrium.time_slice.0.global_quantities.does_not_exist': 1.0})
+        self.assertRaises(IndexError, ods.from_flat, {'equilibrium.time_slice.1.global_quantities.ip': 1.0})
+        assert not len(ods.paths())
+
     def test_dynamic_set_nonzero_array_index(self):
         ods = ODS()
         ods.consistency_check = False
@@ -411,6 +452,88 @@ class TestOmasCore(UnittestCaseOmas):
         ods2['equilibrium.vacuum_toroidal_field.r0'] += 1
         assert ods['equilibrium.vacuum_toroidal_field.r0'] + 1 == ods2['equilibrium.vacuum_toroidal_field.r0']
 
+    def test_slots(self):
+        ods = ODS(imas_version='3.30.0', cocos=2)
+        ods['equilibrium.time_slice.0.global_quantities.ip'] = 1.0
+        node = ods['equilibrium.time_slice.0']
+        assert not hasattr(node, '__dict__')
+        # settings are read from the top-level ODS
+        assert node.imas_version == '3.30.0' and node.cocos == 2
+        # copies and pickles of sub-trees carry the settings with them
+        node1 = copy.deepcopy(node)
+        assert node1.parent is None
+        assert node1.imas_version == '3.30.0' and node1.cocos == 2
+        ods1 = pickle.loads(pickle.dumps(ods))
+        assert ods1.imas_version == '3.30.0' and ods1.cocos == 2
+        assert ods1['equilibrium.time_slice.0'].top is ods1
+        node1 = pickle.loads(pickle.dumps(ods['equilibrium']))
+        assert node1.parent is None
+        assert node1.imas_version == '3.30.0' and node1.cocos == 2
+        assert node1['time_slice.0'].imas_version == '3.30.0' and node1['time_slice.0'].cocos == 2
+        # sub-trees that are detached keep the settings that they inherited
+        node1 = ods['equilibrium']
+        node1.parent = None
+        assert node1.top is node1
+        assert node1.imas_version == '3.30.0' and node1.cocos == 2
+        assert node1['time_slice.0'].imas_version == '3.30.0' and node1['time_slice.0'].cocos == 2
+        # sub-trees keep the settings that they inherited when the top-level ODS is garbage collected
+        nodes = [
+            ODS(imas_version='3.30.0', cocos=2).sample_equilibrium()['equilibrium.time_slice.0'],
+            copy.deepcopy(ods)['equilibrium.time_slice.0'],
+        ]
+        gc.collect()
+        for node in nodes:
+            assert node.parent is None
+            assert node.imas_version == '3.30.0' and node.cocos == 2
+            assert node['global_quantities'].imas_version == '3.30.0' and node['global_quantities'].cocos == 2
+
+    def test_paths_index(self):
+        ods = ODS().sample(ntimes=3)
+        ods1 = ODS(paths_index=True).sample(ntimes=3)
+        assert ods1.paths_index
+        assert ods1.paths() == ods.paths()
+        assert ods1['equilibrium.time_slice.1'].paths() == ods['equilibrium.time_slice.1'].paths()
+        # the index is kept up to date as the ODS is modified
+        for item in [ods, ods1]:
+            item['equilibrium.time_slice.3.global_quantities.ip'] = 1.0
+            del item['equilibrium.time_slice'][0]
+            del item['equilibrium.time_slice.0.profiles_1d']
+            item['core_profiles.profiles_1d.0'].clear()
+            item['equilibrium.code.parameters'] = CodeParameters()
+            item['equilibrium.code.parameters']['test'] = 1
+        assert ods1.paths() == ods.paths()
+        assert 'equilibrium.time_slice.2.global_quantities.ip' in ods1
+        assert 'equilibrium.time_slice.3' not in ods1
+        # queries that mix strings and integers differently than the ODS does
+        assert 'equilibrium.0' not in ods1
+        assert 'equilibrium.time_slice.foo' not in ods1
+        # the index is carried over by copies
+        assert copy.deepcopy(ods1).paths_index
+        assert pickle.loads(pickle.dumps(ods1)).paths() == ods.paths()
+        # indexes that are dropped are no longer tracked
+        from omas.omas_core import _paths_indexes
+
+        n = len(_paths_indexes)
+        ods1.paths_index = False
+        assert len(_paths_indexes) == n - 1
+
+    def test_columnar(self):
+        ods = ODS().sample_equilibrium(time_index=0).sample_equilibrium(time_index=1)
+        psi = ods['equilibrium.time_slice.:.profiles_1d.psi']
+        ip = ods['equilibrium.time_slice.:.global_quantities.ip']
+        assert ods.columnar()
+        # slicing returns a view of the stacked data
+        psi1 = ods['equilibrium.time_slice.:.profiles_1d.psi']
+        assert numpy.array_equal(psi1, psi)
+        assert numpy.shares_memory(psi1, ods['equilibrium.time_slice.1.profiles_1d.psi'])
+        assert numpy.array_equal(ods['equilibrium.time_slice.:.global_quantities.ip'], ip)
+        assert isinstance(ods['equilibrium.time_slice.0.global_quantities.ip'], float)
+        # assigning data reverts to standard storage
+        ods['equilibrium.time_slice.1.profiles_1d.psi'] = psi[1] * 2
+        psi2 = ods['equilibrium.time_slice.:.profiles_1d.psi']
+        assert numpy.array_equal(psi2[1], psi[1] * 2)
+        assert not numpy.shares_memory(psi2, psi1)
+
     def test_saveload(self):
         ods = ODS()
         ods.sample_equilibrium()
@@ -537,6 +660,10 @@ class TestOmasCore(UnittestCaseOmas):
             diff = odc1.diff(odc)
             assert not diff, f'save/load ODC to {ftype} failed:\r{repr(diff)}'
 
+        # selections of paths are not supported for ODCs
+        with self.assertRaises(ValueError):
+            load_omas_pkl('test.pkl', paths=['133221.equilibrium'])
+
     def test_diff_attrs(self):
         ods = ODS(imas_version='3.30.0').sample_equilibrium()
         ods1 = ODS(imas_version='3.30.0').sample_equilibrium()
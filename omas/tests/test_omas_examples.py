@@ -108,6 +108,15 @@ class TestOmasExamples(UnittestCaseOmas):
     def test_plot_saveload_scaling(self):
         from omas.examples import plot_saveload_scaling
 
+    def test_paths_performance(self):
+        from omas.examples import paths_performance
+
+    def test_h5_compression(self):
+        from omas.examples import h5_compression
+
+    def test_nc_grouped(self):
+        from omas.examples import nc_grouped
+
     def test_across_ODSs(self):
         from omas.examples import across_ODSs
 
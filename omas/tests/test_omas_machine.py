@@ -17,7 +17,51 @@ from omas.omas_utils import *
 from omas.tests import warning_setup
 from omas.tests.failed_imports import *
 from omas.omas_machine import *
-from omas.omas_machine import machine_to_omas
+from omas.omas_machine import machine_to_omas, mds_fetch_plan, mds_prefetch, _mds_connection_cache
+
+
+class FakeMdsConnection(object):
+    """
+    Local stand-in for MDSplus.Connection that records the round trips to the server
+    """
+
+    def __init__(self, data, default=None):
+        self.data = data
+        self.default = default
+        self.round_trips = []
+
+    def value(self, TDI):
+        if TDI in self.data:
+            return self.data[TDI]
+        elif self.default is not None:
+            return self.default
+        raise Exception(f'Node not found: {TDI}')
+
+    def get(self, TDI):
+        self.round_trips.append([TDI])
+        return self.value(TDI)
+
+    def getMany(self):
+        return FakeMdsGetMany(self)
+
+
+class FakeMdsGetMany(object):
+    def __init__(self, conn):
+        self.conn = conn
+        self.expressions = {}
+
+    def append(self, name, expr):
+        self.expressions[name] = expr
+
+    def execute(self):
+        self.conn.round_trips.append(list(self.expressions.values()))
+        results = {}
+        for name, expr in self.expressions.items():
+            try:
+                results[name] = {'value': self.conn.value(expr)}
+            except Exception as _excp:
+                results[name] = {'error': str(_excp)}
+        return results
 
 
 class TestOmasMachine(UnittestCaseOmas):
@@ -93,3 +137,58 @@ class TestOmasMachine(UnittestCaseOmas):
         # make sure all machines have a MDS+ server assigned
         for machine in machines():
             machine_mappings(self.machine, '')['__mdsserver__']
+
+    def test_mds_prefetch(self):
+        pulse = 123456
+        user_machine_mappings = {
+            'equilibrium.time': {'TDI': 'dim_of(\\EFIT01::TOP.RESULTS.GEQDSK.CPASMA)', 'treename': 'EFIT01'},
+            'equilibrium.vacuum_toroidal_field.r0': {'TDI': 'data(\\EFIT02::TOP.RESULTS.AEQDSK.RCENCM)/100.', 'treename': 'EFIT02'},
+        }
+        locations = [
+            'equilibrium.time',
+            'equilibrium.time_slice.:',
+            'equilibrium.time_slice.:.global_quantities.ip',
+            'equilibrium.vacuum_toroidal_field.r0',
+        ]
+        # expressions are grouped by MDS+ connection
+        plan = mds_fetch_plan('sample', pulse, locations, user_machine_mappings=user_machine_mappings)
+        assert sorted(treename for server, treename, pulse in plan) == ['EFIT01', 'EFIT02']
+
+        # the COCOS identification expression of `ip` is answered with 11
+        conns = {
+            'EFIT01': FakeMdsConnection(
+                {
+                    'dim_of(\\EFIT01::TOP.RESULTS.GEQDSK.CPASMA)': numpy.array([1.0, 2.0, 3.0]),
+                    'size(\\EFIT01::TOP.RESULTS.GEQDSK.BCENTR)': 3,
+                    'data(\\EFIT01::TOP.RESULTS.GEQDSK.CPASMA)': numpy.array([1.0e6, 1.1e6, 1.2e6]),
+                },
+                default=11,
+            ),
+            'EFIT02': FakeMdsConnection({'data(\\EFIT02::TOP.RESULTS.AEQDSK.RCENCM)/100.': 1.7}),
+        }
+        keys = []
+        for treename, conn in conns.items():
+            keys.append((mdsvalue('sample', treename, pulse, '').server, treename, pulse))
+            _mds_connection_cache[keys[-1]] = conn
+        try:
+            cache = mds_prefetch('sample', pulse, locations, user_machine_mappings=user_machine_mappings)
+            # one round trip per MDS+ connection
+            for conn in conns.values():
+                assert len(conn.round_trips) == 1
+            # locations are resolved without further round trips
+            ods = ODS()
+            for location in locations:
+                machine_to_omas(ods, 'sample', pulse, location, user_machine_mappings=user_machine_mappings, cache=cache)
+            for conn in conns.values():
+                assert len(conn.round_trips) == 1
+            assert numpy.allclose(ods['equilibrium.time'], [1.0, 2.0, 3.0])
+            assert numpy.allclose(ods['equilibrium.time_slice.:.global_quantities.ip'], [1.0e6, 1.1e6, 1.2e6])
+            assert ods['equilibrium.vacuum_toroidal_field.r0'] == 1.7
+            # locations do not share the arrays in the cache
+            ods = ODS(consistency_check=False)
+            machine_to_omas(ods, 'sample', pulse, 'equilibrium.time', user_machine_mappings=user_machine_mappings, cache=cache)
+            ods['equilibrium.time'][0] = 0.0
+            assert numpy.allclose(cache['sample', 'EFIT01', pulse, 'dim_of(\\EFIT01::TOP.RESULTS.GEQDSK.CPASMA)'], [1.0, 2.0, 3.0])
+        finally:
+            for key in keys:
+                _mds_connection_cache.pop(key, None)
@@ -228,6 +228,33 @@ class TestOmasPhysics(UnittestCaseOmas):
             for cocos_add in range(2):
                 for thing in ['BT', 'TOR', 'POL', 'Q']:
                     assert cocos_transform(cocos_ind + cocos_add * 10, cocos_ind + cocos_add * 10)[thing] == 1
+        # transforms are cached, but the returned dictionaries can be safely modified
+        cocos_transform(2, 11)['PSI'] = 0
+        assert cocos_transform(2, 11)['PSI'] == -2 * numpy.pi
+        return
+
+    def test_cocos_convert(self):
+        ods = ODS(cocos=11)
+        ods.sample_equilibrium()
+        ods['equilibrium.time_slice.0.profiles_1d.psi_error_upper'] = abs(ods['equilibrium.time_slice.0.profiles_1d.psi'])
+        with omas_environment(ods, cocosio=2):
+            flat = ods.flat()
+        assert ods.cocos_convert(2)
+        assert ods.cocos == ods.cocosio == 2
+        for location, value in ods.flat().items():
+            if isinstance(value, (float, numpy.ndarray)):
+                assert numpy.allclose(value, flat[location]), location
+        # converting a subtree does not change the cocos of the ODS
+        ods['equilibrium.time_slice.0'].cocos_convert(11, cocosin=2)
+        assert ods.cocos == 2
+        assert numpy.allclose(
+            ods['equilibrium.time_slice.0.profiles_1d.psi'], -flat['equilibrium.time_slice.0.profiles_1d.psi'] * 2 * numpy.pi
+        )
+        # empty ODSs and empty structures are skipped
+        assert ODS().cocos_convert(2) == 0
+        ods['equilibrium.time_slice'].setraw(1, ods['equilibrium.time_slice'].same_init_ods())
+        assert ods.cocos_convert(11)
+        assert ods['equilibrium.time_slice.1'].cocos_convert(2) == 0
         return
 
     def test_identify_cocos(self):
@@ -386,6 +413,12 @@ class TestOmasPhysics(UnittestCaseOmas):
         ods['equilibrium.time_slice.0.profiles_1d.psi'] = x
         assert numpy.allclose(ods['equilibrium.time_slice.0.profiles_1d.psi'], x)
 
+        # errors are transformed with the absolute value of the normalization
+        ods['equilibrium.time_slice.0.profiles_1d.psi_error_upper'] = x
+        with omas_environment(ods, cocosio=11):
+            assert numpy.allclose(ods['equilibrium.time_slice.0.profiles_1d.psi_error_upper'], x * (2 * numpy.pi))
+            assert numpy.allclose(ods['equilibrium.time_slice.0.profiles_1d.psi'], -x * (2 * numpy.pi))
+
         return
 
     def test_coordsio_cocosio(self):
@@ -30,6 +30,18 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('pkl through difference')
 
+    def test_omas_pkl_buffers(self):
+        ods = ODS().sample()
+        data, buffers = ods_to_buffers(ods)
+        assert len(buffers)
+        # arrays are not copied into the pickle stream
+        assert len(data) < len(pickle.dumps(ods, protocol=5))
+        ods1 = ods_from_buffers(data, [bytearray(buffer) for buffer in buffers])
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('pkl buffers through difference')
+
     def test_omas_json(self):
         ods = ODS().sample()
         ods1 = through_omas_json(ods)
@@ -38,6 +50,67 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('json through difference')
 
+        # subclasses of ODS (whose layout differs from the one of ODS)
+        class MyODS(ODS):
+            pass
+
+        filename = omas_testdir(__file__) + '/test_subclass.json'
+        save_omas_json(ods, filename)
+        ods1 = load_omas_json(filename, cls=MyODS)
+        assert isinstance(ods1, MyODS)
+        assert ods1['equilibrium.time_slice.0'].top is ods1
+        assert not ods.diff(ods1)
+
+    def test_omas_json_stream(self):
+        ods = ODS().sample()
+        filename = omas_testdir(__file__) + '/test_stream.json'
+        save_omas_json(ods, filename, engine='json')
+        # the streaming encoder writes the same file as json.dumps
+        with open(filename, 'r') as f:
+            json_string = f.read()
+        assert json_string == json.dumps(ods, default=lambda x: json_dumper(x, None), indent=0, separators=(',', ': '), sort_keys=True)
+        ods1 = load_omas_json(filename, stream=True)
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('json stream through difference')
+        # chunks that split strings and numbers
+        with open(filename, 'r') as f:
+            assert json.dumps(json_stream_load(f, chunk_size=7)) == json.dumps(json.loads(json_string))
+
+    @unittest.skipIf(failed_ORJSON, str(failed_ORJSON))
+    def test_omas_json_engines(self):
+        ods = ODS().sample()
+        filename = omas_testdir(__file__) + '/test_engines.json'
+        for engine in ['json', 'orjson']:
+            for objects_encode in [None, True, 'base64']:
+                save_omas_json(ods, filename, objects_encode=objects_encode, engine=engine)
+                for load_engine in ['json', 'orjson']:
+                    ods1 = load_omas_json(filename, engine=load_engine)
+                    diff = ods.diff(ods1)
+                    if diff:
+                        print('\n'.join(diff))
+                        raise AssertionError('json through difference (%s %s -> %s)' % (engine, objects_encode, load_engine))
+        # arrays decoded from base64 can be modified
+        ods1['equilibrium.time_slice.0.profiles_1d.psi'][0] = 0.0
+
+    def test_omas_json_default_engine(self):
+        ods = ODS().sample()
+        ods['equilibrium.time_slice.0.profiles_1d.psi'][0] = numpy.nan
+        filename = omas_testdir(__file__) + '/test_default_engine.json'
+        # the default output is the indented one of the `json` engine, regardless of orjson being installed
+        save_omas_json(ods, filename)
+        with open(filename, 'r') as f:
+            json_string = f.read()
+        assert json_string == json.dumps(ods, default=lambda x: json_dumper(x, None), indent=0, separators=(',', ': '), sort_keys=True)
+        assert 'NaN' in json_string
+        ods1 = load_omas_json(filename)
+        assert numpy.isnan(ods1['equilibrium.time_slice.0.profiles_1d.psi'][0])
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('json default engine through difference')
+
     def test_omas_nc(self):
         ods = ODS().sample()
         ods1 = through_omas_nc(ods)
@@ -46,6 +119,35 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('nc through difference')
 
+    def test_omas_nc_grouped(self):
+        from netCDF4 import Dataset
+
+        ods = ODS().sample(ntimes=2)
+        filename = omas_testdir(__file__) + '/test_grouped.nc'
+        save_omas_nc(ods, filename, grouped=True)
+        ods1 = load_omas_nc(filename)
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('nc grouped through difference')
+        # dimensions are shared and named after the IMAS coordinates
+        with Dataset(filename, 'r') as dataset:
+            variables = dataset.groups['equilibrium'].variables
+            assert variables['time_slice.1.profiles_1d.q'].dimensions == ('time_slice.1.profiles_1d.psi',)
+            assert variables['time_slice.1.profiles_2d.0.psi'].dimensions == (
+                'time_slice.1.profiles_2d.0.grid.dim1',
+                'time_slice.1.profiles_2d.0.grid.dim2',
+            )
+            assert variables['time_slice.1.profiles_2d.0.psi'].filters()['zlib']
+        ods1 = ODS()
+        with ods1.open(filename):
+            assert ods1['equilibrium.time_slice.1.global_quantities.ip'] == ods['equilibrium.time_slice.1.global_quantities.ip']
+            assert ods1['equilibrium.time_slice'].keys() == [0, 1]
+            diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('nc grouped dynamic difference')
+
     def test_omas_h5(self):
         ods = ODS().sample()
         ods1 = through_omas_h5(ods)
@@ -54,6 +156,158 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('h5 through difference')
 
+    def test_omas_h5_tensor(self):
+        ods = ODS().sample(ntimes=3)
+        filename = omas_testdir(__file__) + '/test_tensor.h5'
+        for homogeneous in ['time', 'full']:
+            save_omas_h5(ods, filename, homogeneous=homogeneous)
+            ods1 = load_omas_h5(filename)
+            diff = ods.diff(ods1)
+            if diff:
+                print('\n'.join(diff))
+                raise AssertionError('h5 tensor through difference (homogeneous=%s)' % homogeneous)
+            # single time slices are read from the stacked datasets
+            ods1 = ODS()
+            with ods1.open(filename):
+                assert numpy.allclose(ods1['equilibrium.time_slice.1.profiles_1d.psi'], ods['equilibrium.time_slice.1.profiles_1d.psi'])
+                assert ods1['equilibrium.time_slice'].keys() == [0, 1, 2]
+                assert 'equilibrium.time_slice.3.profiles_1d.psi' not in ods1
+            # partial loads read only the hyperslabs of the selected structures
+            for kw in [
+                {'paths': ['equilibrium.time_slice.1']},
+                {'paths': ['equilibrium.time_slice.:.global_quantities.ip'], 'time_index': 2},
+            ]:
+                ods1 = load_omas_h5(filename, **kw)
+                ods2 = load_subset(copy.deepcopy(ods), **kw)
+                assert set(ods1.flat().keys()) == set(ods2.flat().keys()), f'{homogeneous} {kw}'
+                assert not ods1.diff(ods2), f'{homogeneous} {kw}'
+        # uncertainties that are only in some of the structures are not stacked
+        ods = ODS().sample(ntimes=3)
+        q = ods['equilibrium.time_slice.0.profiles_1d.q']
+        ods['equilibrium.time_slice.0.profiles_1d.q'] = uarray(q, abs(q) * 0.1)
+        for homogeneous in ['time', 'full']:
+            save_omas_h5(ods, filename, homogeneous=homogeneous)
+            ods1 = load_omas_h5(filename)
+            diff = ods.diff(ods1)
+            if diff:
+                print('\n'.join(diff))
+                raise AssertionError('h5 tensor uncertain difference (homogeneous=%s)' % homogeneous)
+            assert 'equilibrium.time_slice.1.profiles_1d.q_error_upper' not in ods1
+            ods1 = ODS()
+            with ods1.open(filename):
+                assert 'equilibrium.time_slice.1.profiles_1d.q_error_upper' not in ods1
+                assert numpy.allclose(ods1['equilibrium.time_slice.0.profiles_1d.q_error_upper'], abs(q) * 0.1)
+        from omas.omas_h5 import _stacked_hyperslab
+
+        spath = ['equilibrium', 'time_slice', ':', 'profiles_2d', ':', 'psi']
+        assert _stacked_hyperslab(paths_filter(['equilibrium.time_slice.1']), spath, 2) == (slice(1, 2), slice(None))
+        assert _stacked_hyperslab(paths_filter(['equilibrium.time_slice.[0-9]+.profiles_2d.0']), spath, 2) == (slice(None), slice(None))
+        pfilter = paths_filter(['equilibrium.time_slice.1.profiles_2d.0', 'equilibrium.time_slice.3.profiles_2d.0'])
+        assert _stacked_hyperslab(pfilter, spath, 2) == (slice(1, 4), slice(0, 1))
+
+    def test_omas_h5_compression(self):
+        import h5py
+
+        ods = ODS()
+        ods['equilibrium.time'] = numpy.linspace(0, 1, 1000)
+        ods['equilibrium.vacuum_toroidal_field.b0'] = numpy.ones(1000)
+        ods['equilibrium.vacuum_toroidal_field.r0'] = 1.0
+        filename = omas_testdir(__file__) + '/test_compression.h5'
+        save_omas_h5(ods, filename, compression='gzip', compression_opts=4, shuffle=True, chunks=(100,), min_size=10)
+        with h5py.File(filename, 'r') as f:
+            assert f['equilibrium/time'].compression == 'gzip'
+            assert f['equilibrium/time'].shuffle
+            assert f['equilibrium/time'].chunks == (100,)
+            assert f['equilibrium/vacuum_toroidal_field/r0'].compression is None
+        assert not ods.diff(load_omas_h5(filename))
+
+    def test_omas_dynamic_h5(self):
+        ods = ODS().sample()
+        filename = omas_testdir(__file__) + '/test_dynamic.h5'
+        ods.save(filename)
+        ods1 = ODS()
+        with ods1.open(filename):
+            # only the data that is accessed is read from the file
+            assert ods1['equilibrium.time_slice.0.global_quantities.ip'] == ods['equilibrium.time_slice.0.global_quantities.ip']
+            assert 'core_profiles' not in ods1.omas_data
+            assert 'equilibrium.time' in ods1
+            assert 'equilibrium.does_not_exist' not in ods1
+            assert ods1['equilibrium.time_slice'].keys() == ods['equilibrium.time_slice'].keys()
+            diff = ods.diff(ods1)
+        assert ods1.dynamic.data is None
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('dynamic h5 difference')
+
+    @unittest.skipIf(failed_ZARR, str(failed_ZARR))
+    def test_omas_zarr(self):
+        ods = ODS().sample(ntimes=2)
+        for filename in ['/test.zarr', '/test.zarr.zip']:
+            filename = omas_testdir(__file__) + filename
+            ods.save(filename)
+            ods1 = ODS().load(filename)
+            diff = ods.diff(ods1)
+            if diff:
+                print('\n'.join(diff))
+                raise AssertionError('zarr through difference (%s)' % filename)
+            ods1 = ODS()
+            with ods1.open(filename):
+                assert ods1['equilibrium.time_slice.1.global_quantities.ip'] == ods['equilibrium.time_slice.1.global_quantities.ip']
+                assert 'core_profiles' not in ods1.omas_data
+                assert ods1['equilibrium.time_slice'].keys() == [0, 1]
+                assert 'equilibrium.does_not_exist' not in ods1
+        # structures of arrays of structures can be written separately (eg. by different processes)
+        filename = omas_testdir(__file__) + '/test_parts.zarr'
+        save_omas_zarr(ODS(), filename)
+        for k in [1, 0]:
+            save_omas_zarr(ods['equilibrium.time_slice'][k], filename, mode='a')
+        ods1 = load_omas_zarr(filename)
+        assert not ods['equilibrium.time_slice'].diff(ods1['equilibrium.time_slice'])
+        # complex scalars are stored as 0-d arrays
+        ods = ODS(consistency_check=False)
+        ods['test.value'] = 1.0 + 2.0j
+        filename = omas_testdir(__file__) + '/test_complex.zarr'
+        save_omas_zarr(ods, filename)
+        assert load_omas_zarr(filename, consistency_check=False)['test.value'] == 1.0 + 2.0j
+        ods1 = ODS(consistency_check=False)
+        with ods1.open(filename):
+            assert ods1['test.value'] == 1.0 + 2.0j
+
+    def test_omas_mmap(self):
+        ods = ODS().sample()
+        ods1 = through_omas_mmap(ods)
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('mmap through difference')
+        # arrays are views of the memory-mapped sidecar file
+        psi = ods1['equilibrium.time_slice.0.profiles_1d.psi']
+        while psi.base is not None and not isinstance(psi, numpy.memmap):
+            psi = psi.base
+        assert isinstance(psi, numpy.memmap)
+        # data is appended to the sidecar file
+        filename = omas_testdir(__file__) + '/test_append.mmap'
+        save_omas_mmap(ODS(), filename)
+        ods2 = ODS()
+        ods2['core_profiles'] = ods['core_profiles']
+        save_omas_mmap(ods2, filename, append=True)
+        ods2 = ODS()
+        ods2['equilibrium'] = ods['equilibrium']
+        save_omas_mmap(ods2, filename, append=True)
+        ods2 = load_omas_mmap(filename)
+        assert not ods['equilibrium'].diff(ods2['equilibrium'])
+        assert not ods['core_profiles'].diff(ods2['core_profiles'])
+        # ODSs that map the sidecar file can be saved back to the same file
+        ods2['equilibrium.time_slice.0.global_quantities.ip'] = 1.0
+        save_omas_mmap(ods2, filename)
+        assert ods2['equilibrium.time_slice.0.profiles_1d.psi'].sum() == ods['equilibrium.time_slice.0.profiles_1d.psi'].sum()
+        ods3 = load_omas_mmap(filename)
+        assert ods3['equilibrium.time_slice.0.global_quantities.ip'] == 1.0
+        assert not ods2.diff(ods3)
+        save_omas_mmap(ods3, filename, append=True)
+        assert not ods2.diff(load_omas_mmap(filename))
+        assert not [item for item in os.listdir(os.path.dirname(filename)) if item.endswith('.tmp')]
+
     def test_omas_ds(self):
         ods = ODS().sample(homogeneous_time=True)
         ods1 = through_omas_ds(ods)
@@ -78,6 +332,63 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError(f'ascii through difference for one file')
 
+    def test_omas_ascii_nd(self):
+        ods = ODS(consistency_check=False)
+        ods['equilibrium.time_slice.0.profiles_2d.0.psi'] = numpy.random.randn(2, 3, 4)
+        ods['equilibrium.time_slice.0.profiles_2d.0.psi'][0, 1, 2] = numpy.nan
+        ods['equilibrium.time_slice.0.profiles_2d.0.phi'] = numpy.zeros((3, 0))
+        ods['equilibrium.time_slice.0.profiles_2d.0.grid.dim1'] = numpy.arange(3)
+        ods['equilibrium.time'] = [0.0]
+        ods['equilibrium.ids_properties.homogeneous_time'] = 1
+        filename = omas_testdir(__file__) + os.sep + 'test_nd.ids'
+        save_omas_ascii(ods, filename)
+        ods1 = load_omas_ascii(filename, consistency_check=False)
+        diff = ods.diff(ods1)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError(f'ascii through difference for N-D arrays')
+
+    def test_omas_parallel(self):
+        ods = ODS().sample()
+        serial = omas_testdir(__file__) + os.sep + 'serial'
+        parallel = omas_testdir(__file__) + os.sep + 'parallel'
+        for dir in [serial, parallel]:
+            if not os.path.exists(dir):
+                os.makedirs(dir)
+        # IDSs files are identical to the ones saved serially
+        ods.save('ascii', 'TEST', 1, 0, serial)
+        ods.save('ascii', 'TEST', 1, 0, parallel, max_workers=4, processes=True)
+        for filename in glob.glob(serial + os.sep + '*.ids'):
+            with open(filename, 'r') as f1, open(parallel + os.sep + os.path.split(filename)[1], 'r') as f2:
+                assert f1.read() == f2.read(), filename
+        # ODSs are identical to the ones loaded serially
+        ods1 = ODS().load('ascii', 'TEST', 1, 0, parallel)
+        ods2 = ODS().load('ascii', 'TEST', 1, 0, parallel, max_workers=4)
+        assert list(ods1.keys()) == list(ods2.keys())
+        diff = ods1.diff(ods2)
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('parallel ascii difference')
+
+    def test_omas_load_paths(self):
+        ods = ODS().sample(ntimes=3)
+        paths = ['equilibrium.time_slice.:.global_quantities.ip', 'core_profiles.profiles_1d.[0-9]+.electrons.*']
+        formats = ['pkl', 'json', 'h5', 'nc', 'mmap', 'ids']
+        if not failed_ZARR:
+            formats.append('zarr')
+        for ext in formats:
+            filename = omas_testdir(__file__) + os.sep + 'paths.' + ext
+            ods.save(filename)
+            for kw in [{'paths': paths}, {'paths': paths, 'time_index': 1}, {'time_index': 1}]:
+                # only the selected data is loaded, and it is the same as the one selected from the whole ODS
+                ods1 = ODS().load(filename, **kw)
+                ods2 = load_subset(copy.deepcopy(ods), **kw)
+                assert set(ods1.flat().keys()) == set(ods2.flat().keys()), f'{ext} {kw}'
+                diff = ods1.diff(ods2)
+                if diff:
+                    print('\n'.join(diff))
+                    raise AssertionError(f'paths difference for {ext} {kw}')
+
     def test_omas_dx(self):
         ods = ODS().sample(homogeneous_time=True)
         odx = ods.to_odx()
@@ -97,6 +408,49 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('mongo through difference')
 
+    @unittest.skipIf(failed_MONGOMOCK, str(failed_MONGOMOCK))
+    def test_omas_mongo_mock(self):
+        import mongomock
+        from omas.omas_mongo import mongo_projection
+
+        client = mongomock.MongoClient()
+        ods = ODS().sample()
+        ods['equilibrium.time_slice.0.profiles_2d.0.psi'] = numpy.random.randn(400, 400)
+        ids = save_omas_mongo([ods, ods], collection='test', database='test', server=client)
+        assert len(ids) == 2
+        assert client['test']['test.files'].count_documents({}) == 2
+        results = load_omas_mongo({'_id': ids[0]}, collection='test', database='test', server=client)
+        diff = ods.diff(list(results.values())[0])
+        if diff:
+            print('\n'.join(diff))
+            raise AssertionError('mongo through difference')
+        # only the requested paths are loaded
+        results = load_omas_mongo(
+            {}, collection='test', database='test', server=client, paths=['equilibrium.time_slice.:.global_quantities.ip']
+        )
+        assert len(results) == 2
+        ods1 = list(results.values())[0]
+        assert ods1.flat().keys() == {
+            k for k in ods.flat() if k.startswith('equilibrium.time_slice.') and k.endswith('global_quantities.ip')
+        }
+        # regular expressions select the data below the steps that precede them
+        results = load_omas_mongo(
+            {}, collection='test', database='test', server=client, paths=['core_profiles.profiles_1d.[0-9]+.electrons.density_thermal']
+        )
+        ods1 = list(results.values())[0]
+        assert len(ods1['core_profiles.profiles_1d'])
+        regex = r'core_profiles\.profiles_1d\.[0-9]+\.electrons\.density_thermal$'
+        assert ods1.flat().keys() == {k for k in ods.flat() if re.match(regex, k)}
+        # keys of the projection that are below other keys are dropped
+        assert mongo_projection(['equilibrium', 'equilibrium.time']) == {'equilibrium': 1}
+        assert mongo_projection(['equilibrium.time_slice.:.global_quantities.ip'], time=True) == {
+            'equilibrium.time_slice.global_quantities.ip': 1,
+            'equilibrium.time': 1,
+            'equilibrium.time_slice.time': 1,
+            'equilibrium.time_slice.global_quantities.time': 1,
+        }
+        assert mongo_projection(['.*ip']) is None
+
     @unittest.skipIf(failed_S3, str(failed_S3))
     def test_omas_s3(self):
         ods = ODS().sample()
@@ -106,6 +460,35 @@ class TestOmasSuite(UnittestCaseOmas):
             print('\n'.join(diff))
             raise AssertionError('s3 through difference')
 
+    @unittest.skipIf(failed_MOTO, str(failed_MOTO))
+    def test_omas_s3_moto(self):
+        from moto import mock_aws
+        from omas.omas_s3 import s3_upload_stream
+
+        os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+        with mock_aws():
+            ods = ODS().sample()
+            ods['equilibrium.time_slice.0.profiles_2d.0.psi'] = numpy.random.randn(1500, 1000)
+            for filename in ['test0.pkl', 'test1.pkl']:
+                save_omas_s3(ods, filename, user='omas_test')
+            save_omas_s3(ODS().sample(), 'test.pkl', user='omas_test2')
+            assert sorted(list_omas_s3('omas_test')) == ['omas_test/test0.pkl', 'omas_test/test1.pkl']
+            ods1 = load_omas_s3('test0.pkl', user='omas_test')
+            diff = ods.diff(ods1)
+            if diff:
+                print('\n'.join(diff))
+                raise AssertionError('s3 through difference')
+            assert len(load_omas_s3(['test0.pkl', 'test1.pkl'], user='omas_test')) == 2
+
+            # failed serialization does not leave truncated objects behind
+            def fail(f):
+                f.write(b'0' * 1024)
+                raise RuntimeError('serialization failed')
+
+            with self.assertRaises(RuntimeError):
+                s3_upload_stream(fail, 's3://omas3/omas_test/fail.pkl')
+            assert 'omas_test/fail.pkl' not in list_omas_s3('omas_test')
+
     @unittest.skipIf(failed_IMAS, str(failed_IMAS))
     def test_omas_imas(self):
         ods = ODS().sample()
@@ -122,6 +122,17 @@ class TestOmasUtils(UnittestCaseOmas):
         assert p2l('equilibrium') == ['equilibrium']
         assert p2l('equilibrium.time_slice.0.global_quantities.ip') == ['equilibrium', 'time_slice', 0, 'global_quantities', 'ip']
 
+    def test_p2t(self):
+        assert p2t('equilibrium.time_slice[0].global_quantities.ip') == ('equilibrium', 'time_slice', 0, 'global_quantities', 'ip')
+        assert p2t(['equilibrium', 0]) == ('equilibrium', 0)
+        # string paths are memoized, and p2l returns a copy that can be safely modified
+        assert p2t('equilibrium.time_slice.0') is p2t('equilibrium.time_slice.0')
+        path = p2l('equilibrium.time_slice.0')
+        path.append('time')
+        assert p2l('equilibrium.time_slice.0') == ['equilibrium', 'time_slice', 0]
+        clear_paths_cache()
+        assert p2t('equilibrium.time_slice.0') == ('equilibrium', 'time_slice', 0)
+
     def test_o2u(self):
         assert o2u('equilibrium.time_slice.0.global_quantities.ip') == 'equilibrium.time_slice.:.global_quantities.ip'
         assert o2u('equilibrium.time_slice.:.global_quantities.ip') == 'equilibrium.time_slice.:.global_quantities.ip'
@@ -129,6 +140,47 @@ class TestOmasUtils(UnittestCaseOmas):
         assert o2u('equilibrium') == 'equilibrium'
         assert o2u('equilibrium.2') == 'equilibrium.:'
 
+    def test_schema_node(self):
+        node = schema_node('equilibrium.time_slice.:.profiles_1d.psi')
+        info = omas_info_node('equilibrium.time_slice.:.profiles_1d.psi')
+        assert node.data_type == info['data_type']
+        assert node.ndim == len(info['coordinates']) == 1
+        assert list(node.coordinates) == info['coordinates']
+        assert node.cocos_signal == 'PSI'
+        # error nodes refer to the COCOS transformation of their base node
+        node = schema_node('equilibrium.time_slice.:.profiles_1d.psi_error_upper')
+        assert node.cocos_location == 'equilibrium.time_slice.:.profiles_1d.psi'
+        # records are shared and read-only
+        assert schema_node('equilibrium.time_slice.:.profiles_1d.psi') is schema_node('equilibrium.time_slice.:.profiles_1d.psi')
+        try:
+            node.info['data_type'] = 'INT_0D'
+            raise AssertionError('schema node info should be read-only')
+        except TypeError:
+            pass
+        # missing nodes return an empty record
+        assert not len(schema_node('equilibrium.does_not_exist').info)
+        assert not len(schema_node('does_not_exist.at_all').info)
+
+    def test_structures_cache(self):
+        import shutil
+        import tempfile
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = tmp_dir + os.sep + 'equilibrium.json'
+            shutil.copy(structures_filenames(omas_rcparams['default_imas_version'])['equilibrium'], filename)
+            with rcparams_environment(structures_cache_dir=tmp_dir + os.sep + 'cache'):
+                original = cached_json_load(filename)
+                assert len(glob.glob(tmp_dir + os.sep + 'cache' + os.sep + '*' + os.sep + 'equilibrium.*'))
+                # second load comes from the cache
+                assert cached_json_load(filename) == original
+                # cache is invalidated when the json file changes
+                with open(filename, 'w') as f:
+                    json.dump({'equilibrium': {}}, f)
+                assert cached_json_load(filename) == {'equilibrium': {}}
+        finally:
+            shutil.rmtree(tmp_dir)
+
     def test_set_time_array(self):
         ods = ODS()
         ods.set_time_array('equilibrium.vacuum_toroidal_field.b0', 0, 0.1)
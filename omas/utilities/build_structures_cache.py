@@ -0,0 +1,14 @@
+'''
+Utility to prebuild the on-disk cache of the IMAS structures json files
+
+usage: python3 build_structures_cache.py [imas_version ...]
+'''
+
+import os, sys
+
+sys.path.insert(0, os.path.split(os.path.split(os.path.split(os.path.abspath(__file__))[0])[0])[0])
+
+from omas.omas_utils import build_structures_cache, omas_rcparams
+
+n = build_structures_cache(sys.argv[1:] or None)
+print('Cached %d IMAS structures files in %s' % (n, omas_rcparams['structures_cache_dir']))
@@ -33,6 +33,8 @@ extras_require = {
     'hdc': ['pyhdc'],
     'imas': ['imas'],
     'uda': ['pyuda'],
+    'json': ['orjson'],
+    'zarr': ['zarr>=3.1.1'],
     'build_structures': ['bs4'],
     'build_documentation': ['Sphinx', 'sphinx-bootstrap-theme', 'sphinx-gallery', 'Pillow'],
 }